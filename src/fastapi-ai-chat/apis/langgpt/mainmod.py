@@ -4,7 +4,8 @@ import logging
 
 from fastapi import HTTPException
 
-from apis.langgpt.submod import query_conversation_history, ask_langchain_models, test_chatbot_faiss
+from apis.langgpt.submod import query_conversation_history, ask_langchain_models, ask_langchain_models_stream, \
+                                ask_langchain_models_batch, test_chatbot_faiss, reload_chatbot_vector_store
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -48,6 +49,32 @@ async def ai_langchain_ask(data):
             raise
         else:
             raise HTTPException(status_code=500, detail='internal server error: {0}'.format(e))
+
+async def ai_langchain_ask_stream(data):
+    try:
+        if data is None:
+            raise HTTPException(status_code=400, detail='data is required.')
+
+        return await ask_langchain_models_stream(data)
+    except Exception as e:
+        logger.error(str(e))
+        if isinstance(e, HTTPException):
+            raise
+        else:
+            raise HTTPException(status_code=500, detail='internal server error: {0}'.format(e))
+
+async def ai_langchain_ask_batch(data):
+    try:
+        if data is None:
+            raise HTTPException(status_code=400, detail='data is required.')
+
+        return await ask_langchain_models_batch(data)
+    except Exception as e:
+        logger.error(str(e))
+        if isinstance(e, HTTPException):
+            raise
+        else:
+            raise HTTPException(status_code=500, detail='internal server error: {0}'.format(e))
         
 async def ai_langchain_test(data):
     result = None
@@ -63,4 +90,13 @@ async def ai_langchain_test(data):
             raise
         else:
             raise HTTPException(status_code=500, detail='internal server error: {0}'.format(e))
-        
\ No newline at end of file
+
+async def ai_langchain_reload(data):
+    try:
+        return await reload_chatbot_vector_store(data)
+    except Exception as e:
+        logger.error(str(e))
+        if isinstance(e, HTTPException):
+            raise
+        else:
+            raise HTTPException(status_code=500, detail='internal server error: {0}'.format(e))
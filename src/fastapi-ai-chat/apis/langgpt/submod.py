@@ -1,11 +1,15 @@
+import json
+import asyncio
 import logging
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, AsyncIterator, Optional, Tuple
 from fastapi import HTTPException
 from datetime import datetime
 
 from core.models import DynamicBaseModel
 
+from settings.configs import BATCH_ASK_MAX_QUESTIONS, BATCH_ASK_CONCURRENCY
+from utilities.batch_ask import answer_lines
 from utilities.validation_manager import validate_user
 from utilities.chatbot_faiss_test import ChatbotFAISSTest
 
@@ -44,11 +48,11 @@ async def query_conversation_history(data: DynamicBaseModel) -> Dict[str, Any]:
         }
     }
 
-async def ask_langchain_models(data: DynamicBaseModel) -> Dict[str, Any]:
-    # Retrieve instances from AppState
-    conversation_manager = app_state.conversation_manager
-    chat_bot = app_state.chat_bot
-
+def validate_ask_data(data: DynamicBaseModel, allow_compare: bool = False) -> Tuple[str, str, str, str]:
+    """
+    Validates an ask payload and returns (user_id, topic_id, question, model_choice).
+    With allow_compare, model may also be "BOTH" to answer with GPT and Claude side by side.
+    """
     key_required = ['user_id', 'topic_id', 'question', 'model']
     if not all(key in data.dict() for key in key_required):
         logger.error("Missing required field(s).")
@@ -57,8 +61,8 @@ async def ask_langchain_models(data: DynamicBaseModel) -> Dict[str, Any]:
     user_id = data.user_id
     topic_id = data.topic_id
     question = data.question.strip() if data.question else None
-    model_choice = data.model  # "GPT" or "CLAUDE"
-    models = ["GPT", "CLAUDE"]
+    model_choice = data.model  # "GPT" or "CLAUDE" (or "BOTH" if allow_compare)
+    models = ["GPT", "CLAUDE", "BOTH"] if allow_compare else ["GPT", "CLAUDE"]
     
     # Validation
     if not user_id:
@@ -72,26 +76,114 @@ async def ask_langchain_models(data: DynamicBaseModel) -> Dict[str, Any]:
         raise HTTPException(status_code=400, detail="Question cannot be empty.")
     if model_choice not in models:
         logger.error(f"Invalid model: {model_choice}.")
-        raise HTTPException(status_code=400, detail="Invalid model. Must be 'GPT' or 'CLAUDE'.")
+        raise HTTPException(status_code=400, detail=f"Invalid model. Must be one of: {', '.join(models)}.")
     
     # Validate user_id
     if not validate_user(user_id):
         logger.error(f"Invalid user_id: {user_id}")
         raise HTTPException(status_code=400, detail="Invalid user_id or topic_id.")
 
+    return user_id, topic_id, question, model_choice
+
+def validate_batch_data(data: DynamicBaseModel) -> Tuple[List[str], str, int]:
+    """
+    Validates a batch ask payload and returns (questions, model_choice, concurrency).
+    `concurrency` is optional and capped at BATCH_ASK_CONCURRENCY.
+    """
+    payload = data.dict()
+    key_required = ['user_id', 'questions', 'model']
+    if not all(key in payload for key in key_required):
+        logger.error("Missing required field(s).")
+        raise HTTPException(status_code=400, detail="Missing required field(s).")
+
+    user_id = data.user_id
+    questions = data.questions
+    model_choice = data.model
+    concurrency = payload.get("concurrency", BATCH_ASK_CONCURRENCY)
+    models = ["GPT", "CLAUDE"]
+
+    if not user_id:
+        logger.error("Received empty user_id.")
+        raise HTTPException(status_code=400, detail="User ID cannot be empty.")
+    if not isinstance(questions, list) or not questions:
+        logger.error("Received no questions.")
+        raise HTTPException(status_code=400, detail="Questions must be a non-empty list.")
+    if len(questions) > BATCH_ASK_MAX_QUESTIONS:
+        logger.error(f"Received {len(questions)} questions.")
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_ASK_MAX_QUESTIONS} questions per batch.")
+    if not all(isinstance(question, str) and question.strip() for question in questions):
+        logger.error("Received an empty question.")
+        raise HTTPException(status_code=400, detail="Questions cannot be empty.")
+    if model_choice not in models:
+        logger.error(f"Invalid model: {model_choice}.")
+        raise HTTPException(status_code=400, detail=f"Invalid model. Must be one of: {', '.join(models)}.")
+    if not isinstance(concurrency, int) or isinstance(concurrency, bool) or concurrency < 1:
+        logger.error(f"Invalid concurrency: {concurrency}.")
+        raise HTTPException(status_code=400, detail="Concurrency must be a positive integer.")
+
+    if not validate_user(user_id):
+        logger.error(f"Invalid user_id: {user_id}")
+        raise HTTPException(status_code=400, detail="Invalid user_id.")
+
+    return [question.strip() for question in questions], model_choice, min(concurrency, BATCH_ASK_CONCURRENCY)
+
+def get_collection(data: DynamicBaseModel) -> Optional[str]:
+    """The optional `collection` of an ask payload; the default corpus when absent."""
+    collection = getattr(data, "collection", None)
+    if collection is not None and not isinstance(collection, str):
+        logger.error(f"Invalid collection: {collection}.")
+        raise HTTPException(status_code=400, detail="Collection must be a string.")
+    return collection or None
+
+async def save_conversation_turn(user_id: str, topic_id: str, question: str, answer: str):
+    """
+    Stores the user question and bot answer in Redis and refreshes the session metadata.
+    """
+    conversation_manager = app_state.conversation_manager
+
+    # Store user question and bot answer in Redis
+    await conversation_manager.add_message(user_id, topic_id, 'user', question)
+    await conversation_manager.add_message(user_id, topic_id, 'bot', answer)
+
+    # Update session metadata (e.g., last active time)
+    current_timestamp = datetime.utcnow().isoformat()
+    await conversation_manager.update_session_metadata(user_id, topic_id, 'last_active', current_timestamp)
+
+async def ask_langchain_models(data: DynamicBaseModel) -> Dict[str, Any]:
+    # Retrieve instances from AppState
+    conversation_manager = app_state.conversation_manager
+    chat_bot = app_state.chat_bot
+
+    user_id, topic_id, question, model_choice = validate_ask_data(data, allow_compare=True)
+    collection = get_collection(data)
+
     # Retrieve conversation history
     conversation_history = await conversation_manager.get_conversation_history(user_id, topic_id)
 
-    # Construct prompt with conversation history
+    # Construct prompt with conversation history; retrieval and the answer cache use a standalone query instead
     user_query = construct_prompt(conversation_history, question)
+    retrieval_query = await chat_bot.condense_query(conversation_history, question)
     
     # Process the query with the AI model using the constructed prompt
-    answer_response = await chat_bot.process_query(user_id, topic_id, user_query, model_choice=model_choice)
+    answer_response = await chat_bot.process_query(
+        user_id, topic_id, user_query, model_choice=model_choice, collection=collection, retrieval_query=retrieval_query
+    )
     if "error_code" in answer_response:
         logger.error(f"Error from chat_bot: {answer_response.get('msg')}")
         raise HTTPException(status_code=400, detail=answer_response.get('msg', 'Bad request.'))
 
     data_field = answer_response.get("data", {})
+    if data_field.get("type_res") == "compare":
+        answers = data_field.get("answers", {})
+        await save_conversation_turn(user_id, topic_id, question, chat_bot.format_compared_answers(answers))
+        return {
+            "msg": "success",
+            "data": {
+                "answers": answers,
+                "type_res": "compare"
+            }
+        }
+
     answer = data_field.get("answer")
     type_res = data_field.get("type_res")
 
@@ -99,13 +191,7 @@ async def ask_langchain_models(data: DynamicBaseModel) -> Dict[str, Any]:
         logger.error("No answer returned from chat_bot.")
         raise HTTPException(status_code=500, detail="Failed to retrieve answer.")
 
-    # Store user question and bot answer in Redis
-    await conversation_manager.add_message(user_id, topic_id, 'user', question)
-    await conversation_manager.add_message(user_id, topic_id, 'bot', answer)
-
-    # Update session metadata (e.g., last active time)
-    current_timestamp = datetime.utcnow().isoformat()
-    await conversation_manager.update_session_metadata(user_id, topic_id, 'last_active', current_timestamp)
+    await save_conversation_turn(user_id, topic_id, question, answer)
 
     result = {
         "msg": "success",
@@ -116,10 +202,74 @@ async def ask_langchain_models(data: DynamicBaseModel) -> Dict[str, Any]:
     }
     return result
 
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """
+    Formats a single Server-Sent Event.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def ask_langchain_models_stream(data: DynamicBaseModel) -> AsyncIterator[str]:
+    """
+    Validates the request up front, then returns an async iterator of SSE messages:
+    `token` events as the model produces them, then a final `done` (or `error`) event.
+    """
+    conversation_manager = app_state.conversation_manager
+    chat_bot = app_state.chat_bot
+
+    user_id, topic_id, question, model_choice = validate_ask_data(data)
+    collection = get_collection(data)
+
+    conversation_history = await conversation_manager.get_conversation_history(user_id, topic_id)
+    user_query = construct_prompt(conversation_history, question)
+    retrieval_query = await chat_bot.condense_query(conversation_history, question)
+
+    async def event_stream() -> AsyncIterator[str]:
+        try:
+            events = chat_bot.stream_query(
+                user_id, topic_id, user_query, model_choice=model_choice, collection=collection,
+                retrieval_query=retrieval_query
+            )
+            async for event in events:
+                if event["event"] == "token":
+                    yield format_sse("token", {"token": event["token"]})
+                elif event["event"] == "error":
+                    logger.error(f"Error from chat_bot: {event.get('msg')}")
+                    yield format_sse("error", {"error_code": event.get("error_code"), "msg": event.get("msg")})
+                    return
+                elif event["event"] == "end":
+                    answer = event.get("answer")
+                    if not answer:
+                        logger.error("No answer returned from chat_bot.")
+                        yield format_sse("error", {"msg": "Failed to retrieve answer."})
+                        return
+
+                    await save_conversation_turn(user_id, topic_id, question, answer)
+                    yield format_sse("done", {"answer": answer, "type_res": event.get("type_res")})
+        except Exception as e:
+            logger.error(f"Error streaming answer: {e}")
+            yield format_sse("error", {"msg": f"internal server error: {e}"})
+
+    return event_stream()
+
+async def ask_langchain_models_batch(data: DynamicBaseModel) -> AsyncIterator[str]:
+    """
+    Validates the batch up front, then returns an async iterator of NDJSON lines: one per question
+    as it is answered, then a summary line (see utilities.batch_ask.answer_lines).
+    Batch questions are standalone: no conversation history is read or saved.
+    """
+    questions, model_choice, concurrency = validate_batch_data(data)
+    try:
+        chat_bot = await app_state.chat_bot.resolve_collection(get_collection(data))
+    except ValueError as e:
+        logger.error(str(e))
+        raise HTTPException(status_code=400, detail=str(e))
+    return answer_lines(chat_bot, questions, model_choice, concurrency)
+
 def construct_prompt(conversation_history: List[Dict], new_question: str) -> str:
     """
     Constructs a prompt including the conversation history and the new question.
-    Ensures that the format is clear and avoids redundancy.
+    Ensures that the format is clear and avoids redundancy. Only the answer is generated from it;
+    retrieval uses the condensed query (ChatbotFAISS.condense_query).
     """
     formatted_history = []
     for message in conversation_history:
@@ -154,4 +304,42 @@ async def test_chatbot_faiss(data: DynamicBaseModel) -> Dict[str, Any]:
         }
     except Exception as e:
         logger.error(str(e))
-        raise HTTPException(status_code=500, detail='Internal server error: {}'.format(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail='Internal server error: {}'.format(e))
+
+async def reload_chatbot_vector_store(data: Optional[DynamicBaseModel]) -> Dict[str, Any]:
+    """
+    Rebuilds the vector store of the default corpus (or `collection`) as a new version and switches to it.
+    Optional fields: full (reprocess every PDF), shards (shard numbers to rebuild), and rebuild=false
+    to only switch to a version another process has published.
+    """
+    payload = data.dict() if data else {}
+    full = payload.get("full", False)
+    rebuild = payload.get("rebuild", True)
+    shards = payload.get("shards")
+    if not isinstance(full, bool) or not isinstance(rebuild, bool):
+        raise HTTPException(status_code=400, detail="full and rebuild must be booleans.")
+    if shards is not None and (not isinstance(shards, list) or not all(isinstance(shard, int) for shard in shards)):
+        raise HTTPException(status_code=400, detail="shards must be a list of shard numbers.")
+
+    try:
+        chat_bot = await app_state.chat_bot.resolve_collection(get_collection(data) if data else None)
+        previous_version = chat_bot.loaded_version
+        if rebuild:
+            version = await asyncio.to_thread(chat_bot.rebuild_vector_store, full, shards)
+            # Cached answers were generated from the previous version
+            await chat_bot.clear_cache()
+        else:
+            await asyncio.to_thread(chat_bot.reload_published_version)
+            version = chat_bot.loaded_version
+        chat_bot.close_retired_chains()
+    except ValueError as e:
+        logger.error(str(e))
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {
+        "msg": "success",
+        "data": {
+            "version": version,
+            "previous_version": previous_version
+        }
+    }
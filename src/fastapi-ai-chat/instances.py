@@ -3,5 +3,6 @@
 class AppState:
     chat_bot = None
     conversation_manager = None
+    warm_up_task = None
 
 app_state = AppState()
\ No newline at end of file
@@ -1,16 +1,21 @@
 # main.py
 
+import asyncio
 import logging
 import sys
 
 from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
 
-from settings.configs import API_VERSION, API_PATH_FASTAPI_AI_CHAT, API_DOC
+from settings.configs import API_VERSION, API_PATH_FASTAPI_AI_CHAT, API_DOC, FAISS_LOAD_MODE, PERSIST_DIRECTORY, \
+                             VECTOR_STORE_SHARDS, VECTOR_STORE_SHARD_PARTITION
 from endpoint import api_router
 
 from utilities.conversation_manager import ConversationManager
 from utilities.chatbot_faiss import ChatbotFAISS
+from utilities.faiss_loader import preload_vector_store
+from utilities.index_versions import IndexVersions
+from utilities.vector_shards import ShardLayout
 
 from middlewares.redis_middleware import RedisMiddleware
 from instances import app_state  # Import AppState
@@ -57,6 +62,14 @@ app.include_router(api_router, prefix=API_PATH_FASTAPI_AI_CHAT)
 # Initialize global instances via AppState
 app_state.conversation_manager = ConversationManager()
 app_state.chat_bot = None  # Will be initialized asynchronously
+app_state.warm_up_task = None
+
+# With gunicorn --preload this runs once in the master before the workers are forked,
+# so all workers share the index pages instead of reading their own copy.
+if FAISS_LOAD_MODE == "preload":
+    store_directory = IndexVersions(PERSIST_DIRECTORY).directory()
+    for shard_folder in ShardLayout(store_directory, VECTOR_STORE_SHARDS, VECTOR_STORE_SHARD_PARTITION).folders():
+        preload_vector_store(shard_folder)
 
 @app.on_event("startup")
 async def startup_event():
@@ -65,10 +78,19 @@ async def startup_event():
     # Clear cache
     await app_state.conversation_manager.clear_cache()
 
-    # Initialize ChatbotFAISS
-    app_state.chat_bot = await ChatbotFAISS.create(redis_client=app_state.conversation_manager.redis_client)
+    # Initialize ChatbotFAISS in the background so the worker accepts traffic right away.
+    # /v1/ready/ reports progress; chat requests wait briefly or get 503 until it is ready.
+    app_state.chat_bot = ChatbotFAISS(redis_client=app_state.conversation_manager.redis_client)
+    app_state.warm_up_task = asyncio.create_task(app_state.chat_bot.warm_up())
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    if app_state.warm_up_task and not app_state.warm_up_task.done():
+        app_state.warm_up_task.cancel()
+    if app_state.chat_bot and app_state.chat_bot.version_watch:
+        app_state.chat_bot.version_watch.cancel()
+    if app_state.chat_bot:
+        # Model HTTP sessions, including those of chains swapped out by reloads
+        await app_state.chat_bot.aclose()
     await app_state.conversation_manager.redis_client.close()
     await app_state.chat_bot.redis_client.close()
\ No newline at end of file
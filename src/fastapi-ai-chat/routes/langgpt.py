@@ -2,24 +2,66 @@ from __future__ import annotations
 
 import asyncio
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Response
+from fastapi.responses import StreamingResponse
 from typing import Optional, Dict
 
-from core.auth import valid_access_token
+from core.auth import valid_access_token, valid_admin_token
 from core.models import DynamicBaseModel
 
-from utilities.dependencies import limit_concurrency
+from utilities.batch_ask import NDJSON_MEDIA_TYPE
+from utilities.dependencies import limit_concurrency, wait_until_ready
 
-from apis.langgpt.mainmod import get_conversation_history, ai_langchain_ask, ai_langchain_test
+from apis.langgpt.mainmod import get_conversation_history, ai_langchain_ask, ai_langchain_ask_stream, ai_langchain_test, \
+                                 ai_langchain_reload, ai_langchain_ask_batch
+
+from instances import app_state
 
 router = APIRouter()
 
+def chatbot_status():
+    return app_state.chat_bot.status if app_state.chat_bot else None
+
+chatbot_ready = wait_until_ready(chatbot_status)
+
 # Health check endpoint
 @router.get("/v1/health/")
 async def health_check() -> Dict[str, str]:
     """Health check endpoint for the AI Chat service"""
     return {"status": "healthy", "service": "ai-chat"}
 
+# Readiness endpoint
+@router.get("/v1/ready/")
+async def readiness_check(response: Response) -> Dict[str, object]:
+    """Reports background initialization progress; 503 until the chatbot can answer"""
+    startup_status = chatbot_status()
+    if startup_status is None:
+        response.status_code = 503
+        return {"status": "starting", "service": "ai-chat", "stage": "pending", "progress": 0}
+    if not startup_status.is_ready:
+        response.status_code = 503
+    state = "ready" if startup_status.is_ready else "failed" if startup_status.failed else "starting"
+    return {"status": state, "service": "ai-chat", **startup_status.to_dict()}
+
+# Runtime metrics endpoint
+@router.get("/v1/stats/")
+async def runtime_stats(
+    _: Dict[str, str] = Depends(valid_access_token),
+    __: None = Depends(chatbot_ready)
+) -> Dict[str, object]:
+    """Retrieval cache and embedding batcher metrics of this worker"""
+    return {"service": "ai-chat", **app_state.chat_bot.get_stats()}
+
+# Blue/green vector store reload
+@router.post("/v1/admin/reload/")
+async def reload_vector_store(
+    data: Optional[DynamicBaseModel] = None,
+    _: Dict[str, str] = Depends(valid_admin_token),
+    __: None = Depends(chatbot_ready)
+):
+    """Builds and publishes a new vector store version; every worker switches to it without downtime"""
+    return await ai_langchain_reload(data)
+
 @router.post("/v1/conversation/")
 async def conversation_history(
     data: Optional[DynamicBaseModel] = None,
@@ -31,6 +73,7 @@ async def conversation_history(
 async def ask_ai_langchain(
     data: Optional[DynamicBaseModel] = None,
     _: Dict[str, str] = Depends(valid_access_token),
+    __: None = Depends(chatbot_ready),
     semaphore: asyncio.Semaphore = Depends(limit_concurrency)
 ):
     try:
@@ -38,9 +81,64 @@ async def ask_ai_langchain(
     finally:
         semaphore.release()
 
+@router.post("/v1/ask/stream/")
+async def ask_ai_langchain_stream(
+    data: Optional[DynamicBaseModel] = None,
+    _: Dict[str, str] = Depends(valid_access_token),
+    __: None = Depends(chatbot_ready),
+    semaphore: asyncio.Semaphore = Depends(limit_concurrency)
+):
+    try:
+        events = await ai_langchain_ask_stream(data)
+    except Exception:
+        semaphore.release()
+        raise
+
+    async def release_when_done():
+        # Hold the concurrency slot until the stream is fully sent
+        try:
+            async for event in events:
+                yield event
+        finally:
+            semaphore.release()
+
+    return StreamingResponse(
+        release_when_done(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/v1/ask/batch/")
+async def ask_ai_langchain_batch(
+    data: Optional[DynamicBaseModel] = None,
+    _: Dict[str, str] = Depends(valid_access_token),
+    __: None = Depends(chatbot_ready),
+    semaphore: asyncio.Semaphore = Depends(limit_concurrency)
+):
+    try:
+        lines = await ai_langchain_ask_batch(data)
+    except Exception:
+        semaphore.release()
+        raise
+
+    async def release_when_done():
+        # One concurrency slot for the whole batch, held until the last line is sent
+        try:
+            async for line in lines:
+                yield line
+        finally:
+            semaphore.release()
+
+    return StreamingResponse(
+        release_when_done(),
+        media_type=NDJSON_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/v1/test/")
 async def test_ai_langchain(
     data: Optional[DynamicBaseModel] = None,
-    _: Dict[str, str] = Depends(valid_access_token)
+    _: Dict[str, str] = Depends(valid_access_token),
+    __: None = Depends(chatbot_ready)
 ):
     return await ai_langchain_test(data)
\ No newline at end of file
@@ -26,9 +26,16 @@ export PYTHONPATH="${PYTHONPATH}:/app/service"
 PORT=${PORT_FASTAPI_AI_CHAT:-80}
 echo "Using port: $PORT"
 
+# FAISS_LOAD_MODE=preload: import the app (and read the FAISS index) once in the master before forking
+PRELOAD_ARGS=""
+if [ "${FAISS_LOAD_MODE}" = "preload" ]; then
+    echo "Preloading the FAISS index in the Gunicorn master"
+    PRELOAD_ARGS="--preload"
+fi
+
 # Start Gunicorn with the environment variable
 echo "Starting Gunicorn..."
-exec gunicorn main:app -w 4 -k uvicorn.workers.UvicornWorker \
+exec gunicorn main:app -w 4 -k uvicorn.workers.UvicornWorker $PRELOAD_ARGS \
     --timeout 120 \
     --bind "0.0.0.0:$PORT" \
     --access-logfile - \
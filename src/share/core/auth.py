@@ -1,14 +1,15 @@
 # core/auth.py
 
+import hmac
 import logging
 
 from uuid import uuid4
-from typing import Dict
+from typing import Dict, Optional
 from datetime import timedelta
 
 from fastapi import HTTPException, Request, Header
 
-from settings.configs import USERNAME_ADMIN, PASSWORD_ADMIN
+from settings.configs import USERNAME_ADMIN, PASSWORD_ADMIN, ADMIN_API_TOKEN
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -35,6 +36,15 @@ async def valid_access_token(token: str = Header(...), request: Request = None)
 
     return {'detail': 'Valid access token!'}
 
+# Validate the admin token of /v1/admin/* (chat access tokens are not accepted there)
+async def valid_admin_token(x_admin_token: Optional[str] = Header(None)) -> Dict[str, str]:
+    if not ADMIN_API_TOKEN:
+        raise HTTPException(status_code=403, detail='Admin endpoints are disabled')
+    if not x_admin_token or not hmac.compare_digest(x_admin_token.encode(), ADMIN_API_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail='Invalid admin token')
+
+    return {'detail': 'Valid admin token!'}
+
 # Authenticate user and return access token
 async def authenticate_user(username: str, password: str) -> str:
     # Replace this with your own authentication logic
@@ -31,6 +31,8 @@ PORT_FASTAPI_AI_CHAT = os.environ["PORT_FASTAPI_AI_CHAT"]
 #### AUTHENTICATION ####
 USERNAME_ADMIN = os.environ["USERNAME_ADMIN"]
 PASSWORD_ADMIN = os.environ["PASSWORD_ADMIN"]
+# Separate credential for /v1/admin/* (X-Admin-Token header); empty disables the admin endpoints
+ADMIN_API_TOKEN = os.environ.get("ADMIN_API_TOKEN") or ""
 
 #### REDIS ####
 REDIS_HOST = os.environ["REDIS_HOST"]
@@ -41,6 +43,14 @@ MAX_TOKENS = 10000
 TEMPERATURE = os.environ["TEMPERATURE"]
 BUILD_VECTOR_STORE = os.environ["BUILD_VECTOR_STORE"]
 CLEAR_CACHE = os.environ["CLEAR_CACHE"]
+# Call the embeddings API once during startup to verify credentials (True or False)
+STARTUP_EMBEDDING_PROBE = os.environ.get("STARTUP_EMBEDDING_PROBE", "False")
+# How long a request waits for background initialization before it is rejected with 503
+STARTUP_WAIT_SECONDS = float(os.environ.get("STARTUP_WAIT_SECONDS") or 5)
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+INGESTION_WORKERS = int(os.environ.get("INGESTION_WORKERS") or os.cpu_count() or 1)
+INGESTION_PAGES_PER_TASK = int(os.environ.get("INGESTION_PAGES_PER_TASK") or 50)
 USER_IDS = ["dev_test007", "dev_test006"]
 
 #### AI Chat ####
@@ -52,6 +62,84 @@ OPENAI_API_KEY = os.environ["OPENAI_API_KEY"]
 MODEL_ID_GPT = os.environ["MODEL_ID_GPT"]
 PERSIST_DIRECTORY = os.environ["PERSIST_DIRECTORY"]
 PDF_DIRECTORY_PATH = os.environ["PDF_DIRECTORY_PATH"]
+# Set to an empty value to disable the persistent embedding cache
+EMBEDDING_CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH", os.path.join(PERSIST_DIRECTORY, "embedding_cache.sqlite3"))
+# Named collections selectable per request: PDFs in <COLLECTIONS_PDF_DIRECTORY>/<name>, index in
+# <COLLECTIONS_PERSIST_DIRECTORY>/<name>; loaded on first use, least recently used evicted over the budget
+COLLECTIONS_PDF_DIRECTORY = os.environ.get("COLLECTIONS_PDF_DIRECTORY") or ""
+COLLECTIONS_PERSIST_DIRECTORY = os.environ.get("COLLECTIONS_PERSIST_DIRECTORY") or os.path.join(PERSIST_DIRECTORY, "collections")
+COLLECTIONS_MEMORY_BUDGET_MB = float(os.environ.get("COLLECTIONS_MEMORY_BUDGET_MB") or 1024)
+COLLECTIONS_MAX_LOADED = int(os.environ.get("COLLECTIONS_MAX_LOADED") or 8)
+# Concurrent query embeddings are coalesced for up to this many ms (0 disables batching)
+EMBEDDING_BATCH_WINDOW_MS = float(os.environ.get("EMBEDDING_BATCH_WINDOW_MS") or 10)
+EMBEDDING_BATCH_MAX_SIZE = int(os.environ.get("EMBEDDING_BATCH_MAX_SIZE") or 64)
+
+#### FAISS Index ####
+# Flat, IVFFlat, IVFPQ or HNSW. Build parameters take effect on the next rebuild, search parameters on load.
+FAISS_INDEX_TYPE = os.environ.get("FAISS_INDEX_TYPE") or "Flat"
+FAISS_NLIST = int(os.environ.get("FAISS_NLIST") or 256)
+FAISS_NPROBE = int(os.environ.get("FAISS_NPROBE") or 16)
+FAISS_PQ_M = int(os.environ.get("FAISS_PQ_M") or 64)
+FAISS_PQ_NBITS = int(os.environ.get("FAISS_PQ_NBITS") or 8)
+FAISS_HNSW_M = int(os.environ.get("FAISS_HNSW_M") or 32)
+FAISS_EF_CONSTRUCTION = int(os.environ.get("FAISS_EF_CONSTRUCTION") or 200)
+FAISS_EF_SEARCH = int(os.environ.get("FAISS_EF_SEARCH") or 64)
+# default, mmap (IVF indexes) or preload (gunicorn --preload, shared copy-on-write by the workers)
+FAISS_LOAD_MODE = (os.environ.get("FAISS_LOAD_MODE") or "default").lower()
+# Vector storage of Flat/IVFFlat/HNSW: float32, float16, int8 (scalar quantization) or pca (to FAISS_PCA_DIMENSION)
+FAISS_VECTOR_ENCODING = (os.environ.get("FAISS_VECTOR_ENCODING") or "float32").lower()
+FAISS_PCA_DIMENSION = int(os.environ.get("FAISS_PCA_DIMENSION") or 256)
+# Lossy indexes re-score this many times the requested candidates with full-precision vectors (1 disables)
+FAISS_RESCORE_FACTOR = int(os.environ.get("FAISS_RESCORE_FACTOR") or 4)
+# Shards of the vector store (subfolders of PERSIST_DIRECTORY), searched in parallel and rebuilt independently
+VECTOR_STORE_SHARDS = int(os.environ.get("VECTOR_STORE_SHARDS") or 1)
+VECTOR_STORE_SHARD_PARTITION = (os.environ.get("VECTOR_STORE_SHARD_PARTITION") or "source").lower()
+# Rebuilds publish a new version under PERSIST_DIRECTORY/versions; this many recent versions are kept for rollback
+VECTOR_STORE_KEEP_VERSIONS = int(os.environ.get("VECTOR_STORE_KEEP_VERSIONS") or 3)
+# How often each worker checks for a version published by another worker (0 disables)
+VECTOR_STORE_WATCH_SECONDS = float(os.environ.get("VECTOR_STORE_WATCH_SECONDS") or 10)
+
+#### Retrieval ####
+# hybrid: FAISS + BM25 keyword search fused with Reciprocal Rank Fusion; dense: FAISS only
+RETRIEVAL_MODE = (os.environ.get("RETRIEVAL_MODE") or "hybrid").lower()
+RETRIEVAL_K = int(os.environ.get("RETRIEVAL_K") or 4)
+# Candidates taken from each side before fusion, and the RRF rank constant
+HYBRID_FETCH_K = int(os.environ.get("HYBRID_FETCH_K") or 20)
+HYBRID_RRF_K = int(os.environ.get("HYBRID_RRF_K") or 60)
+# Post-retrieval stage per chain: none, or mmr to drop near-duplicate chunks from RERANK_FETCH_K candidates
+RERANK_MODE = (os.environ.get("RERANK_MODE") or "none").lower()
+RERANK_MODE_GPT = (os.environ.get("RERANK_MODE_GPT") or RERANK_MODE).lower()
+RERANK_MODE_CLAUDE = (os.environ.get("RERANK_MODE_CLAUDE") or RERANK_MODE).lower()
+RERANK_FETCH_K = int(os.environ.get("RERANK_FETCH_K") or 20)
+# 1 ranks by relevance only, 0 by diversity only
+MMR_LAMBDA = float(os.environ.get("MMR_LAMBDA") or 0.7)
+# Token budget for the retrieved context of each prompt (0 disables packing)
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET") or 1500)
+CONTEXT_TOKEN_BUDGET_GPT = int(os.environ.get("CONTEXT_TOKEN_BUDGET_GPT") or CONTEXT_TOKEN_BUDGET)
+CONTEXT_TOKEN_BUDGET_CLAUDE = int(os.environ.get("CONTEXT_TOKEN_BUDGET_CLAUDE") or CONTEXT_TOKEN_BUDGET)
+# Adaptive k: drop chunks below this cosine similarity, or this far below the best chunk (0 disables)
+CONTEXT_MIN_SCORE = float(os.environ.get("CONTEXT_MIN_SCORE") or 0)
+CONTEXT_MAX_SCORE_GAP = float(os.environ.get("CONTEXT_MAX_SCORE_GAP") or 0.1)
+# Cache of retrieval results per normalized query and index version (0 entries disables it)
+RETRIEVAL_CACHE_SIZE = int(os.environ.get("RETRIEVAL_CACHE_SIZE") or 1024)
+RETRIEVAL_CACHE_TTL_SECONDS = float(os.environ.get("RETRIEVAL_CACHE_TTL_SECONDS") or 600)
+# What a conversation turn is retrieved and cached by: question (the latest question only), recent (with the
+# user's previous questions) or llm (rewritten into a standalone question); generation always sees the full history
+RETRIEVAL_QUERY_MODE = (os.environ.get("RETRIEVAL_QUERY_MODE") or "recent").lower()
+RETRIEVAL_QUERY_HISTORY_TURNS = int(os.environ.get("RETRIEVAL_QUERY_HISTORY_TURNS") or 1)
+RETRIEVAL_QUERY_MAX_CHARS = int(os.environ.get("RETRIEVAL_QUERY_MAX_CHARS") or 1000)
+# Batch ask (/v1/ask/batch/ and python -m utilities.batch_ask): questions per request and answers generated at a time
+BATCH_ASK_MAX_QUESTIONS = int(os.environ.get("BATCH_ASK_MAX_QUESTIONS") or 500)
+BATCH_ASK_CONCURRENCY = int(os.environ.get("BATCH_ASK_CONCURRENCY") or 8)
+# Answer cache: text (near-identical wording only) or semantic (looked up by the retrieval query's embedding,
+# RediSearch KNN or a local FAISS index); semantic hits need this cosine similarity. Opt-in: embeddings of
+# questions that differ in one name score close to the threshold, so tune it on real questions first
+ANSWER_CACHE_MODE = (os.environ.get("ANSWER_CACHE_MODE") or "text").lower()
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD") or 0.95)
+# Entries kept per collection without RediSearch; the oldest are dropped beyond it (0 keeps every entry)
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.environ.get("SEMANTIC_CACHE_MAX_ENTRIES") or 10000)
+# Questions kept per collection by the text cache; the oldest are dropped beyond it (0 keeps every question)
+TEXT_CACHE_MAX_ENTRIES = int(os.environ.get("TEXT_CACHE_MAX_ENTRIES") or 10000)
 
 #### AWS ####
 AWS_ACCESS_KEY_ID = os.environ["AWS_ACCESS_KEY_ID"]
@@ -0,0 +1,99 @@
+# utilities/batch_ask.py
+
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+
+from typing import AsyncIterator, List, Optional
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+def read_questions(path: str) -> List[str]:
+    """
+    Questions from a file: a JSON list (of strings or {"question": ...} objects), JSON lines
+    (.jsonl / .ndjson, the same items one per line) or plain text with one question per line.
+    Blank questions are skipped.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".json":
+        items = json.loads(text)
+    elif extension in (".jsonl", ".ndjson"):
+        items = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        items = text.splitlines()
+    questions = [item.get("question", "") if isinstance(item, dict) else item for item in items]
+    return [question.strip() for question in questions if isinstance(question, str) and question.strip()]
+
+async def answer_lines(chatbot, questions: List[str], model_choice: str, concurrency: int) -> AsyncIterator[str]:
+    """
+    ChatbotFAISS.answer_batch as NDJSON: one line per answered question, in completion order, then a
+    {"done": true, ...} line with the counts, so a reader can tell a complete stream from a cut one.
+    """
+    counts = {"cache": 0, "generate": 0, "error": 0}
+    start_time = time.time()
+    try:
+        async for item in chatbot.answer_batch(questions, model_choice=model_choice, concurrency=concurrency):
+            counts["error" if "error_code" in item else item.get("type_res", "generate")] += 1
+            yield json.dumps(item, ensure_ascii=False) + "\n"
+    except Exception as e:
+        logger.error(f"Error answering a batch of {len(questions)} questions: {e}")
+        yield json.dumps({"error_code": "04", "msg": f"Error processing batch: {str(e)}"}, ensure_ascii=False) + "\n"
+        return
+    yield json.dumps({
+        "done": True,
+        "questions": len(questions),
+        "cached": counts["cache"],
+        "generated": counts["generate"],
+        "errors": counts["error"],
+        "seconds": round(time.time() - start_time, 3)
+    }) + "\n"
+
+async def run(args: argparse.Namespace):
+    # Imported here so the settings are only required when the CLI actually runs
+    from utilities.chatbot_faiss import ChatbotFAISS
+    from utilities.redis_connector import get_client
+
+    questions = read_questions(args.questions)
+    if not questions:
+        raise SystemExit(f"No questions in {args.questions}.")
+    redis_client = await get_client()
+    default_chatbot = await ChatbotFAISS.create(redis_client)
+    try:
+        chatbot = await default_chatbot.resolve_collection(args.collection)
+        output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+        try:
+            async for line in answer_lines(chatbot, questions, args.model, args.concurrency):
+                output.write(line)
+                output.flush()
+        finally:
+            if output is not sys.stdout:
+                output.close()
+    finally:
+        # Like the API's shutdown: the model sessions of every loaded collection and the shard search threads
+        await default_chatbot.aclose()
+        await redis_client.close()
+
+def main(argv: Optional[List[str]] = None):
+    """python -m utilities.batch_ask <questions file>: answers every question in-process and writes NDJSON."""
+    from settings.configs import BATCH_ASK_CONCURRENCY
+
+    parser = argparse.ArgumentParser(description="Answer a file of questions with the chatbot, as NDJSON.")
+    parser.add_argument("questions", help="Text file (one question per line), JSON list or JSON lines")
+    parser.add_argument("--model", default="GPT", choices=["GPT", "CLAUDE"])
+    parser.add_argument("--collection", default=None, help="Named collection (the default corpus when omitted)")
+    parser.add_argument("--concurrency", type=int, default=BATCH_ASK_CONCURRENCY, help="Answers generated at a time")
+    parser.add_argument("--output", default=None, help="NDJSON file to write (stdout by default)")
+    asyncio.run(run(parser.parse_args(argv)))
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, stream=sys.stderr)
+    main()
@@ -0,0 +1,148 @@
+# utilities/bm25_index.py
+
+import os
+import re
+import math
+import logging
+import numpy as np
+
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utilities.chunk_store import chunk_ids_digest
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Thai is written without spaces between words, so Thai runs are indexed as character bigrams
+THAI_RUN = re.compile(r"[\u0E00-\u0E7F]+")
+TOKEN = re.compile(r"[\u0E00-\u0E7F]+|[^\W_]+")
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens; names, codes and numbers stay whole."""
+    tokens = []
+    for token in TOKEN.findall(text.lower()):
+        if len(token) > 2 and THAI_RUN.fullmatch(token):
+            tokens.extend(token[i:i + 2] for i in range(len(token) - 1))
+        else:
+            tokens.append(token)
+    return tokens
+
+class BM25Index:
+    """
+    Sparse inverted index over the chunks of the vector store, scored with Okapi BM25.
+    Postings are kept in CSR form (per-term slices of chunk rows and term frequencies),
+    so a query only touches the postings of its own terms.
+    """
+    FILE_NAME = "bm25_index.npz"
+
+    def __init__(self, chunk_ids: List[str], terms: List[str], offsets: np.ndarray, rows: np.ndarray,
+                 term_freqs: np.ndarray, doc_lengths: np.ndarray, k1: float = 1.5, b: float = 0.75):
+        self.chunk_ids = list(chunk_ids)
+        self.vocabulary = {term: term_id for term_id, term in enumerate(terms)}
+        self.offsets = offsets
+        self.rows = rows
+        self.term_freqs = term_freqs
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.average_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+        # chunk_ids_digest of the vector store the index was built from, None if unknown
+        self.ids_digest: Optional[str] = None
+
+    @classmethod
+    def build(cls, chunk_ids: Iterable[str], texts: Iterable[str], **kwargs) -> "BM25Index":
+        """Tokenizes the chunk texts and builds the postings."""
+        chunk_ids = list(chunk_ids)
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        doc_lengths = []
+        for row, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                postings.setdefault(term, []).append((row, count))
+        if len(doc_lengths) != len(chunk_ids):
+            raise ValueError("Every chunk id needs exactly one text.")
+
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        for term_id, term in enumerate(terms):
+            offsets[term_id + 1] = offsets[term_id] + len(postings[term])
+        entries = [entry for term in terms for entry in postings[term]]
+        rows = np.array([row for row, _ in entries], dtype=np.int32)
+        term_freqs = np.array([count for _, count in entries], dtype=np.float32)
+        return cls(chunk_ids, terms, offsets, rows, term_freqs, np.array(doc_lengths, dtype=np.float32), **kwargs)
+
+    @classmethod
+    def from_vector_store(cls, vector_store, **kwargs) -> "BM25Index":
+        """Builds the index from the chunks already in a FAISS vector store."""
+        chunk_ids = [chunk_id for _, chunk_id in sorted(vector_store.index_to_docstore_id.items())]
+        texts = (vector_store.docstore.search(chunk_id).page_content for chunk_id in chunk_ids)
+        index = cls.build(chunk_ids, texts, **kwargs)
+        index.ids_digest = chunk_ids_digest(vector_store)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    def save(self, folder_path: str):
+        """Writes the index atomically next to the FAISS index."""
+        path = os.path.join(folder_path, self.FILE_NAME)
+        tmp_path = f"{path}.tmp{os.getpid()}.npz"
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        np.savez(
+            tmp_path,
+            chunk_ids=np.array(self.chunk_ids, dtype=str),
+            terms=np.array(terms, dtype=str),
+            offsets=self.offsets,
+            rows=self.rows,
+            term_freqs=self.term_freqs,
+            doc_lengths=self.doc_lengths,
+            ids_digest=np.array(self.ids_digest or "", dtype=str)
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, folder_path: str, **kwargs) -> Optional["BM25Index"]:
+        """Loads the persisted index, or returns None if there is none."""
+        path = os.path.join(folder_path, cls.FILE_NAME)
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            index = cls(
+                data["chunk_ids"].tolist(), data["terms"].tolist(), data["offsets"], data["rows"],
+                data["term_freqs"], data["doc_lengths"], **kwargs
+            )
+            if "ids_digest" in data.files:
+                index.ids_digest = str(data["ids_digest"]) or None
+        return index
+
+    @classmethod
+    def remove(cls, folder_path: str) -> bool:
+        path = os.path.join(folder_path, cls.FILE_NAME)
+        if os.path.exists(path):
+            os.remove(path)
+            return True
+        return False
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Returns up to k (chunk_id, score) pairs with a positive BM25 score, best first."""
+        if not self.chunk_ids or k <= 0:
+            return []
+        scores = np.zeros(len(self.chunk_ids), dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            rows, term_freqs = self.rows[start:end], self.term_freqs[start:end]
+            document_frequency = end - start
+            idf = math.log(1 + (len(self.chunk_ids) - document_frequency + 0.5) / (document_frequency + 0.5))
+            length_norm = 1 - self.b + self.b * self.doc_lengths[rows] / self.average_length
+            scores[rows] += idf * term_freqs * (self.k1 + 1) / (term_freqs + self.k1 * length_norm)
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(self.chunk_ids[row], float(scores[row])) for row in ranked]
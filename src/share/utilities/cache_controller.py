@@ -1,43 +1,62 @@
 import logging
 import redis.asyncio as redis
-import numpy as np
 
-from typing import Dict, List, Optional, Any, Tuple
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from typing import List, Optional, Tuple
+
+from utilities.question_index import QuestionIndex, codes
 
 class CacheAnswer:
-    def __init__(self, redis_client: redis.Redis):
+    # Cosine similarity of QuestionIndex features (normalized term counts of BM25 tokens, no IDF). Not the
+    # TF-IDF cosine this threshold was first tuned on: shared common words weigh more than they did there
+    SIMILARITY_THRESHOLD = 0.98
+
+    def __init__(self, redis_client: redis.Redis, hash_key: str = 'cache_questions', max_entries: int = 10000):
         self.redis_client = redis_client
+        self.hash_key = hash_key  # One hash per collection, so answers never leak between document sets
+        # Questions in insertion order, so every worker can apply the others' inserts to its own index
+        self.log_key = f"{hash_key}:log"
+        # Bumped by clear_cache and compaction, so workers reload even when the log is back to the same length
+        self.generation_key = f"{hash_key}:generation"
+        # Past max_entries (0 keeps every entry) the oldest questions are dropped, every `slack` inserts
+        self.max_entries = max_entries
+        self.slack = max(1, max_entries // 10)
+        self.compact_lock_key = f"{hash_key}:compacting"
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.INFO)
-        self.vectorizer = TfidfVectorizer()
-        self.cached_questions = []
-        self.cached_vectors = None
-        
-    async def _update_vectorizer(self):
-        """Update the TF-IDF vectorizer with current questions"""
+        self.index = QuestionIndex()
+        self.synced = None  # Log entries applied to the index; None until it is first loaded
+        self.generation = None
+
+    async def _sync_index(self):
+        """
+        Brings the in-memory index up to date with Redis: the whole hash on first use (or after a worker
+        cleared the cache), afterwards only the log entries added since the last call.
+        """
         try:
-            # Get all questions from Redis
-            all_questions = await self.redis_client.hgetall('cache_questions')
-            if all_questions:
-                # Convert binary keys to strings if decode_responses is False
-                self.cached_questions = [k.decode('utf-8') if isinstance(k, bytes) else k 
-                                      for k in all_questions.keys()]
-                self.cached_vectors = self.vectorizer.fit_transform(self.cached_questions)
-                self.logger.info(f"Updated vectorizer with {len(self.cached_questions)} questions")
-            else:
-                self.cached_questions = []
-                self.cached_vectors = None
-                self.logger.info("No questions in cache to update vectorizer")
+            generation = await self.redis_client.get(self.generation_key)
+            length = await self.redis_client.llen(self.log_key)
+            if self.synced is None or generation != self.generation or length < self.synced:
+                # Read the log length first: anything added after it is both in the hash and in the log tail
+                questions = await self.redis_client.hkeys(self.hash_key)
+                self.index.clear()
+                self.index.add_many(self._decode(question) for question in questions)
+                self.synced = length
+                self.generation = generation
+                self.logger.info(f"Loaded {len(self.index)} cached questions into the similarity index")
+            elif length > self.synced:
+                start = self.synced
+                questions = await self.redis_client.lrange(self.log_key, start, length - 1)
+                for question in questions:
+                    self.index.add(self._decode(question))
+                # Concurrent requests may apply the same entries; the index skips questions it already has
+                self.synced = max(self.synced or 0, start + len(questions))
         except Exception as e:
-            self.logger.error(f"Error updating vectorizer: {str(e)}")
-            self.cached_questions = []
-            self.cached_vectors = None
+            self.logger.error(f"Error syncing the cache index: {str(e)}")
 
-    def _calculate_similarity(self, query_vector: np.ndarray, cached_vectors: np.ndarray) -> np.ndarray:
-        """Calculate cosine similarity between query and cached vectors"""
-        return cosine_similarity(query_vector.reshape(1, -1), cached_vectors)[0]
+    @staticmethod
+    def _decode(value) -> str:
+        # Binary keys when decode_responses is False
+        return value.decode('utf-8') if isinstance(value, bytes) else value
 
     def _preprocess_question(self, question: str) -> str:
         """Preprocess question by removing common prefixes and normalizing"""
@@ -49,6 +68,11 @@ class CacheAnswer:
                 cleaned = cleaned[len(prefix):]
         return cleaned.strip()
 
+    def _matches(self, question: str, cached_question: Optional[str], similarity: float) -> bool:
+        """Whether a cached question stands for this one: near-identical wording and the same codes and numbers."""
+        return cached_question is not None and similarity >= self.SIMILARITY_THRESHOLD \
+            and codes(cached_question) == codes(question)
+
     async def check_cache(self, question: str) -> Tuple[Optional[List[str]], Optional[str]]:
         """Check cache for similar questions and return answers with status"""
         try:
@@ -56,34 +80,26 @@ class CacheAnswer:
             cleaned_question = self._preprocess_question(question)
             self.logger.info(f"check_cache | Searching for question: {cleaned_question}")
             
-            # Update vectorizer with current cache
-            await self._update_vectorizer()
+            await self._sync_index()
             
             # If no cached questions, return None, None
-            if not self.cached_questions:
+            if not len(self.index):
                 self.logger.info("check_cache | No cached questions available")
                 return None, None
             
-            # Calculate similarity with existing questions
-            query_vector = self.vectorizer.transform([cleaned_question])
-            similarities = self._calculate_similarity(query_vector.toarray()[0], self.cached_vectors.toarray())
-            max_similarity = np.max(similarities)
-            best_match_idx = np.argmax(similarities)
-            best_match_question = self.cached_questions[best_match_idx]
+            # Exact matches (ignoring case) score 1.0
+            best_match_question, max_similarity = self.index.search(cleaned_question)
             
             self.logger.info(f"check_cache | Max similarity: {max_similarity}")
             self.logger.info(f"check_cache | Best match question: {best_match_question}")
             self.logger.info(f"check_cache | Current question: {cleaned_question}")
             
-            # If exact match or very high similarity (>=0.98), return the cached answer
-            if max_similarity >= 0.98 or cleaned_question.lower() == self._preprocess_question(best_match_question).lower():
-                answer = await self.redis_client.hget('cache_questions', best_match_question)
+            # If exact match or very high similarity (>=0.98) with the same codes and numbers, return the cached answer
+            if self._matches(cleaned_question, best_match_question, max_similarity):
+                answer = await self.redis_client.hget(self.hash_key, best_match_question)
                 if answer:
-                    # Decode answer if it's bytes
-                    if isinstance(answer, bytes):
-                        answer = answer.decode('utf-8')
                     self.logger.info("check_cache | Found matching cached answer")
-                    return [answer], "cache"
+                    return [self._decode(answer)], "cache"
             
             self.logger.info("check_cache | No matching answer found")
             return None, None
@@ -99,30 +115,50 @@ class CacheAnswer:
             cleaned_question = self._preprocess_question(question)
             self.logger.info(f"add_to_cache | Adding new Q&A pair. Question length: {len(cleaned_question)}, Answer length: {len(answer)}")
             
-            # Update vectorizer to get current cache state
-            await self._update_vectorizer()
+            await self._sync_index()
             
             # Check similarity with existing questions
-            if self.cached_vectors is not None and self.cached_questions:
-                query_vector = self.vectorizer.transform([cleaned_question])
-                similarities = self._calculate_similarity(query_vector.toarray()[0], self.cached_vectors.toarray())
-                max_similarity = np.max(similarities)
-                
-                if max_similarity >= 0.98:
+            similar_question, max_similarity = self.index.search(cleaned_question)
+            if self._matches(cleaned_question, similar_question, max_similarity):
+                if await self.redis_client.hexists(self.hash_key, similar_question):
                     self.logger.info("add_to_cache | Similar question already exists in cache")
                     return
+                # Deleted from Redis since it was indexed
+                self.index.remove(similar_question)
             
             # Add new question-answer pair to cache
-            await self.redis_client.hset('cache_questions', cleaned_question, answer)
+            await self.redis_client.hset(self.hash_key, cleaned_question, answer)
+            length = await self.redis_client.rpush(self.log_key, cleaned_question)
+            self.index.add(cleaned_question)
             self.logger.info("add_to_cache | Added new question-answer pair to cache")
+            if self.max_entries > 0 and length > self.max_entries + self.slack:
+                await self._compact()
             
         except Exception as e:
             self.logger.error(f"Error adding to cache: {str(e)}")
 
+    async def _compact(self):
+        """Deletes the oldest questions beyond max_entries and trims them from the log. One worker at a time."""
+        if not await self.redis_client.set(self.compact_lock_key, 1, nx=True, ex=60):
+            return
+        try:
+            excess = await self.redis_client.llen(self.log_key) - self.max_entries
+            if excess <= 0:
+                return
+            questions = await self.redis_client.lrange(self.log_key, 0, excess - 1)
+            await self.redis_client.hdel(self.hash_key, *questions)
+            # Inserts only append, so the first `excess` items are still the ones read above
+            await self.redis_client.ltrim(self.log_key, excess, -1)
+            await self.redis_client.incr(self.generation_key)
+            self.logger.info(f"Dropped the {excess} oldest questions of the answer cache '{self.hash_key}'.")
+        finally:
+            await self.redis_client.delete(self.compact_lock_key)
+
     def remove_cache_entry(self, doc_id: str):
         """Remove a specific cache entry"""
         try:
-            self.redis_client.hdel('cache_questions', doc_id)
+            self.redis_client.hdel(self.hash_key, doc_id)
+            self.index.remove(doc_id)
             self.logger.info(f"Removed cache entry with doc_id: {doc_id}")
         except Exception as e:
             self.logger.error(f"Error removing cache entry {doc_id}: {e}")
@@ -130,7 +166,10 @@ class CacheAnswer:
     async def clear_cache(self):
         """Clear all cache entries"""
         try:
-            await self.redis_client.delete('cache_questions')
+            await self.redis_client.delete(self.hash_key, self.log_key)
+            await self.redis_client.incr(self.generation_key)
+            self.index.clear()
+            self.synced = None
             self.logger.info("Cleared Redis cache.")
         except Exception as e:
-            self.logger.error(f"Error clearing cache: {e}")
\ No newline at end of file
+            self.logger.error(f"Error clearing cache: {e}")
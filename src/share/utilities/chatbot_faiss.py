@@ -4,6 +4,7 @@ import os
 import time
 import logging
 import asyncio
+import threading
 import numpy as np
 import faiss
 import uuid
@@ -11,59 +12,139 @@ import random
 import json
 import openai
 
-from typing import List
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
 from datetime import datetime, timedelta
-from redis.commands.search.query import Query
-from redis.commands.search.field import TextField, NumericField, VectorField
-from redis.commands.search.indexDefinition import IndexDefinition
+from concurrent.futures import ThreadPoolExecutor
 
 from difflib import SequenceMatcher
+from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
-from langchain_community.document_loaders import PyPDFLoader
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
-from langchain.text_splitter import CharacterTextSplitter
 from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
 
 from settings.configs import OPENAI_API_KEY, MODEL_ID_GPT, MODEL_ID_CLAUDE, PERSIST_DIRECTORY, \
                                 PDF_DIRECTORY_PATH, TEMPERATURE, BUILD_VECTOR_STORE, \
                                 CLEAR_CACHE, AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, \
-                                AWS_REGION_NAME
+                                AWS_REGION_NAME, CHUNK_SIZE, CHUNK_OVERLAP, INGESTION_WORKERS, \
+                                INGESTION_PAGES_PER_TASK, EMBEDDING_CACHE_PATH, EMBEDDING_BATCH_WINDOW_MS, \
+                                EMBEDDING_BATCH_MAX_SIZE, STARTUP_EMBEDDING_PROBE, FAISS_INDEX_TYPE, \
+                                FAISS_NLIST, FAISS_NPROBE, FAISS_PQ_M, FAISS_PQ_NBITS, FAISS_HNSW_M, \
+                                FAISS_EF_CONSTRUCTION, FAISS_EF_SEARCH, FAISS_LOAD_MODE, RETRIEVAL_MODE, \
+                                RETRIEVAL_K, HYBRID_FETCH_K, HYBRID_RRF_K, RERANK_MODE_GPT, RERANK_MODE_CLAUDE, \
+                                RERANK_FETCH_K, MMR_LAMBDA, CONTEXT_TOKEN_BUDGET_GPT, CONTEXT_TOKEN_BUDGET_CLAUDE, \
+                                CONTEXT_MIN_SCORE, CONTEXT_MAX_SCORE_GAP, RETRIEVAL_CACHE_SIZE, \
+                                RETRIEVAL_CACHE_TTL_SECONDS, VECTOR_STORE_SHARDS, VECTOR_STORE_SHARD_PARTITION, \
+                                COLLECTIONS_PDF_DIRECTORY, COLLECTIONS_PERSIST_DIRECTORY, COLLECTIONS_MEMORY_BUDGET_MB, \
+                                COLLECTIONS_MAX_LOADED, VECTOR_STORE_KEEP_VERSIONS, VECTOR_STORE_WATCH_SECONDS, \
+                                RETRIEVAL_QUERY_MODE, RETRIEVAL_QUERY_HISTORY_TURNS, RETRIEVAL_QUERY_MAX_CHARS, \
+                                FAISS_VECTOR_ENCODING, FAISS_PCA_DIMENSION, FAISS_RESCORE_FACTOR, BATCH_ASK_CONCURRENCY, \
+                                ANSWER_CACHE_MODE, SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_MAX_ENTRIES, \
+                                TEXT_CACHE_MAX_ENTRIES
 
 # Load Agents
 from utilities.llm.openai_llm import OpenAIChatLLM
 from utilities.llm.aws_bedrock_claude import AWSBedrockClaude
+from utilities.bm25_index import BM25Index
 from utilities.bot_profiles import BotProfiles
 from utilities.cache_controller import CacheAnswer
+from utilities.embedding_batcher import EmbeddingBatcher
+from utilities.embedding_cache import EmbeddingCache
+from utilities.faiss_index_factory import FaissIndexSettings, reconstruct_vectors
+from utilities.hybrid_retriever import HybridRetriever
+from utilities.index_versions import IndexVersions
+from utilities.chunk_store import ChunkStore, chunk_ids_digest
+from utilities.context_packer import ContextPacker
+from utilities.faiss_loader import LOAD_MODES, LEGACY_DOCSTORE_FILE, get_preloaded, index_version, \
+                                    log_memory_usage, read_vector_store_files, save_vector_store
+from utilities.ingestion_manifest import IngestionManifest
+from utilities.knowledge_bases import KnowledgeBases
+from utilities.pdf_ingestion import PDFIngestionPool
+from utilities.query_condenser import QueryCondenser
+from utilities.reranker import RERANK_MODES, RerankingRetriever
+from utilities.retrieval_cache import RetrievalCache
+from utilities.semantic_cache import SemanticCache
+from utilities.startup_status import StartupStatus
+from utilities.vector_compression import FullVectors, RescoringFAISS
+from utilities.vector_shards import ShardLayout, ShardedVectorStore
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 class SimpleOpenAIEmbeddings(Embeddings):
-    """Simple embeddings class that uses OpenAI API directly."""
+    """
+    Simple embeddings class that uses OpenAI API directly.
+    When an EmbeddingCache is given, only document texts missing from it are sent to the API; queries are
+    never cached, since their texts rarely repeat and would grow the table without bound.
+    With a positive `batch_window_ms`, concurrent aembed_query calls are coalesced into one request.
+    """
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, cache: Optional[EmbeddingCache] = None,
+                 batch_window_ms: float = 0, batch_max_size: int = 64):
         self.client = openai.OpenAI(api_key=api_key)
+        self.async_client = openai.AsyncOpenAI(api_key=api_key)
         self.model = "text-embedding-ada-002"
+        self.batch_size = 100
+        self.cache = cache
+        self.batcher = EmbeddingBatcher(self.aembed_queries, batch_window_ms, batch_max_size) \
+            if batch_window_ms > 0 else None
+
+    @staticmethod
+    def _normalize(vectors: List[List[float]]) -> np.ndarray:
+        """L2-normalize embeddings so inner product equals cosine similarity."""
+        embeddings = np.array(vectors).astype("float32")
+        faiss.normalize_L2(embeddings)
+        return embeddings
+
+    def _lookup_cache(self, texts: List[str]) -> Tuple[List[Optional[np.ndarray]], List[int]]:
+        """Returns the cached vectors (None for misses) and the indices of the misses."""
+        vectors = self.cache.get_many(self.model, texts) if self.cache is not None else [None] * len(texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        return vectors, missing
+
+    def _merge_misses(self, texts: List[str], vectors: List[Optional[np.ndarray]],
+                      missing: List[int], new_vectors: np.ndarray) -> List[List[float]]:
+        """Stores freshly embedded texts in the cache and fills them into the result."""
+        if missing:
+            if self.cache is not None:
+                self.cache.put_many(self.model, [texts[i] for i in missing], new_vectors)
+            for i, vector in zip(missing, new_vectors):
+                vectors[i] = vector
+        if self.cache is not None and len(texts) > 1:
+            logger.info(f"Embedding cache | {len(texts) - len(missing)} hits, {len(missing)} misses")
+        return np.vstack(vectors).tolist()
+
+    def _request_embeddings(self, texts: List[str]) -> np.ndarray:
+        all_embeddings = []
+        for i in range(0, len(texts), self.batch_size):
+            batch = texts[i:i + self.batch_size]
+            response = self.client.embeddings.create(
+                model=self.model,
+                input=batch
+            )
+            all_embeddings.extend(item.embedding for item in response.data)
+        return self._normalize(all_embeddings)
+
+    async def _arequest_embeddings(self, texts: List[str]) -> np.ndarray:
+        all_embeddings = []
+        for i in range(0, len(texts), self.batch_size):
+            batch = texts[i:i + self.batch_size]
+            response = await self.async_client.embeddings.create(
+                model=self.model,
+                input=batch
+            )
+            all_embeddings.extend(item.embedding for item in response.data)
+        return self._normalize(all_embeddings)
         
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """Get embeddings for multiple texts."""
         if not texts:
             return []
         try:
-            batch_size = 100
-            all_embeddings = []
-            for i in range(0, len(texts), batch_size):
-                batch = texts[i:i + batch_size]
-                response = self.client.embeddings.create(
-                    model=self.model,
-                    input=batch
-                )
-                batch_embeddings = [item.embedding for item in response.data]
-                all_embeddings.extend(batch_embeddings)
-            embeddings = np.array(all_embeddings).astype("float32")
-            faiss.normalize_L2(embeddings)
-            return embeddings.tolist()
+            vectors, missing = self._lookup_cache(texts)
+            new_vectors = self._request_embeddings([texts[i] for i in missing]) if missing else None
+            return self._merge_misses(texts, vectors, missing, new_vectors)
         except Exception as e:
             logger.error(f"Error in embed_documents: {str(e)}")
             raise
@@ -71,30 +152,74 @@ class SimpleOpenAIEmbeddings(Embeddings):
     def embed_query(self, text: str) -> List[float]:
         """Get embeddings for a single text."""
         try:
-            response = self.client.embeddings.create(
-                model=self.model,
-                input=text
-            )
-            # Extract the embedding from the response
-            embedding = response.data[0].embedding
-            embedding = np.array(embedding).astype("float32")
-            faiss.normalize_L2(embedding.reshape(1, -1))
-            return embedding.flatten().tolist()
+            return self._request_embeddings([text])[0].tolist()
         except Exception as e:
             logger.error(f"Error in embed_query: {str(e)}")
             raise
 
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Get embeddings for multiple texts without blocking the event loop."""
+        if not texts:
+            return []
+        try:
+            if self.cache is None:
+                return (await self._arequest_embeddings(texts)).tolist()
+            # SQLite calls block, so they run in a worker thread
+            vectors, missing = await asyncio.to_thread(self._lookup_cache, texts)
+            new_vectors = await self._arequest_embeddings([texts[i] for i in missing]) if missing else None
+            return await asyncio.to_thread(self._merge_misses, texts, vectors, missing, new_vectors)
+        except Exception as e:
+            logger.error(f"Error in aembed_documents: {str(e)}")
+            raise
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Get embeddings for several query texts in one request, bypassing the cache."""
+        if not texts:
+            return []
+        try:
+            return (await self._arequest_embeddings(texts)).tolist()
+        except Exception as e:
+            logger.error(f"Error in aembed_queries: {str(e)}")
+            raise
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Get embeddings for a single text without blocking the event loop."""
+        try:
+            if self.batcher is not None:
+                return await self.batcher.embed(text)
+            return (await self.aembed_queries([text]))[0]
+        except Exception as e:
+            logger.error(f"Error in aembed_query: {str(e)}")
+            raise
+
 class ChatbotFAISS:
     """
     ChatbotFAISS processes user queries using FAISS for vector similarity search and caching.
     Now handles conversations based on user_id and topic_id.
     Supports multiple AI models: GPT and Claude.
+    The default instance serves PDF_DIRECTORY_PATH and loads named collections on demand;
+    an instance created with `collection` serves that collection's documents only.
     """
-    def __init__(self, redis_client):
+    # model_choice that answers with every model from one retrieval
+    COMPARE_MODEL = "BOTH"
+    # collection name of the corpus in PDF_DIRECTORY_PATH / PERSIST_DIRECTORY
+    DEFAULT_COLLECTION = "default"
+    # Answer cache looked up by the retrieval embedding; None keeps only the text cache
+    semantic_cache: Optional[SemanticCache] = None
+    # How long replaced QA chains stay open for the requests still using them
+    RETIRED_CHAINS_GRACE_SECONDS = 120
+
+    def __init__(self, redis_client, collection: Optional[str] = None):
         # Initialize variables that don't require async
-        self.lock = asyncio.Lock()
-        self.persist_directory = PERSIST_DIRECTORY
-        self.pdf_directory_path = PDF_DIRECTORY_PATH
+        # Only rebuilds are serialized; queries read a snapshot of the vector store and chains
+        self.rebuild_lock = threading.Lock()
+        self.collection = collection
+        if collection is None:
+            self.persist_directory = PERSIST_DIRECTORY
+            self.pdf_directory_path = PDF_DIRECTORY_PATH
+        else:
+            self.persist_directory = os.path.join(COLLECTIONS_PERSIST_DIRECTORY, collection)
+            self.pdf_directory_path = os.path.join(COLLECTIONS_PDF_DIRECTORY, collection)
         self.OPENAI_API_KEY = OPENAI_API_KEY
         self.MODEL_ID_GPT = MODEL_ID_GPT
         self.MODEL_ID_CLAUDE = MODEL_ID_CLAUDE
@@ -109,18 +234,103 @@ class ChatbotFAISS:
         
         # Initialize Redis client and cache controller
         self.redis_client = redis_client
-        self.cache_controller = CacheAnswer(redis_client)
+        self.cache_controller = CacheAnswer(redis_client, max_entries=TEXT_CACHE_MAX_ENTRIES) if collection is None \
+            else CacheAnswer(redis_client, f"cache_questions:{collection}", TEXT_CACHE_MAX_ENTRIES)
+        if ANSWER_CACHE_MODE == "semantic":
+            self.semantic_cache = SemanticCache(redis_client, collection or self.DEFAULT_COLLECTION,
+                                                SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_MAX_ENTRIES)
+        elif ANSWER_CACHE_MODE != "text":
+            logger.warning(f"Unknown ANSWER_CACHE_MODE '{ANSWER_CACHE_MODE}'; using the text cache.")
         self.bot_profiles = BotProfiles()
         self.profile = self.bot_profiles.get_random_profile()
-
+        self.index_settings = FaissIndexSettings(
+            index_type=FAISS_INDEX_TYPE,
+            nlist=FAISS_NLIST,
+            nprobe=FAISS_NPROBE,
+            pq_m=FAISS_PQ_M,
+            pq_nbits=FAISS_PQ_NBITS,
+            hnsw_m=FAISS_HNSW_M,
+            ef_construction=FAISS_EF_CONSTRUCTION,
+            ef_search=FAISS_EF_SEARCH,
+            vector_encoding=FAISS_VECTOR_ENCODING,
+            pca_dimension=FAISS_PCA_DIMENSION,
+            rescore_factor=FAISS_RESCORE_FACTOR
+        )
+        if FAISS_LOAD_MODE not in LOAD_MODES:
+            logger.warning(f"Unknown FAISS_LOAD_MODE '{FAISS_LOAD_MODE}'; loading the index normally.")
+        self.load_mode = FAISS_LOAD_MODE if FAISS_LOAD_MODE in LOAD_MODES else "default"
+        # Rebuilds publish new versions of the store next to the live one (see IndexVersions)
+        self.index_versions = IndexVersions(self.persist_directory, keep=VECTOR_STORE_KEEP_VERSIONS)
+        self.store_directory = self.persist_directory
+        self.loaded_version = None
+        self.rejected_version = None
+        self.shard_layout = ShardLayout(self.store_directory, VECTOR_STORE_SHARDS, VECTOR_STORE_SHARD_PARTITION)
+        # One search thread per shard, shared by every snapshot of the sharded store (and by the collections)
+        self.shard_search_pool = ThreadPoolExecutor(max_workers=VECTOR_STORE_SHARDS, thread_name_prefix="faiss-shard") \
+            if self.shard_layout.sharded and collection is None else None
+        self.retrieval_cache = RetrievalCache(RETRIEVAL_CACHE_SIZE, RETRIEVAL_CACHE_TTL_SECONDS) \
+            if RETRIEVAL_CACHE_SIZE > 0 else None
+        self.context_token_budgets = {"GPT": CONTEXT_TOKEN_BUDGET_GPT, "CLAUDE": CONTEXT_TOKEN_BUDGET_CLAUDE}
+        # Standalone retrieval query of a conversation turn (the llm mode rewrites it with the GPT model)
+        self.query_condenser = QueryCondenser(
+            mode=RETRIEVAL_QUERY_MODE,
+            history_turns=RETRIEVAL_QUERY_HISTORY_TURNS,
+            max_chars=RETRIEVAL_QUERY_MAX_CHARS,
+            llm=OpenAIChatLLM(
+                openai_api_key=self.OPENAI_API_KEY,
+                model_name=self.MODEL_ID_GPT,
+                temperature=0
+            ) if RETRIEVAL_QUERY_MODE == "llm" else None
+        )
+        self.rerank_modes = {"GPT": RERANK_MODE_GPT, "CLAUDE": RERANK_MODE_CLAUDE}
+        for model, mode in self.rerank_modes.items():
+            if mode not in RERANK_MODES:
+                logger.warning(f"Unknown rerank mode '{mode}' for {model}; candidates are not reranked.")
+                self.rerank_modes[model] = "none"
+        self.ingestion_pool = PDFIngestionPool(
+            max_workers=INGESTION_WORKERS,
+            pages_per_task=INGESTION_PAGES_PER_TASK,
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=CHUNK_OVERLAP
+        )
+
+        # Named collections, loaded on first use (only the default instance has them)
+        self.collections = KnowledgeBases(
+            factory=self.create_collection_chatbot,
+            pdf_root=COLLECTIONS_PDF_DIRECTORY,
+            persist_root=COLLECTIONS_PERSIST_DIRECTORY,
+            memory_budget_mb=COLLECTIONS_MEMORY_BUDGET_MB,
+            max_loaded=COLLECTIONS_MAX_LOADED,
+            on_unload=lambda chatbot: chatbot.retire_chains(chatbot.qa_chains)
+        ) if collection is None and COLLECTIONS_PDF_DIRECTORY else None
+
+        # Heavy resources are loaded by initialize()/warm_up(); progress is reported through self.status
+        self.status = StartupStatus()
+        self.embeddings = None
+        self.vector_store = None
+        self.qa_chains = {}
+        self.version_watch = None
+        # Chains replaced by a swap or unloaded with their collection, waiting for close_retired_chains
+        self.retired_chains: List[Dict[str, RetrievalQA]] = []
+        # Scheduled closes and the chains each one closes
+        self.closing_tasks: Dict[asyncio.Task, List[Dict[str, RetrievalQA]]] = {}
+
+    def initialize(self):
+        """
+        Loads embeddings, the vector store and the QA chains. Blocking; run it off the event loop.
+        """
         try:
             logger.info("STEP 1 : Initializing ChatbotFAISS... | 0%/100%")
-            # Initialize embeddings
-            self.embeddings = self.initialize_embeddings()
+            self.status.set_stage("embeddings", 0)
+            # Initialize embeddings (collections reuse the default instance's client and cache)
+            if self.embeddings is None:
+                self.embeddings = self.initialize_embeddings()
             logger.info("STEP 2 : OpenAI Embeddings Initialized... | 20%/100%")
+            self.status.set_stage("vector_store", 20)
             # Initialize vector store
             self.vector_store = self.initialize_vector_store()
             logger.info("STEP 3 : FAISS Vector Store Initialized... | 60%/100%")
+            self.status.set_stage("qa_chains", 60)
             # Initialize QA chains
             self.qa_chains = self.initialize_qa_chains()
             logger.info("STEP 4 : QA Chains Initialized... | 80%/100%")
@@ -130,66 +340,76 @@ class ChatbotFAISS:
             logger.error(f"Initialization failed: {e}")
             raise
 
+    async def warm_up(self):
+        """
+        Runs initialization (and the optional rebuild / cache clear) without blocking the event loop.
+        Never raises; failures are recorded on self.status.
+        """
+        try:
+            await asyncio.to_thread(self.initialize)
+            if BUILD_VECTOR_STORE == "True":
+                self.status.set_stage("rebuilding_vector_store", 80)
+                await asyncio.to_thread(self.rebuild_vector_store)
+                self.close_retired_chains()
+                await self.clear_cache()
+            if CLEAR_CACHE == "True":
+                self.status.set_stage("clearing_cache", 90)
+                await self.clear_cache()
+            self.status.mark_ready()
+            if VECTOR_STORE_WATCH_SECONDS > 0:
+                self.version_watch = asyncio.create_task(self.watch_versions(VECTOR_STORE_WATCH_SECONDS))
+        except Exception as e:
+            logger.error(f"Error during ChatbotFAISS warm-up: {e}")
+            self.status.mark_failed(e)
+
     @classmethod
     async def create(cls, redis_client):
         """
         Factory method to initialize ChatbotFAISS with necessary async resources.
+        Returns once the chatbot is ready.
         """
         try:
             # Initialize ChatbotFAISS
             chatbot = cls(redis_client=redis_client)
-            if BUILD_VECTOR_STORE == "True":
-                chatbot.rebuild_vector_store()
-                await chatbot.clear_cache()
-            if CLEAR_CACHE == "True":
-                await chatbot.clear_cache()
+            await chatbot.warm_up()
+            if chatbot.status.failed:
+                raise RuntimeError(chatbot.status.error)
 
             return chatbot
         except Exception as e:
             logger.error(f"Error during ChatbotFAISS creation: {e}")
             raise
 
+    def create_collection_chatbot(self, name: str) -> "ChatbotFAISS":
+        """An uninitialized chatbot for a named collection, sharing this instance's embeddings and ingestion pool."""
+        chatbot = ChatbotFAISS(self.redis_client, collection=name)
+        chatbot.embeddings = self.embeddings
+        chatbot.ingestion_pool = self.ingestion_pool
+        chatbot.shard_search_pool = self.shard_search_pool
+        # Retired chains of every collection are closed by this instance
+        chatbot.retired_chains = self.retired_chains
+        chatbot.closing_tasks = self.closing_tasks
+        return chatbot
+
+    async def resolve_collection(self, collection: Optional[str]) -> "ChatbotFAISS":
+        """
+        The chatbot serving `collection`: this one for the default corpus, otherwise the collection's,
+        loaded on first use. Raises ValueError for unknown collections.
+        """
+        if not collection or collection == self.DEFAULT_COLLECTION or collection == self.collection:
+            return self
+        if self.collections is None:
+            raise ValueError("Collections are not configured (COLLECTIONS_PDF_DIRECTORY).")
+        chatbot = await self.collections.get(collection)
+        # Loading it may have evicted others
+        self.close_retired_chains()
+        return chatbot
+
     def log_time(self, topic, description, start_time, end_time):
         """Logs the time used for a particular operation."""
         time_used = end_time - start_time
         logger.info(f"{topic} | {description} | Time Used: {time_used:.2f} seconds")
 
-    def initialize_redis_index(self):
-        try:
-            # Check if RediSearch module is available
-            try:
-                self.redisearch_client.info()
-                logger.info("Redis index 'cache_index' already exists.")
-                return
-            except Exception as e:
-                if "unknown command" in str(e).lower():
-                    logger.warning("RediSearch module not available. Cache functionality will be limited.")
-                    return
-                logger.info("Creating Redis index 'cache_index'.")
-
-            # Create index only if RediSearch is available
-            embedding_field = VectorField("embedding",
-                                        "FLAT", {
-                                            "TYPE": "FLOAT32",
-                                            "DIM": self.embedding_dimension,
-                                            "DISTANCE_METRIC": "COSINE"
-                                        })
-
-            question_field = TextField("question")
-            answers_field = TextField("answers")
-            timestamp_field = NumericField("timestamp", sortable=True)
-
-            try:
-                self.redisearch_client.create_index(
-                    fields=[embedding_field, question_field, answers_field, timestamp_field],
-                    definition=IndexDefinition(prefix=['cache:'])
-                )
-            except Exception as e:
-                logger.warning(f"Failed to create Redis index: {e}")
-
-        except Exception as e:
-            logger.error(f"Error in initialize_redis_index: {e}")
-
     def initialize_embeddings(self):
         """Initialize the embeddings model."""
         topic = "Embeddings Initialization"
@@ -197,11 +417,18 @@ class ChatbotFAISS:
         start_time = time.time()
 
         try:
-            embeddings = SimpleOpenAIEmbeddings(api_key=self.OPENAI_API_KEY)
-            # Test embeddings
-            test_embedding = embeddings.embed_query("test")
-            if not isinstance(test_embedding, list) or len(test_embedding) == 0:
-                raise ValueError("Failed to generate test embedding")
+            cache = EmbeddingCache(EMBEDDING_CACHE_PATH) if EMBEDDING_CACHE_PATH else None
+            embeddings = SimpleOpenAIEmbeddings(
+                api_key=self.OPENAI_API_KEY,
+                cache=cache,
+                batch_window_ms=EMBEDDING_BATCH_WINDOW_MS,
+                batch_max_size=EMBEDDING_BATCH_MAX_SIZE
+            )
+            # Optional network probe; skips the cache so it really reaches the API
+            if STARTUP_EMBEDDING_PROBE == "True":
+                test_embedding = embeddings._request_embeddings(["test"])
+                if len(test_embedding) == 0 or test_embedding.shape[1] == 0:
+                    raise ValueError("Failed to generate test embedding")
             return embeddings
         except Exception as e:
             logger.error(f"Error initializing embeddings: {str(e)}")
@@ -210,51 +437,50 @@ class ChatbotFAISS:
             end_time = time.time()
             self.log_time(topic, description, start_time, end_time)
 
-    def load_and_split_pdfs(self):
+    def list_pdf_files(self) -> List[str]:
+        """Returns the sorted PDF file names in the PDF directory."""
+        full_directory_path = os.path.abspath(self.pdf_directory_path)
+        logger.info(f"Full Directory Path: {full_directory_path}")
+
+        if not os.path.isdir(full_directory_path):
+            logger.error(f"PDF directory does not exist at path: {full_directory_path}")
+            raise NotADirectoryError(f"PDF directory does not exist at path: {full_directory_path}")
+
+        pdf_files = sorted(file for file in os.listdir(full_directory_path) if file.lower().endswith('.pdf'))
+        if not pdf_files:
+            logger.error(f"No PDF files found in directory: {full_directory_path}")
+            raise FileNotFoundError(f"No PDF files found in directory: {full_directory_path}")
+        return pdf_files
+
+    def load_and_split_pdfs(self, pdf_files: List[str] = None) -> Dict[str, List[Document]]:
+        """
+        Loads and splits the given PDFs (all PDFs in the directory by default) on the ingestion process pool.
+        Returns the chunks grouped by file name, in file name order.
+        """
         topic = "PDF Processing"
         description = "Loading and splitting multiple PDFs into chunks"
         start_time = time.time()
 
         try:
             logger.info(f"Loading and splitting PDFs from directory: {self.pdf_directory_path}")
+            if pdf_files is None:
+                pdf_files = self.list_pdf_files()
+
             full_directory_path = os.path.abspath(self.pdf_directory_path)
-            logger.info(f"Full Directory Path: {full_directory_path}")
-
-            if not os.path.isdir(full_directory_path):
-                logger.error(f"PDF directory does not exist at path: {full_directory_path}")
-                raise NotADirectoryError(f"PDF directory does not exist at path: {full_directory_path}")
-
-            pdf_files = [file for file in os.listdir(full_directory_path) if file.lower().endswith('.pdf')]
-            if not pdf_files:
-                logger.error(f"No PDF files found in directory: {full_directory_path}")
-                raise FileNotFoundError(f"No PDF files found in directory: {full_directory_path}")
-
-            all_chunks = []
-            for pdf_file in pdf_files:
-                pdf_path = os.path.join(full_directory_path, pdf_file)
-                logger.info(f"Loading PDF: {pdf_path}")
-                loader = PyPDFLoader(pdf_path)
-                documents = loader.load()
-
-                if not documents:
-                    logger.error(f"No documents loaded from PDF: {pdf_path}")
-                    continue  # Skip this PDF and continue with others
+            chunks_by_path = self.ingestion_pool.split_pdfs(
+                [os.path.join(full_directory_path, pdf_file) for pdf_file in pdf_files]
+            )
 
-                text_splitter = CharacterTextSplitter(
-                    separator="\n",
-                    chunk_size=1000,
-                    chunk_overlap=200,
-                    length_function=len
-                )
-                chunks = text_splitter.split_documents(documents)
-                all_chunks.extend(chunks)
+            chunks_by_file = {}
+            for pdf_file, chunks in zip(pdf_files, chunks_by_path.values()):
+                if not chunks:
+                    logger.error(f"No documents loaded from PDF: {pdf_file}")
+                    continue  # Skip this PDF and continue with others
+                chunks_by_file[pdf_file] = chunks
                 logger.info(f"Loaded and split PDF '{pdf_file}' into {len(chunks)} chunks.")
 
-            if not all_chunks:
-                logger.error("No chunks were created from any PDF files.")
-                raise ValueError("No chunks were created from any PDF files.")
-
-            logger.info(f"Total chunks created from all PDFs: {len(all_chunks)}")
+            total_chunks = sum(len(chunks) for chunks in chunks_by_file.values())
+            logger.info(f"Total chunks created from {len(pdf_files)} PDFs: {total_chunks}")
 
         except Exception as e:
             logger.error(f"Error loading and splitting PDFs: {e}")
@@ -262,34 +488,233 @@ class ChatbotFAISS:
 
         end_time = time.time()
         self.log_time(topic, description, start_time, end_time)
-        return all_chunks
+        return chunks_by_file
 
-    def initialize_vector_store(self):
+    def split_pdfs(self, pdf_files: List[str], parsed: Optional[Dict[str, List[Document]]] = None) -> Dict[str, List[Document]]:
+        """
+        load_and_split_pdfs for the given files. With a `parsed` dict, files already parsed for another shard
+        during the same rebuild are reused, so every PDF is parsed at most once.
+        """
+        if not pdf_files:
+            return {}
+        if parsed is None:
+            return self.load_and_split_pdfs(pdf_files)
+        missing = [pdf_file for pdf_file in pdf_files if pdf_file not in parsed]
+        if missing:
+            chunks_by_file = self.load_and_split_pdfs(missing)
+            for pdf_file in missing:
+                parsed[pdf_file] = chunks_by_file.get(pdf_file, [])
+        return {pdf_file: parsed[pdf_file] for pdf_file in pdf_files if parsed[pdf_file]}
+
+    def build_vector_store(self, shard: int = 0, parsed: Optional[Dict[str, List[Document]]] = None):
+        """
+        Parses, embeds and persists every PDF of the shard, and writes a fresh ingestion manifest for it.
+        Returns None for a shard of a sharded store that gets no chunks.
+        """
+        folder = self.shard_layout.folder(shard)
+        pdf_files = self.shard_layout.files_of(shard, self.list_pdf_files())
+        chunks_by_file = self.split_pdfs(pdf_files, parsed)
+        if not chunks_by_file and not self.shard_layout.sharded:
+            logger.error("No chunks were created from any PDF files.")
+            raise ValueError("No chunks were created from any PDF files.")
+
+        manifest = IngestionManifest(folder)
+        document_chunks, chunk_ids = [], []
+        for pdf_file, chunks in chunks_by_file.items():
+            info = manifest.file_info(self.pdf_directory_path, pdf_file)
+            ids = IngestionManifest.chunk_ids(pdf_file, info, len(chunks))
+            chunks, ids = self.shard_layout.select(shard, pdf_file, chunks, ids)
+            manifest.record(pdf_file, info, ids)
+            document_chunks.extend(chunks)
+            chunk_ids.extend(ids)
+        if not document_chunks:
+            # Recorded as an empty shard, so it is not rebuilt on every start
+            logger.info(f"Shard {shard} has no chunks.")
+            manifest.save()
+            return None
+
+        texts = [chunk.page_content for chunk in document_chunks]
+        # Embed first so index types that need training (IVF, PQ) can be trained on the corpus
+        text_embeddings = self.embeddings.embed_documents(texts)
+        index = self.index_settings.build_index(np.array(text_embeddings, dtype="float32"))
+        # Compressed indexes keep the full-precision vectors on disk for exact re-scoring
+        vector_store = RescoringFAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=InMemoryDocstore(),
+            index_to_docstore_id={},
+            full_vectors=np.empty((0, index.d), dtype=np.float32) if self.index_settings.lossy else None,
+            rescore_factor=self.index_settings.rescore_factor
+        )
+        vector_store.add_embeddings(
+            text_embeddings=list(zip(texts, text_embeddings)),
+            metadatas=[chunk.metadata for chunk in document_chunks],
+            ids=chunk_ids
+        )
+        save_vector_store(folder, vector_store)
+        self.index_settings.save(folder, index)
+        if not self.shard_layout.sharded:
+            # Keyword index for hybrid retrieval, built from the same chunks (sharded stores keep one across all shards)
+            sparse_index = BM25Index.build(chunk_ids, texts)
+            sparse_index.ids_digest = chunk_ids_digest(vector_store)
+            sparse_index.save(folder)
+        manifest.save()
+        return vector_store
+
+    def load_shard(self, shard: int = 0, writable: bool = False):
+        """
+        Loads a persisted shard and applies the configured search parameters (nprobe, efSearch).
+        Read-only loads map the chunk store, decoding chunks only when retrieved, and honour FAISS_LOAD_MODE
+        so gunicorn workers share index memory; writable=True reads a private copy that may be modified and saved.
+        """
+        folder = self.shard_layout.folder(shard)
+        load_mode = "default" if writable else self.load_mode
+        log_memory_usage(f"before loading vector store ({load_mode})")
+
+        files = get_preloaded(folder) if load_mode == "preload" else None
+        if files is None:
+            files = read_vector_store_files(folder, mmap=load_mode == "mmap", writable=writable)
+        else:
+            logger.info("Using the FAISS index preloaded by the gunicorn master.")
+        index, docstore, index_to_docstore_id = files
+        full_vectors = FullVectors.load(folder, writable)
+        if full_vectors is not None and len(full_vectors) != index.ntotal:
+            logger.warning(f"Full-precision vectors do not match the index in {folder}; searching without re-scoring.")
+            full_vectors = None
+        vector_store = RescoringFAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=docstore,
+            index_to_docstore_id=index_to_docstore_id,
+            full_vectors=full_vectors,
+            rescore_factor=self.index_settings.rescore_factor
+        )
+        self.index_settings.apply_search_params(vector_store.index)
+
+        log_memory_usage(f"after loading vector store ({load_mode})")
+        return vector_store
+
+    def load_vector_store(self, writable: bool = False):
+        """Loads the persisted vector store: the single index, or every shard behind one sharded view."""
+        if not self.shard_layout.sharded:
+            return self.load_shard(0, writable)
+        return self.combine_shards([
+            self.load_shard(shard, writable) if os.path.exists(os.path.join(folder, "index.faiss")) else None
+            for shard, folder in enumerate(self.shard_layout.folders())
+        ])
+
+    def combine_shards(self, stores: List[Optional[FAISS]]):
+        """The vector store queries use: the store itself when unsharded, otherwise a view searching all shards."""
+        if not self.shard_layout.sharded:
+            return stores[0]
+        if self.shard_search_pool is None:
+            self.shard_search_pool = ThreadPoolExecutor(max_workers=self.shard_layout.count, thread_name_prefix="faiss-shard")
+        return ShardedVectorStore(stores, self.shard_layout, executor=self.shard_search_pool)
+
+    def shard_stores(self) -> List[Optional[FAISS]]:
+        """The live store of every shard (None for shards without chunks or not loaded)."""
+        vector_store = self.vector_store
+        if isinstance(vector_store, ShardedVectorStore):
+            if len(vector_store.stores) == self.shard_layout.count:
+                return list(vector_store.stores)
+        elif vector_store is not None and not self.shard_layout.sharded:
+            return [vector_store]
+        return [None] * self.shard_layout.count
+
+    def update_vector_store(self, manifest: IngestionManifest, shard: int = 0,
+                            parsed: Optional[Dict[str, List[Document]]] = None):
+        """
+        Applies only the PDF changes since the last ingestion to a fresh copy of the persisted shard:
+        chunks of removed or changed files are deleted, new or changed files are parsed and embedded.
+        The live vector store is never mutated, so queries can keep using it meanwhile.
+        Returns None when the index type cannot delete chunks and a full rebuild is required.
+        """
+        topic = "FAISS Vector Store"
+        description = "Incrementally updating FAISS vector store"
+        if self.shard_layout.sharded:
+            description += f" shard {shard}"
+        start_time = time.time()
+
+        try:
+            folder = self.shard_layout.folder(shard)
+            vector_store = self.load_shard(shard, writable=True)
+            pdf_files = self.shard_layout.files_of(shard, self.list_pdf_files())
+            changed, removed = manifest.diff(self.pdf_directory_path, pdf_files)
+            if not changed and not removed:
+                logger.info("Vector store is up to date with the PDF directory.")
+                manifest.save()
+                return vector_store
+
+            stale_ids = []
+            for pdf_file in removed + list(changed):
+                stale_ids.extend(manifest.forget(pdf_file))
+            if stale_ids and not self.index_settings.supports_remove:
+                logger.info(f"{self.index_settings.index_type} indexes cannot delete chunks; a full rebuild is needed.")
+                return None
+            if stale_ids:
+                vector_store.delete(stale_ids)
+                logger.info(f"Removed {len(stale_ids)} chunks of {len(removed)} removed and {len(changed)} changed PDFs.")
+
+            chunks_by_file = self.split_pdfs(list(changed), parsed)
+            added = 0
+            for pdf_file, info in changed.items():
+                chunks = chunks_by_file.get(pdf_file, [])
+                ids = IngestionManifest.chunk_ids(pdf_file, info, len(chunks))
+                chunks, ids = self.shard_layout.select(shard, pdf_file, chunks, ids)
+                if chunks:
+                    vector_store.add_documents(chunks, ids=ids)
+                    added += len(chunks)
+                manifest.record(pdf_file, info, ids)
+            logger.info(f"Added {added} chunks from {len(changed)} new or changed PDFs.")
+
+            if not vector_store.index_to_docstore_id:
+                if self.shard_layout.sharded:
+                    logger.info(f"No chunks left in shard {shard}; it is rebuilt as an empty shard.")
+                    return None
+                logger.error("No chunks left in the vector store after the update.")
+                raise ValueError("No chunks were created from any PDF files.")
+
+            save_vector_store(folder, vector_store)
+            if not self.shard_layout.sharded:
+                BM25Index.from_vector_store(vector_store).save(folder)
+            manifest.save()
+            return vector_store
+        except Exception as e:
+            logger.error(f"Error updating FAISS vector store: {e}")
+            raise
+        finally:
+            end_time = time.time()
+            self.log_time(topic, description, start_time, end_time)
+
+    def initialize_shard(self, shard: int = 0, parsed: Optional[Dict[str, List[Document]]] = None):
+        """Loads the persisted shard, or builds it when there is none. None for an empty shard."""
         topic = "FAISS Vector Store"
         description = "Creating or loading FAISS vector store"
+        if self.shard_layout.sharded:
+            description += f" shard {shard}"
         start_time = time.time()
 
-        index_file = os.path.join(self.persist_directory, "index.faiss")
+        folder = self.shard_layout.folder(shard)
+        index_file = os.path.join(folder, "index.faiss")
 
         try:
             if os.path.exists(index_file):
                 logger.info("Loading existing FAISS vector store.")
-                vector_store = FAISS.load_local(
-                    folder_path=self.persist_directory,
-                    embeddings=self.embeddings,
-                    allow_dangerous_deserialization=True
-                )
+                if not self.index_settings.same_build(FaissIndexSettings.load(folder)):
+                    logger.warning(
+                        f"Existing FAISS index was not built as '{self.index_settings.index_type}' with the configured "
+                        "parameters; it is used as is until the vector store is rebuilt."
+                    )
+                vector_store = self.load_shard(shard)
                 logger.info("Loaded existing FAISS vector store.")
+            elif self.shard_layout.sharded and IngestionManifest.load(folder).exists:
+                logger.info(f"Shard {shard} has no chunks.")
+                vector_store = None
             else:
                 logger.info("Creating new FAISS vector store.")
-                document_chunks = self.load_and_split_pdfs()
-                vector_store = FAISS.from_documents(
-                    documents=document_chunks,
-                    embedding=self.embeddings
-                )
-                vector_store.save_local(self.persist_directory)
-                logger.info(f"Created new FAISS vector store | Persisted at: {self.persist_directory}")
-                
+                vector_store = self.build_vector_store(shard, parsed)
+                logger.info(f"Created new FAISS vector store | Persisted at: {folder}")
+
             return vector_store
         except Exception as e:
             logger.error(f"Error initializing FAISS vector store: {e}")
@@ -298,10 +723,183 @@ class ChatbotFAISS:
             end_time = time.time()
             self.log_time(topic, description, start_time, end_time)
 
-    def initialize_qa_chains(self):
+    def use_store_directory(self, folder: str):
+        """Points loading and saving of the store at one version's folder."""
+        self.store_directory = folder
+        self.shard_layout = ShardLayout(folder, self.shard_layout.count, self.shard_layout.partition)
+
+    def initialize_vector_store(self):
+        """
+        Loads or builds every shard of the current version. A store persisted with another shard layout
+        is rebuilt as a new version.
+        """
+        self.loaded_version = self.index_versions.current()
+        self.use_store_directory(self.index_versions.directory(self.loaded_version))
+        persisted = ShardLayout.load(self.store_directory)
+        if not self.shard_layout.same_layout(persisted) and (
+            persisted is not None or os.path.exists(os.path.join(self.store_directory, "index.faiss"))
+        ):
+            logger.warning(
+                f"Persisted vector store was not split into {self.shard_layout.count} "
+                f"'{self.shard_layout.partition}' shards; rebuilding every shard."
+            )
+            self.rebuild_vector_store(full=True)
+            return self.vector_store
+        parsed = {}
+        stores = [self.initialize_shard(shard, parsed) for shard in range(self.shard_layout.count)]
+        self.shard_layout.save()
+        return self.combine_shards(stores)
+
+    def probe_vector(self, shard) -> np.ndarray:
+        """
+        A query vector for validating a shard: its first chunk's full-precision or stored vector, or the
+        embedding of the chunk's text when the index cannot reconstruct it (IVF after remove_ids).
+        """
+        full_vectors = getattr(shard, "full_vectors", None)
+        if full_vectors is not None:
+            return np.asarray(full_vectors[:1], dtype=np.float32)
+        probe = reconstruct_vectors(shard.index, [0])
+        if probe is not None:
+            return probe
+        document = shard.docstore.search(shard.index_to_docstore_id[0])
+        if not isinstance(document, Document):
+            raise ValueError("Invalid vector store: indexed chunks are missing from the docstore.")
+        embeddings = shard.embeddings or self.embeddings
+        # embed_documents, so the chunk's embedding usually comes from the embedding cache
+        return np.array(embeddings.embed_documents([document.page_content]), dtype=np.float32)
+
+    def validate_vector_store(self, vector_store):
+        """
+        Checks a store before it goes live: every shard's index and chunk mapping agree, and a search with a
+        stored vector returns only rows that map to chunks in the docstore. Raises ValueError otherwise.
+        """
+        shards = vector_store.shards if isinstance(vector_store, ShardedVectorStore) else [vector_store]
+        for shard in shards:
+            ntotal, chunks = shard.index.ntotal, len(shard.index_to_docstore_id)
+            if ntotal == 0 or ntotal != chunks:
+                raise ValueError(f"Invalid vector store: {ntotal} vectors for {chunks} chunks.")
+            full_vectors = getattr(shard, "full_vectors", None)
+            if full_vectors is not None and len(full_vectors) != ntotal:
+                raise ValueError(f"Invalid vector store: {len(full_vectors)} full-precision vectors for {ntotal} chunks.")
+            rows = shard.index.search(self.probe_vector(shard), min(10, ntotal))[1][0]
+            rows = rows[rows >= 0]
+            if not len(rows):
+                raise ValueError("Invalid vector store: a stored vector finds no chunk.")
+            for row in rows:
+                chunk_id = shard.index_to_docstore_id.get(int(row))
+                if chunk_id is None:
+                    raise ValueError(f"Invalid vector store: row {row} has no chunk.")
+                if not isinstance(shard.docstore.search(chunk_id), Document):
+                    raise ValueError("Invalid vector store: indexed chunks are missing from the docstore.")
+
+    def remove_shard_files(self, shard: int = 0):
+        """Deletes the shard's index, chunk store, manifest and keyword index."""
+        folder = self.shard_layout.folder(shard)
+        try:
+            paths = (
+                os.path.join(folder, "index.faiss"),
+                os.path.join(folder, LEGACY_DOCSTORE_FILE),
+                os.path.join(folder, IngestionManifest.FILE_NAME),
+                os.path.join(folder, FaissIndexSettings.CONFIG_FILE_NAME)
+            )
+            for file_path in paths:
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+                    logger.info(f"Deleted existing FAISS index file: {file_path}")
+            for file_path in ChunkStore.remove(folder):
+                logger.info(f"Deleted existing chunk store file: {file_path}")
+            if FullVectors.remove(folder):
+                logger.info("Deleted existing full-precision vectors.")
+            if BM25Index.remove(folder):
+                logger.info("Deleted existing BM25 index.")
+        except Exception as e:
+            logger.error(f"Error deleting existing FAISS index file: {e}")
+
+    def rebuild_shard(self, shard: int = 0, full: bool = False, parsed: Optional[Dict[str, List[Document]]] = None):
+        """
+        Brings one shard in line with its PDFs without touching the other shards. Only new, changed or
+        removed PDFs are processed unless `full` is set, there is no manifest for the existing index,
+        or the configured index type differs from the persisted one.
+        """
+        folder = self.shard_layout.folder(shard)
+        index_file = os.path.join(folder, "index.faiss")
+        manifest = IngestionManifest.load(folder)
+
+        # Changing the index type or its build parameters needs a full rebuild
+        same_build = self.index_settings.same_build(FaissIndexSettings.load(folder))
+
+        vector_store = None
+        if not full and same_build and manifest.exists and os.path.exists(index_file):
+            vector_store = self.update_vector_store(manifest, shard, parsed)
+            if vector_store is not None:
+                return vector_store
+        self.remove_shard_files(shard)
+        return self.initialize_shard(shard, parsed)
+
+    def load_sparse_index(self, vector_store) -> BM25Index:
+        """
+        Loads the BM25 index persisted with the vector store. Stores built before hybrid retrieval,
+        or whose index does not match, get it built from their chunks and saved. The index matches
+        when it has as many chunks and the digest of the store's chunk ids it was saved with.
+        """
+        sparse_index = BM25Index.load(self.store_directory)
+        if (sparse_index is not None and len(sparse_index.chunk_ids) == len(vector_store.index_to_docstore_id)
+                and sparse_index.ids_digest == chunk_ids_digest(vector_store)):
+            return sparse_index
+
+        logger.info("Building BM25 index from the vector store chunks.")
+        sparse_index = BM25Index.from_vector_store(vector_store)
+        try:
+            sparse_index.save(self.store_directory)
+        except Exception as e:
+            logger.error(f"Error saving BM25 index: {e}")
+        return sparse_index
+
+    def build_retriever(self, vector_store) -> HybridRetriever:
         """
-        Initializes QA chains for both GPT and Claude models.
+        The candidate search shared by every chain: hybrid (FAISS + BM25, RRF fusion) or dense-only,
+        depending on RETRIEVAL_MODE. Over-fetches when a chain reranks its candidates.
         """
+        if RETRIEVAL_MODE not in ("hybrid", "dense"):
+            logger.warning(f"Unknown RETRIEVAL_MODE '{RETRIEVAL_MODE}'; using hybrid retrieval.")
+        k = RETRIEVAL_K
+        if "mmr" in self.rerank_modes.values():
+            k = max(RERANK_FETCH_K, RETRIEVAL_K)
+        return HybridRetriever(
+            vector_store=vector_store,
+            sparse_index=None if RETRIEVAL_MODE == "dense" else self.load_sparse_index(vector_store),
+            k=k,
+            fetch_k=max(HYBRID_FETCH_K, k),
+            rrf_k=HYBRID_RRF_K,
+            cache=self.retrieval_cache,
+            index_version=index_version(*self.shard_layout.folders())
+        )
+
+    def build_chain_retriever(self, candidates: HybridRetriever, model: str) -> RerankingRetriever:
+        """The chain's own post-retrieval stage on top of the shared candidate search."""
+        token_budget = self.context_token_budgets[model]
+        packer = ContextPacker(
+            token_budget=token_budget,
+            min_score=CONTEXT_MIN_SCORE,
+            max_score_gap=CONTEXT_MAX_SCORE_GAP,
+            max_overlap=2 * CHUNK_OVERLAP
+        ) if token_budget > 0 else None
+        return RerankingRetriever(
+            candidates=candidates,
+            k=RETRIEVAL_K,
+            mode=self.rerank_modes[model],
+            lambda_mult=MMR_LAMBDA,
+            packer=packer,
+            model=model
+        )
+
+    def initialize_qa_chains(self, vector_store=None):
+        """
+        Initializes QA chains for both GPT and Claude models, sharing one candidate search.
+        Uses the given vector store, or the live one if not provided.
+        """
+        if vector_store is None:
+            vector_store = self.vector_store
         qa_chains = {}
         topic = "QA Chain Initialization"
         description = "Initializing RetrievalQA chain with AI Assistant role"
@@ -313,6 +911,10 @@ class ChatbotFAISS:
             logger.error(f"Prompt template not set : {prompt_template}")
             raise ValueError("Prompt template not set.")
 
+        # One candidate search shared by every chain, so compare mode can retrieve once for all models;
+        # each chain reranks the candidates its own way
+        candidates = self.build_retriever(vector_store)
+
         # Initialize GPT QA Chain
         try:
             PROMPT = PromptTemplate(
@@ -329,7 +931,7 @@ class ChatbotFAISS:
             qa_chain_gpt = RetrievalQA.from_chain_type(
                 llm=llm_gpt,
                 chain_type="stuff",
-                retriever=self.vector_store.as_retriever(search_kwargs={"k": 5}),
+                retriever=self.build_chain_retriever(candidates, "GPT"),
                 return_source_documents=True,
                 chain_type_kwargs={"prompt": PROMPT}
             )
@@ -356,7 +958,7 @@ class ChatbotFAISS:
             qa_chain_claude = RetrievalQA.from_chain_type(
                 llm=llm_claude,
                 chain_type="stuff",
-                retriever=self.vector_store.as_retriever(search_kwargs={"k": 5}),
+                retriever=self.build_chain_retriever(candidates, "CLAUDE"),
                 return_source_documents=True,
                 chain_type_kwargs={"prompt": PROMPT}
             )
@@ -377,26 +979,48 @@ class ChatbotFAISS:
         ratio = SequenceMatcher(None, question1.strip(), question2.strip()).ratio()
         return ratio > percent_similar  # Threshold set to 80%
 
-    async def check_cache(self, question: str):
+    async def check_cache(self, question: str, query_vector: Optional[List[float]] = None):
+        """
+        Cached answer for the question: from the semantic cache when the retrieval embedding of the question
+        is given, otherwise from the text cache. Returns ([answer], "cache") or (None, None).
+        """
         try:
-            percent_similar = 0.8  # Set similarity threshold to 80%
-
-            # Skip cache check if RediSearch is not available
-            try:
-                return await self.cache_controller.check_cache(question)
-            except Exception as e:
-                logger.error(f"Error checking cache: {e}", "check_cache")
-                return None, None
-
+            if self.semantic_cache is not None and query_vector is not None:
+                return await self.semantic_cache.check_cache(question, query_vector)
+            return await self.cache_controller.check_cache(question)
         except Exception as e:
-            logger.error(f"Error checking cache: {e}", "check_cache")
+            logger.error(f"Error checking cache: {e}")
             return None, None
 
-    async def add_to_cache(self, question: str, answer: str):
+    async def add_to_cache(self, question: str, answer: str, query_vector: Optional[List[float]] = None):
         try:
-            await self.cache_controller.add_to_cache(question, answer)
+            if self.semantic_cache is not None and query_vector is not None:
+                await self.semantic_cache.add_to_cache(question, answer, query_vector)
+            else:
+                await self.cache_controller.add_to_cache(question, answer)
         except Exception as e:
-            logger.error(f"Error adding to cache: {e}", "add_to_cache")
+            logger.error(f"Error adding to cache: {e}")
+
+    async def retrieve_or_cached(self, question: str,
+                                 qa_chain: RetrievalQA) -> Tuple[Optional[str], Optional[List[float]], List[Document]]:
+        """
+        The cached answer for the question, or the documents to generate one from, as (answer, query vector,
+        documents). With the semantic cache the candidate search runs first and the cache is looked up with
+        its query embedding (served by the retrieval cache for repeated queries), so a lookup never costs an
+        extra embedding call; the vector is passed on to generate_answer to store the new answer under.
+        """
+        retriever = qa_chain.retriever
+        if self.semantic_cache is not None and isinstance(retriever, RerankingRetriever):
+            query_vector, candidates = await retriever.candidates.asearch(question)
+            cached_answers, cache_status = await self.check_cache(question, query_vector)
+            if cache_status == "cache" and cached_answers:
+                return cached_answers[0], query_vector, []
+            return None, query_vector, await retriever.aselect(query_vector, candidates)
+
+        cached_answers, cache_status = await self.check_cache(question)
+        if cache_status == "cache" and cached_answers:
+            return cached_answers[0], None, []
+        return None, None, await self.retrieve_documents(question, qa_chain)
 
     def remove_cache_entry(self, doc_id):
         try:
@@ -407,60 +1031,250 @@ class ChatbotFAISS:
     async def clear_cache(self):
         try:
             await self.cache_controller.clear_cache()
+            if self.semantic_cache is not None:
+                await self.semantic_cache.clear_cache()
         except Exception as e:
             logger.error(f"Error clearing cache: {e}")
 
-    def rebuild_vector_store(self):
-        # Delete existing index file if exists
-        index_file = os.path.join(self.persist_directory, "index.faiss")
-        index_pkl_file = os.path.join(self.persist_directory, "index.pkl")
-        try:
-            if os.path.exists(index_file):
-                os.remove(index_file)
-                logger.info(f"Deleted existing FAISS index file: {index_file}")
-            if os.path.exists(index_pkl_file):
-                os.remove(index_pkl_file)
-                logger.info(f"Deleted existing FAISS index pickle file: {index_pkl_file}")
-        except Exception as e:
-            logger.error(f"Error deleting existing FAISS index file: {e}")
-        
-        # Re-initialize vector store
-        self.vector_store = self.initialize_vector_store()
-        logger.info("Rebuilt FAISS vector store.")
+    def rebuild_vector_store(self, full: bool = False, shards: Optional[Iterable[int]] = None) -> str:
+        """
+        Builds the next version of the vector store next to the live one, then swaps the store and its QA chains in at once.
+        The live files are hard-linked into a staging folder and brought in line with the PDF directory there:
+        `shards` limits the rebuild to those shards (all by default), the others are reused as they are, and only
+        new, changed or removed PDFs are processed unless `full` is set (see rebuild_shard). A changed shard layout
+        rebuilds every shard. The result is validated before it is published; the live version is never modified,
+        so in-flight queries finish on the snapshot they started with and a failed build leaves it serving.
+        Other workers switch to the published version in watch_versions. Returns the new version.
+        """
+        with self.rebuild_lock, self.index_versions.lock():
+            count = self.shard_layout.count
+            targets = list(range(count)) if shards is None else sorted(set(shards))
+            if any(not 0 <= shard < count for shard in targets):
+                raise ValueError(f"Shards must be between 0 and {count - 1}, got {targets}.")
+
+            # Live stores can be reused unless another worker published a newer version meanwhile
+            stores = self.shard_stores() if self.loaded_version == self.index_versions.current() else [None] * count
+            live_directory = self.store_directory
+            version, staging = self.index_versions.prepare()
+            self.use_store_directory(staging)
+            try:
+                if not self.shard_layout.same_layout(ShardLayout.load(staging)):
+                    logger.info("Shard layout changed; rebuilding every shard.")
+                    full, targets = True, list(range(count))
+                parsed = {}
+                for shard in range(count):
+                    if shard in targets:
+                        stores[shard] = self.rebuild_shard(shard, full, parsed)
+                    elif stores[shard] is None:
+                        stores[shard] = self.initialize_shard(shard, parsed)
+                self.shard_layout.save()
+                vector_store = self.combine_shards(stores)
+                self.validate_vector_store(vector_store)
+                # Re-initialize chains (and the keyword index) before publishing them together with the store
+                qa_chains = self.initialize_qa_chains(vector_store)
+            except Exception:
+                self.use_store_directory(live_directory)
+                self.index_versions.discard(version)
+                raise
+
+            self.use_store_directory(self.index_versions.publish(version))
+            self.retire_chains(self.qa_chains)
+            self.vector_store, self.qa_chains, self.loaded_version = vector_store, qa_chains, version
+            # New chains already look up the new index version; drop the old entries now
+            if self.retrieval_cache is not None:
+                self.retrieval_cache.invalidate()
+            if self.shard_layout.sharded:
+                logger.info(f"Rebuilt FAISS vector store shards {targets} as version {version}.")
+            else:
+                logger.info(f"Rebuilt FAISS vector store as version {version}.")
+            return version
 
-    async def process_single_question(self, question: str, qa_chain: RetrievalQA) -> dict:
+    def reload_published_version(self) -> bool:
+        """
+        Switches to the version another worker (or process) published, if any: it is loaded, validated and
+        swapped in together with its QA chains. Returns whether the store changed.
+        """
+        version = self.index_versions.current()
+        if version is None or version in (self.loaded_version, self.rejected_version):
+            return False
+        with self.rebuild_lock:
+            if version == self.loaded_version:
+                return False
+            live_directory = self.store_directory
+            self.use_store_directory(self.index_versions.directory(version))
+            try:
+                vector_store = self.load_vector_store()
+                self.validate_vector_store(vector_store)
+                qa_chains = self.initialize_qa_chains(vector_store)
+            except Exception:
+                # Not retried until another version is published
+                self.rejected_version = version
+                self.use_store_directory(live_directory)
+                raise
+            self.retire_chains(self.qa_chains)
+            self.vector_store, self.qa_chains, self.loaded_version = vector_store, qa_chains, version
+            if self.retrieval_cache is not None:
+                self.retrieval_cache.invalidate()
+        logger.info(f"Switched to FAISS vector store version {version}.")
+        return True
+
+    async def watch_versions(self, interval: float):
+        """Follows the versions published for this corpus and the loaded collections, checking every `interval` seconds."""
+        while True:
+            await asyncio.sleep(interval)
+            chatbots = [self]
+            if self.collections is not None:
+                chatbots += [entry.chatbot for entry in list(self.collections.loaded.values())]
+            for chatbot in chatbots:
+                try:
+                    await asyncio.to_thread(chatbot.reload_published_version)
+                except Exception as e:
+                    logger.error(f"Error loading the published vector store version of {chatbot.persist_directory}: {e}")
+            self.close_retired_chains()
+
+    def retire_chains(self, qa_chains: Dict[str, RetrievalQA]):
+        """Queues chains that were swapped out for closing. Only appends, so rebuild threads can call it."""
+        if qa_chains:
+            self.retired_chains.append(qa_chains)
+
+    @staticmethod
+    async def close_chains(qa_chains: Dict[str, RetrievalQA]):
+        """Closes the HTTP sessions of the chains' models (the Bedrock client keeps one per model instance)."""
+        for model, qa_chain in qa_chains.items():
+            llm = qa_chain.combine_documents_chain.llm_chain.llm
+            if hasattr(llm, "aclose"):
+                try:
+                    await llm.aclose()
+                except Exception as e:
+                    logger.error(f"Error closing the {model} model session: {e}")
+
+    async def close_chains_later(self, chains: List[Dict[str, RetrievalQA]], delay: float):
+        await asyncio.sleep(delay)
+        for qa_chains in chains:
+            await self.close_chains(qa_chains)
+
+    def close_retired_chains(self, delay: Optional[float] = None):
+        """
+        Closes the retired chains once the requests that picked them up had `delay` seconds
+        (RETIRED_CHAINS_GRACE_SECONDS by default) to finish. Call it on the event loop after a swap.
+        """
+        if not self.retired_chains:
+            return
+        chains = self.retired_chains[:]
+        del self.retired_chains[:len(chains)]
+        task = asyncio.create_task(self.close_chains_later(
+            chains, self.RETIRED_CHAINS_GRACE_SECONDS if delay is None else delay
+        ))
+        self.closing_tasks[task] = chains
+        task.add_done_callback(lambda done: self.closing_tasks.pop(done, None))
+
+    async def aclose(self):
         """
-        Processes a single question using the specified QA chain.
+        Closes the model sessions of this chatbot, its loaded collections and every retired chain right away,
+        and stops the shard search threads.
         """
+        if self.collections is not None:
+            for entry in list(self.collections.loaded.values()):
+                self.retire_chains(entry.chatbot.qa_chains)
+        self.retire_chains(self.qa_chains)
+        chains = self.retired_chains[:]
+        del self.retired_chains[:len(chains)]
+        for task, pending in list(self.closing_tasks.items()):
+            task.cancel()
+            chains.extend(pending)
+        await asyncio.gather(*self.closing_tasks, return_exceptions=True)
+        # Closing twice is harmless, in case a cancelled task had started already
+        for qa_chains in chains:
+            await self.close_chains(qa_chains)
+        if self.shard_search_pool is not None:
+            self.shard_search_pool.shutdown(wait=False)
+
+    async def process_single_question(self, question: str, qa_chain: RetrievalQA, model_choice: str = "GPT",
+                                      retrieval_query: Optional[str] = None) -> dict:
+        """
+        Processes a single question using the specified QA chain. `question` is the generation prompt
+        (the conversation so far); retrieval and the answer cache use `retrieval_query` when given.
+        """
+        retrieval_query = retrieval_query or question
         try:
             # Check cache first
-            cached_answers, cache_status = await self.check_cache(question)
-            if cache_status == "cache" and cached_answers:
+            cached_answer, query_vector, documents = await self.retrieve_or_cached(retrieval_query, qa_chain)
+            if cached_answer is not None:
                 return {
-                    "answer": cached_answers[0],  # Return the random answer from cache
+                    "answer": cached_answer,
                     "type_res": "cache"
                 }
-            
-            # If cache needs more answers or cache miss, generate a new answer
-            response = await asyncio.to_thread(qa_chain.invoke, question)
-            response_data = response.get("result", None)
+        except Exception as e:
+            logger.error(f"Error processing single question: {e}")
+            return {"error_code": "04", "msg": f"Error processing question: {str(e)}"}
+        return await self.generate_answer(question, documents, qa_chain, model_choice, cache_key=retrieval_query,
+                                          query_vector=query_vector)
+
+    async def retrieve_documents(self, question: str, qa_chain: RetrievalQA) -> List[Document]:
+        """Runs the retrieval half of a RetrievalQA chain: one query embedding and one FAISS search."""
+        return await qa_chain.retriever.ainvoke(question)
+
+    async def generate_answer(self, question: str, documents: List[Document], qa_chain: RetrievalQA,
+                              model_choice: str, cache_key: Optional[str] = None,
+                              query_vector: Optional[List[float]] = None) -> dict:
+        """
+        Runs the generation half of a RetrievalQA chain on already retrieved documents.
+        ainvoke keeps the LLM round trip on the event loop instead of holding an executor thread.
+        The answer is cached under `cache_key` (the question by default) and, for the semantic cache,
+        the query embedding of its retrieval.
+        Returns the same shape as process_single_question.
+        """
+        start_time = time.time()
+        try:
+            combine_chain = qa_chain.combine_documents_chain
+            response = await combine_chain.ainvoke({combine_chain.input_key: documents, "question": question})
+            response_data = response.get(combine_chain.output_key, None)
 
             if not isinstance(response_data, str):
                 logger.error(f"Unexpected response format: {response}")
                 return {"error_code": "03", "msg": "Unexpected response format from QA chain."}
 
             answer = response_data.strip()
-
-            # Add the new Q&A to cache
-            await self.add_to_cache(question, answer)
-
+            await self.add_to_cache(cache_key or question, answer, query_vector)
             return {
                 "answer": answer,
                 "type_res": "generate"
             }
         except Exception as e:
-            logger.error(f"Error processing single question: {e}")
+            logger.error(f"Error generating answer with {model_choice}: {e}")
             return {"error_code": "04", "msg": f"Error processing question: {str(e)}"}
+        finally:
+            self.log_time("Answer Generation", f"Generating answer with {model_choice}", start_time, time.time())
+
+    async def compare_models(self, question: str, qa_chains: Dict[str, RetrievalQA],
+                             retrieval_query: Optional[str] = None) -> Dict[str, dict]:
+        """
+        Answers the question with every model from a single retrieval (of `retrieval_query` when given),
+        running the generations concurrently, so the latency is that of the slowest model rather than the sum.
+        The cache is not read: every model has to answer for the comparison.
+        """
+        retrieval_query = retrieval_query or question
+        models = list(qa_chains)
+        retrievers = [qa_chains[model].retriever for model in models]
+        if all(isinstance(retriever, RerankingRetriever) and retriever.candidates is retrievers[0].candidates
+               for retriever in retrievers):
+            # Search once, then let each chain rerank the shared candidates
+            query_vector, candidates = await retrievers[0].candidates.asearch(retrieval_query)
+            documents = await asyncio.gather(*(retriever.aselect(query_vector, candidates) for retriever in retrievers))
+        else:
+            query_vector = None
+            documents = [await self.retrieve_documents(retrieval_query, qa_chains[models[0]])] * len(models)
+        results = await asyncio.gather(*(
+            self.generate_answer(question, model_documents, qa_chains[model], model, cache_key=retrieval_query,
+                                 query_vector=query_vector)
+            for model, model_documents in zip(models, documents)
+        ))
+        return dict(zip(models, results))
+
+    @staticmethod
+    def format_compared_answers(answers: Dict[str, dict]) -> str:
+        """Combines compare mode answers into one text, e.g. for the conversation history."""
+        return "\n\n".join(f"[{model}] {result['answer']}" for model, result in answers.items() if result.get("answer"))
 
     def test_similarity_search(self, query: str):
         """Test similarity search functionality."""
@@ -469,12 +1283,26 @@ class ChatbotFAISS:
             embedding = self.embeddings.embed_query(query)
             embedding = np.array(embedding).astype('float32')
             faiss.normalize_L2(embedding.reshape(1, -1))
-            D, I = self.vector_store.index.search(embedding.reshape(1, -1), k=5)
+            vector_store = self.vector_store
+            index = vector_store if isinstance(vector_store, ShardedVectorStore) else vector_store.index
+            D, I = index.search(embedding.reshape(1, -1), k=5)
             return D, I
         except Exception as e:
             logger.error(f"Error in test_similarity_search: {str(e)}")
             raise
 
+    def get_stats(self) -> dict:
+        """Runtime metrics of the retrieval cache, the query embedding batcher and the loaded collections."""
+        stats = {}
+        if self.retrieval_cache is not None:
+            stats["retrieval_cache"] = self.retrieval_cache.stats()
+        batcher = getattr(self.embeddings, "batcher", None)
+        if batcher is not None:
+            stats["embedding_batcher"] = batcher.stats()
+        if self.collections is not None:
+            stats["collections"] = self.collections.stats()
+        return stats
+
     def get_vector_store_info(self) -> str:
         """Get information about the contents of the vector store"""
         try:
@@ -487,14 +1315,17 @@ class ChatbotFAISS:
                 return "Vector store is empty."
             
             # Count total documents
-            total_docs = len(docstore._dict)
+            index_to_docstore_id = self.vector_store.index_to_docstore_id
+            total_docs = len(index_to_docstore_id)
             
-            # Sample some documents to show content
+            # Sample some documents to show content (the chunk store has no dict to list)
             sample_size = min(5, total_docs)
-            sample_docs = list(docstore._dict.values())[:sample_size]
+            sample_docs = [docstore.search(index_to_docstore_id[i]) for i in range(sample_size)]
             
             # Build information string
             info = f"Vector store contains {total_docs} total documents.\n\n"
+            if isinstance(self.vector_store, ShardedVectorStore):
+                info = f"Vector store contains {total_docs} total documents in {len(self.vector_store.shards)} shards.\n\n"
             info += "Sample of document contents:\n"
             for i, doc in enumerate(sample_docs, 1):
                 content = doc.page_content[:200].replace('\n', ' ').strip()
@@ -509,74 +1340,273 @@ class ChatbotFAISS:
             logger.error(f"Error getting vector store info: {e}")
             return f"Error inspecting vector store: {str(e)}"
 
+    async def condense_query(self, conversation_history: List[Dict], question: str) -> str:
+        """The standalone retrieval query of the latest question in the conversation (see QueryCondenser)."""
+        return await self.query_condenser.condense(conversation_history, question)
+
     async def process_query(self, user_id: str, topic_id: str, user_query: str, **kwargs) -> dict:
-        """Processes the user query using the selected AI model (GPT or Claude)."""
-        async with self.lock:
-            model_choice = kwargs.get("model_choice", "GPT")
-            topic = "User Query Processing"
-            description = f"Processing user query for user_id: {user_id} and topic_id: {topic_id}"
-            start_time = time.time()
+        """
+        Processes the user query using the selected AI model (GPT or Claude), or both side by side ("BOTH"),
+        against the default corpus or the named `collection`. `user_query` is the generation prompt;
+        the optional `retrieval_query` (see condense_query) is what gets embedded and cached instead.
+        """
+        model_choice = kwargs.get("model_choice", "GPT")
+        retrieval_query = kwargs.get("retrieval_query")
+        collection = kwargs.pop("collection", None)
+        topic = "User Query Processing"
+        description = f"Processing user query for user_id: {user_id} and topic_id: {topic_id}"
+        start_time = time.time()
 
-            try:
-                # Clean the query
-                cleaned_query = user_query.strip().lower()
-
-                # Check if this is a special command to inspect vector store
-                if any(cmd in cleaned_query for cmd in ["vector store", "data in store", "check store"]):
-                    store_info = self.get_vector_store_info()
-                    return {
-                        "msg": "success",
-                        "data": {
-                            "answer": store_info,
-                            "type_res": "vector_store_info"
-                        }
+        try:
+            if collection:
+                try:
+                    chatbot = await self.resolve_collection(collection)
+                except ValueError as e:
+                    logger.error(f"{topic} | {e}")
+                    return {"error_code": "06", "msg": str(e)}
+                if chatbot is not self:
+                    return await chatbot.process_query(user_id, topic_id, user_query, **kwargs)
+
+            # Clean the query
+            cleaned_query = user_query.strip().lower()
+
+            # Check if this is a special command to inspect vector store
+            if any(cmd in cleaned_query for cmd in ["vector store", "data in store", "check store"]):
+                store_info = self.get_vector_store_info()
+                return {
+                    "msg": "success",
+                    "data": {
+                        "answer": store_info,
+                        "type_res": "vector_store_info"
                     }
+                }
 
-                # Treat the entire user_query as a single question
-                question = user_query.strip()
-                if not question:
-                    return {
-                        "msg": "No valid question found in the input.",
-                        "data": {
-                            "answer": "",
-                            "type_res": "no_valid_question"
-                        }
+            # Treat the entire user_query as a single question
+            question = user_query.strip()
+            if not question:
+                return {
+                    "msg": "No valid question found in the input.",
+                    "data": {
+                        "answer": "",
+                        "type_res": "no_valid_question"
                     }
+                }
 
-                # Select the appropriate QA chain based on model_choice
-                model_choice_upper = model_choice.upper()
-                if model_choice_upper not in self.qa_chains:
-                    logger.error(f"Invalid model choice: {model_choice}")
-                    return {
-                        "msg": f"Invalid model choice: {model_choice}. Choose either 'GPT' or 'CLAUDE'.",
-                        "data": {
-                            "answer": "",
-                            "type_res": "invalid_model_choice"
-                        }
+            # Select the appropriate QA chain based on model_choice.
+            # Take a snapshot so a concurrent rebuild can't swap chains mid-request.
+            qa_chains = self.qa_chains
+            model_choice_upper = model_choice.upper()
+            if model_choice_upper == self.COMPARE_MODEL:
+                answers = await self.compare_models(question, qa_chains, retrieval_query)
+                if all("error_code" in result for result in answers.values()):
+                    return next(iter(answers.values()))
+                return {
+                    "msg": "success",
+                    "data": {
+                        "answers": answers,
+                        "type_res": "compare"
                     }
-                
-                qa_chain = self.qa_chains[model_choice_upper]
+                }
+            if model_choice_upper not in qa_chains:
+                logger.error(f"Invalid model choice: {model_choice}")
+                return {
+                    "msg": f"Invalid model choice: {model_choice}. Choose 'GPT', 'CLAUDE' or 'BOTH'.",
+                    "data": {
+                        "answer": "",
+                        "type_res": "invalid_model_choice"
+                    }
+                }
+            
+            qa_chain = qa_chains[model_choice_upper]
 
-                # Process the single question
-                response = await self.process_single_question(question, qa_chain)
+            # Process the single question
+            response = await self.process_single_question(question, qa_chain, model_choice_upper, retrieval_query)
 
-                if "error_code" in response:
-                    return response
+            if "error_code" in response:
+                return response
 
-                answer = response.get('answer', '')
-                type_res = response.get('type_res', 'generate')
+            answer = response.get('answer', '')
+            type_res = response.get('type_res', 'generate')
 
-                return {
-                    "msg": "success",
-                    "data": {
-                        "answer": answer,
-                        "type_res": type_res
-                    }
+            return {
+                "msg": "success",
+                "data": {
+                    "answer": answer,
+                    "type_res": type_res
                 }
-            except Exception as e:
-                logger.error(f"{topic} | Error processing request: {str(e)}")
-                return {"error_code": "02", "msg": f"Error processing request: {str(e)}"}
+            }
+        except Exception as e:
+            logger.error(f"{topic} | Error processing request: {str(e)}")
+            return {"error_code": "02", "msg": f"Error processing request: {str(e)}"}
+
+        finally:
+            end_time = time.time()
+            self.log_time(f"{topic}", description, start_time, end_time)
 
-            finally:
-                end_time = time.time()
-                self.log_time(f"{topic}", description, start_time, end_time)
\ No newline at end of file
+    async def answer_batch(self, questions: List[str], model_choice: str = "GPT",
+                           concurrency: int = BATCH_ASK_CONCURRENCY) -> AsyncIterator[dict]:
+        """
+        Answers standalone questions (no conversation history) with the selected model and yields
+        {"index": ..., "question": ..., "answer": ..., "type_res": ...} (or "error_code" and "msg" instead
+        of the answer) for each question as soon as it is done, so items arrive out of order.
+        Cached answers come first; the other questions are embedded in one request and searched with one
+        matrix search (HybridRetriever.asearch_batch), then at most `concurrency` answers are generated at a time.
+        The semantic cache is looked up with the embeddings of that search, the text cache before it.
+        """
+        model_choice = model_choice.upper()
+        # One snapshot for the whole batch, like a single request
+        qa_chains = self.qa_chains
+        if model_choice not in qa_chains:
+            raise ValueError(f"Invalid model choice: {model_choice}. Choose either 'GPT' or 'CLAUDE'.")
+        qa_chain = qa_chains[model_choice]
+        start_time = time.time()
+        retriever = qa_chain.retriever
+        semantic = self.semantic_cache is not None and isinstance(retriever, RerankingRetriever)
+
+        pending = list(range(len(questions)))
+        if not semantic:
+            cached = await asyncio.gather(*(self.check_cache(question) for question in questions))
+            pending = []
+            for index, (cached_answers, cache_status) in enumerate(cached):
+                if cache_status == "cache" and cached_answers:
+                    yield {"index": index, "question": questions[index], "answer": cached_answers[0], "type_res": "cache"}
+                else:
+                    pending.append(index)
+            if not pending:
+                return
+
+        cache_hits = []
+        try:
+            pending_questions = [questions[index] for index in pending]
+            if isinstance(retriever, RerankingRetriever):
+                searched = await retriever.candidates.asearch_batch(pending_questions)
+                if semantic:
+                    cached = await asyncio.gather(*(self.check_cache(question, query_vector)
+                                                    for question, (query_vector, _) in zip(pending_questions, searched)))
+                    hits = {i for i, (cached_answers, cache_status) in enumerate(cached)
+                            if cache_status == "cache" and cached_answers}
+                    cache_hits = [(pending[i], cached[i][0][0]) for i in sorted(hits)]
+                    pending = [index for i, index in enumerate(pending) if i not in hits]
+                    searched = [found for i, found in enumerate(searched) if i not in hits]
+                query_vectors = [query_vector for query_vector, _ in searched]
+                documents = await asyncio.gather(*(retriever.aselect(vector, found) for vector, found in searched))
+            else:
+                query_vectors = [None] * len(pending)
+                documents = await asyncio.gather(*(self.retrieve_documents(q, qa_chain) for q in pending_questions))
+        except Exception as e:
+            logger.error(f"Error retrieving documents for a batch of {len(pending)} questions: {e}")
+            for index in pending:
+                yield {"index": index, "question": questions[index], "error_code": "04",
+                       "msg": f"Error processing question: {str(e)}"}
+            return
+        self.log_time("Batch Retrieval", f"Retrieving documents for {len(pending)} questions", start_time, time.time())
+        for index, cached_answer in cache_hits:
+            yield {"index": index, "question": questions[index], "answer": cached_answer, "type_res": "cache"}
+        if not pending:
+            return
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def answer(index: int, question_documents: List[Document],
+                         query_vector: Optional[List[float]]) -> Tuple[int, dict]:
+            async with semaphore:
+                return index, await self.generate_answer(questions[index], question_documents, qa_chain, model_choice,
+                                                         query_vector=query_vector)
+
+        tasks = [asyncio.create_task(answer(index, question_documents, query_vector))
+                 for index, question_documents, query_vector in zip(pending, documents, query_vectors)]
+        try:
+            for task in asyncio.as_completed(tasks):
+                index, result = await task
+                yield {"index": index, "question": questions[index], **result}
+        finally:
+            # The consumer stopped early (e.g. the client disconnected)
+            for task in tasks:
+                task.cancel()
+            self.log_time("Batch Answering", f"Answering {len(questions)} questions with {model_choice}",
+                          start_time, time.time())
+
+    async def build_stream_prompt(self, question: str, qa_chain: RetrievalQA, retrieval_query: Optional[str] = None,
+                                  documents: Optional[List[Document]] = None) -> Tuple[object, str]:
+        """
+        Runs the retrieval half of a "stuff" RetrievalQA chain (for `retrieval_query` when given), unless the
+        `documents` are already retrieved, and renders its prompt, so the chain's LLM can be streamed directly.
+        """
+        docs = documents if documents is not None else \
+            await self.retrieve_documents(retrieval_query or question, qa_chain)
+        combine_chain = qa_chain.combine_documents_chain
+        inputs = combine_chain._get_inputs(docs, question=question)
+        prompt = combine_chain.llm_chain.prompt.format(**inputs)
+        return combine_chain.llm_chain.llm, prompt
+
+    async def stream_query(self, user_id: str, topic_id: str, user_query: str, **kwargs) -> AsyncIterator[dict]:
+        """
+        Streams the answer for the user query using the selected AI model (GPT or Claude);
+        `retrieval_query` works as in process_query. Yields {"event": "token", "token": ...} items followed by a single
+        {"event": "end", "answer": ..., "type_res": ...} item, or one {"event": "error", ...} item.
+        """
+        model_choice = kwargs.get("model_choice", "GPT")
+        retrieval_query = kwargs.get("retrieval_query")
+        collection = kwargs.pop("collection", None)
+        topic = "User Query Streaming"
+        description = f"Streaming user query for user_id: {user_id} and topic_id: {topic_id}"
+        start_time = time.time()
+
+        try:
+            if collection:
+                try:
+                    chatbot = await self.resolve_collection(collection)
+                except ValueError as e:
+                    logger.error(f"{topic} | {e}")
+                    yield {"event": "error", "error_code": "06", "msg": str(e)}
+                    return
+                if chatbot is not self:
+                    async for event in chatbot.stream_query(user_id, topic_id, user_query, **kwargs):
+                        yield event
+                    return
+
+            question = user_query.strip()
+            if not question:
+                yield {"event": "error", "error_code": "05", "msg": "No valid question found in the input."}
+                return
+
+            qa_chains = self.qa_chains
+            model_choice_upper = model_choice.upper()
+            if model_choice_upper not in qa_chains:
+                logger.error(f"Invalid model choice: {model_choice}")
+                yield {
+                    "event": "error",
+                    "error_code": "05",
+                    "msg": f"Invalid model choice: {model_choice}. Choose either 'GPT' or 'CLAUDE'."
+                }
+                return
+
+            # Cache hits are flushed in one event
+            retrieval_query = retrieval_query or question
+            qa_chain = qa_chains[model_choice_upper]
+            cached_answer, query_vector, documents = await self.retrieve_or_cached(retrieval_query, qa_chain)
+            if cached_answer is not None:
+                yield {"event": "token", "token": cached_answer}
+                yield {"event": "end", "answer": cached_answer, "type_res": "cache"}
+                return
+
+            llm, prompt = await self.build_stream_prompt(question, qa_chain, retrieval_query, documents=documents)
+            tokens = []
+            async for token in llm.astream(prompt):
+                if not token:
+                    continue
+                if not tokens:
+                    self.log_time(topic, "Time to first token", start_time, time.time())
+                tokens.append(token)
+                yield {"event": "token", "token": token}
+
+            answer = "".join(tokens).strip()
+            if answer:
+                await self.add_to_cache(retrieval_query, answer, query_vector)
+            yield {"event": "end", "answer": answer, "type_res": "generate"}
+        except Exception as e:
+            logger.error(f"{topic} | Error streaming request: {str(e)}")
+            yield {"event": "error", "error_code": "04", "msg": f"Error processing question: {str(e)}"}
+        finally:
+            end_time = time.time()
+            self.log_time(f"{topic}", description, start_time, end_time)
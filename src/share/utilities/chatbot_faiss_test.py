@@ -13,11 +13,12 @@ class ChatbotFAISSTest:
     ChatbotFAISSTest is designed to test the ChatbotFAISS class by generating questions,
     processing them with both GPT and Claude agents, and returning structured responses.
     """
-    def __init__(self):
+    def __init__(self, chatbot: ChatbotFAISS):
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.INFO)
-        self.chatbot = ChatbotFAISS()
-        self.qa_chains = self.chatbot.initialize_qa_chains()
+        self.chatbot = chatbot
+        # Snapshot of the live chains, so a rebuild during the run doesn't mix stores
+        self.qa_chains = chatbot.qa_chains
         self.question_generator = QuestionGenerator()
 
     async def run_tests(self, number_of_questions: int, topic: str) -> tuple[bool, List[Dict[str, Any]]]:
@@ -80,20 +81,9 @@ class ChatbotFAISSTest:
         result = {"question_id": question_id, "question": question, "responses": {}}
 
         try:
-            # Process with GPT
-            agent = "GPT"
-            qa_chain = self.qa_chains[agent]
-            self.logger.info(f"Processing question {question_id} with GPT.")
-            gpt_response = await self.chatbot.process_single_question(question, qa_chain)
-            result["responses"][agent] = gpt_response
-
-            # Process with Claude
-            agent = "CLAUDE"
-            qa_chain = self.qa_chains[agent]
-            self.logger.info(f"Processing question {question_id} with CLAUDE.")
-            claude_response = await self.chatbot.process_single_question(question, qa_chain)
-            result["responses"][agent] = claude_response
-
+            # Retrieve once, then let GPT and Claude answer concurrently
+            self.logger.info(f"Processing question {question_id} with GPT and CLAUDE.")
+            result["responses"] = await self.chatbot.compare_models(question, self.qa_chains)
             self.logger.info(f"Received responses for question {question_id}.")
 
         except Exception as e:
@@ -0,0 +1,179 @@
+# utilities/chunk_store.py
+
+import os
+import mmap
+import json
+import hashlib
+import logging
+import numpy as np
+
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Tuple, Union
+
+from langchain_core.documents import Document
+from langchain_community.docstore.base import Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+class ChunkStore(Docstore):
+    """
+    Read-only docstore backed by flat files next to index.faiss, replacing the pickled index.pkl:
+        chunks.text.bin     UTF-8 chunk texts, back to back
+        chunks.meta.bin     JSON metadata per chunk, back to back
+        chunks.ids.npy      chunk ids, row i being FAISS position i
+        chunks.order.npy    rows sorted by id, for id lookups
+        chunks.offsets.npy  (n + 1, 2) start offsets into the text and metadata blobs
+    Everything is memory-mapped, so opening costs the same for any corpus size and a chunk
+    is only decoded when a search returns it.
+    """
+    TEXT_FILE = "chunks.text.bin"
+    META_FILE = "chunks.meta.bin"
+    IDS_FILE = "chunks.ids.npy"
+    ORDER_FILE = "chunks.order.npy"
+    OFFSETS_FILE = "chunks.offsets.npy"
+    # The offsets file is written last and marks a complete store
+    FILE_NAMES = (TEXT_FILE, META_FILE, IDS_FILE, ORDER_FILE, OFFSETS_FILE)
+
+    def __init__(self, folder_path: str):
+        self.folder_path = folder_path
+        self.offsets = np.load(os.path.join(folder_path, self.OFFSETS_FILE), mmap_mode="r")
+        self.ids = np.load(os.path.join(folder_path, self.IDS_FILE), mmap_mode="r")
+        self.order = np.load(os.path.join(folder_path, self.ORDER_FILE), mmap_mode="r")
+        self.text = self._map(os.path.join(folder_path, self.TEXT_FILE))
+        self.metadata = self._map(os.path.join(folder_path, self.META_FILE))
+
+        if not (len(self.offsets) == len(self.ids) + 1 == len(self.order) + 1
+                and len(self.text) == self.offsets[-1, 0] and len(self.metadata) == self.offsets[-1, 1]):
+            raise ValueError(f"Chunk store in {folder_path} is incomplete or inconsistent.")
+
+    @staticmethod
+    def _map(path: str) -> Union[mmap.mmap, bytes]:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""  # Empty files cannot be mapped
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @classmethod
+    def exists(cls, folder_path: str) -> bool:
+        return os.path.exists(os.path.join(folder_path, cls.OFFSETS_FILE))
+
+    @classmethod
+    def write(cls, folder_path: str, ids: List[str], documents: List[Document]):
+        """
+        Writes the chunks in FAISS position order. Every file is replaced atomically, so processes
+        that still map the previous files keep reading those until they reopen the store.
+        """
+        os.makedirs(folder_path, exist_ok=True)
+        tmp_suffix = f".tmp{os.getpid()}"
+        paths = {name: os.path.join(folder_path, name) for name in cls.FILE_NAMES}
+        offsets = np.zeros((len(documents) + 1, 2), dtype=np.int64)
+
+        with open(paths[cls.TEXT_FILE] + tmp_suffix, "wb") as text_file, \
+                open(paths[cls.META_FILE] + tmp_suffix, "wb") as meta_file:
+            for row, document in enumerate(documents):
+                text = document.page_content.encode("utf-8")
+                metadata = json.dumps(document.metadata, ensure_ascii=False, default=str).encode("utf-8")
+                text_file.write(text)
+                meta_file.write(metadata)
+                offsets[row + 1] = offsets[row] + (len(text), len(metadata))
+
+        encoded_ids = cls.encode_ids(ids)
+        arrays = {
+            cls.IDS_FILE: encoded_ids,
+            cls.ORDER_FILE: np.argsort(encoded_ids, kind="stable").astype(np.int64),
+            cls.OFFSETS_FILE: offsets,
+        }
+        for name, array in arrays.items():
+            with open(paths[name] + tmp_suffix, "wb") as f:
+                np.save(f, array)
+
+        for path in paths.values():
+            os.replace(path + tmp_suffix, path)
+
+    @staticmethod
+    def encode_ids(ids: List[str]) -> np.ndarray:
+        """The chunk ids as the fixed-width UTF-8 array stored in chunks.ids.npy."""
+        return np.array([str(chunk_id).encode("utf-8") for chunk_id in ids] or [b""], dtype=bytes)[:len(ids)]
+
+    @classmethod
+    def remove(cls, folder_path: str) -> List[str]:
+        """Deletes the store's files and returns the paths that existed."""
+        removed = []
+        for name in cls.FILE_NAMES:
+            path = os.path.join(folder_path, name)
+            if os.path.exists(path):
+                os.remove(path)
+                removed.append(path)
+        return removed
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def chunk_id(self, row: int) -> str:
+        return self.ids[row].decode("utf-8")
+
+    def row_of(self, chunk_id: str) -> int:
+        """Binary search over the sorted ids; -1 if the id is not in the store."""
+        key = np.bytes_(chunk_id.encode("utf-8"))
+        position = np.searchsorted(self.ids, key, sorter=self.order)
+        if position < len(self.order) and self.ids[self.order[position]] == key:
+            return int(self.order[position])
+        return -1
+
+    def document(self, row: int) -> Document:
+        text_start, meta_start = self.offsets[row]
+        text_end, meta_end = self.offsets[row + 1]
+        return Document(
+            id=self.chunk_id(row),
+            page_content=bytes(self.text[text_start:text_end]).decode("utf-8"),
+            metadata=json.loads(bytes(self.metadata[meta_start:meta_end]).decode("utf-8"))
+        )
+
+    def search(self, search: str) -> Union[str, Document]:
+        """Docstore lookup by chunk id, returning a message like InMemoryDocstore when missing."""
+        row = self.row_of(search)
+        if row < 0:
+            return f"ID {search} not found."
+        return self.document(row)
+
+    def index_to_docstore_id(self) -> "ChunkIdMapping":
+        return ChunkIdMapping(self)
+
+    def to_in_memory(self) -> Tuple[InMemoryDocstore, Dict[int, str]]:
+        """Decodes every chunk into a writable docstore and id mapping, for incremental updates."""
+        mapping = {row: self.chunk_id(row) for row in range(len(self))}
+        docstore = InMemoryDocstore({chunk_id: self.document(row) for row, chunk_id in mapping.items()})
+        return docstore, mapping
+
+def chunk_ids_digest(vector_store) -> str:
+    """
+    SHA-1 over the chunk ids in FAISS position order, shard after shard for a ShardedVectorStore.
+    Stores opened from chunk files hash their memory-mapped ids file as is, without decoding an id.
+    """
+    digest = hashlib.sha1()
+    for store in getattr(vector_store, "shards", [vector_store]):
+        if isinstance(store.docstore, ChunkStore):
+            ids = store.docstore.ids
+        else:
+            ids = ChunkStore.encode_ids([chunk_id for _, chunk_id in sorted(store.index_to_docstore_id.items())])
+        digest.update(hashlib.sha1(np.ascontiguousarray(ids)).digest())
+    return digest.hexdigest()
+
+class ChunkIdMapping(Mapping):
+    """FAISS position -> chunk id, read lazily from the chunk store instead of a dict built at load."""
+
+    def __init__(self, store: ChunkStore):
+        self.store = store
+
+    def __getitem__(self, position: int) -> str:
+        if not 0 <= position < len(self.store):
+            raise KeyError(position)
+        return self.store.chunk_id(position)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(len(self.store)))
+
+    def __len__(self) -> int:
+        return len(self.store)
@@ -0,0 +1,331 @@
+# utilities/conftest.py
+
+import os
+import sys
+import zlib
+import asyncio
+import numpy as np
+import httpx
+import pytest
+import pytest_asyncio
+
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import AsyncMock, MagicMock
+from fastapi import FastAPI
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from redis.exceptions import ResponseError
+
+# Mirror the container layout (/app/service) so tests can import `utilities.*`, `routes.*`, ...
+SHARE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVICE_DIR = os.path.join(os.path.dirname(SHARE_DIR), "fastapi-ai-chat")
+for path in (SHARE_DIR, SERVICE_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+# settings.configs reads these with os.environ[...]; provide harmless defaults for unit tests
+TEST_ENV = {
+    "API_VERSION": "test",
+    "API_PATH_FASTAPI_OAUTH2": "/oauth",
+    "API_PATH_FASTAPI_AI_CHAT": "/langgpt",
+    "API_DOC": "/docs",
+    "REQUEST_QUEUE_SIZE": "10",
+    "HOST": "0.0.0.0",
+    "PORT_FASTAPI_OAUTH2": "8001",
+    "PORT_FASTAPI_AI_CHAT": "8002",
+    "USERNAME_ADMIN": "test",
+    "PASSWORD_ADMIN": "test",
+    "REDIS_HOST": "localhost",
+    "REDIS_PORT": "6379",
+    "TEMPERATURE": "0.3",
+    "BUILD_VECTOR_STORE": "False",
+    "CLEAR_CACHE": "False",
+    "OPENAI_API_KEY": "test",
+    "MODEL_ID_GPT": "gpt-test",
+    "PERSIST_DIRECTORY": "/tmp/faiss_index_test",
+    "PDF_DIRECTORY_PATH": "/tmp/pdf_test",
+    "AWS_ACCESS_KEY_ID": "test",
+    "AWS_SECRET_ACCESS_KEY": "test",
+    "AWS_REGION_NAME": "us-west-2",
+    "MODEL_ID_CLAUDE": "claude-test",
+}
+for key, value in TEST_ENV.items():
+    os.environ.setdefault(key, value)
+
+# settings.configs is read on import, so the repo modules come after the environment
+from core.auth import valid_access_token
+from instances import app_state
+from routes import langgpt
+from utilities.chatbot_faiss import ChatbotFAISS
+from utilities.faiss_index_factory import FaissIndexSettings
+from utilities.index_versions import IndexVersions
+from utilities.vector_shards import ShardLayout
+
+# Stubs and fixtures shared by the test modules, which import the helpers with `from conftest import ...`
+
+class HashEmbeddings(Embeddings):
+    """Deterministic pseudo-random unit vectors per text."""
+    def __init__(self, size: int = 16):
+        self.size = size
+
+    def vector(self, text):
+        vector = np.random.default_rng(zlib.crc32(text.encode("utf-8"))).normal(size=self.size).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_query(self, text):
+        return self.vector(text)
+
+    def embed_documents(self, texts):
+        return [self.vector(text) for text in texts]
+
+class CountingEmbeddings(HashEmbeddings):
+    """HashEmbeddings counting query embeddings and async document requests."""
+    def __init__(self, size: int = 16):
+        super().__init__(size)
+        self.query_calls = 0
+        self.document_calls = 0
+
+    def embed_query(self, text):
+        self.query_calls += 1
+        return self.vector(text)
+
+    async def aembed_query(self, text):
+        return self.embed_query(text)
+
+    async def aembed_documents(self, texts):
+        self.document_calls += 1
+        return self.embed_documents(texts)
+
+class KeywordEmbeddings(Embeddings):
+    """One dimension per keyword, so chunks with the same keywords are near-duplicates. Counts query embeddings."""
+    KEYWORDS = ["warranty", "repair", "refund", "shipping"]
+
+    def __init__(self):
+        self.queries = 0
+
+    def vector(self, text):
+        vector = np.array([text.lower().count(word) for word in self.KEYWORDS], dtype=np.float32) + 0.01
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_query(self, text):
+        self.queries += 1
+        return self.vector(text)
+
+    def embed_documents(self, texts):
+        return [self.vector(text) for text in texts]
+
+def answer_to(inputs):
+    return f"answer to {inputs['question'][-20:]}"
+
+class StubCombineChain:
+    """Stands in for the "stuff" documents chain: records the questions and sleeps like a slow LLM call."""
+    input_key = "input_documents"
+    output_key = "output_text"
+
+    def __init__(self, delay: float = 0.0, answer=answer_to):
+        self.delay = delay
+        self.answer = answer
+        self.questions = []
+        self.running = 0
+        self.max_running = 0
+
+    def invoke(self, inputs):
+        raise AssertionError("generation must use ainvoke")
+
+    async def ainvoke(self, inputs):
+        self.questions.append(inputs["question"])
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(self.delay)
+        self.running -= 1
+        return {"output_text": self.answer(inputs)}
+
+class StubQAChain:
+    """Stands in for RetrievalQA; without a retriever no documents are found."""
+    def __init__(self, retriever=None, combine_documents_chain=None):
+        if retriever is None:
+            retriever = AsyncMock()
+            retriever.ainvoke = AsyncMock(return_value=[])
+        self.retriever = retriever
+        self.combine_documents_chain = combine_documents_chain or StubCombineChain()
+
+class FakePipeline:
+    """Queues the commands and runs them in order on execute."""
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.calls = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def __getattr__(self, name):
+        method = getattr(self.redis_client, name)
+        return lambda *args, **kwargs: self.calls.append(method(*args, **kwargs))
+
+    async def execute(self):
+        return [await call for call in self.calls]
+
+class FakeRedis:
+    """
+    In-memory hashes, lists and counters with bytes replies like decode_responses=False, and without
+    the RediSearch module. `calls` records the commands that read a whole hash or list.
+    """
+    def __init__(self):
+        self.hashes = {}
+        self.lists = {}
+        self.strings = {}
+        self.calls = []
+
+    @staticmethod
+    def _bytes(value):
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    def ft(self, index_name):
+        search = MagicMock()
+        search.info = AsyncMock(side_effect=ResponseError("unknown command 'FT.INFO'"))
+        return search
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def hkeys(self, key):
+        self.calls.append("hkeys")
+        return [self._bytes(field) for field in self.hashes.get(key, {})]
+
+    async def hget(self, key, field):
+        value = self.hashes.get(key, {}).get(field)
+        return self._bytes(value) if value is not None else None
+
+    async def hmget(self, key, fields):
+        return [await self.hget(key, field) for field in fields]
+
+    async def hexists(self, key, field):
+        return field in self.hashes.get(key, {})
+
+    async def hset(self, key, field=None, value=None, mapping=None):
+        """Returns the number of new fields, like HSET."""
+        values = dict(mapping or {})
+        if field is not None:
+            values[field] = value
+        fields = self.hashes.setdefault(key, {})
+        added = sum(name not in fields for name in values)
+        fields.update(values)
+        return added
+
+    async def hdel(self, key, *fields):
+        fields = [field.decode() if isinstance(field, bytes) else field for field in fields]
+        return sum(self.hashes.get(key, {}).pop(field, None) is not None for field in fields)
+
+    async def get(self, key):
+        value = self.strings.get(key)
+        return self._bytes(value) if value is not None else None
+
+    async def incr(self, key):
+        self.strings[key] = int(self.strings.get(key, 0)) + 1
+        return self.strings[key]
+
+    async def llen(self, key):
+        return len(self.lists.get(key, []))
+
+    async def lrange(self, key, start, end):
+        self.calls.append("lrange")
+        items = self.lists.get(key, [])
+        return [self._bytes(item) for item in items[start:len(items) if end == -1 else end + 1]]
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and (key in self.strings or key in self.hashes or key in self.lists):
+            return None
+        self.strings[key] = value
+        return True
+
+    async def ltrim(self, key, start, end):
+        items = self.lists.get(key, [])
+        self.lists[key] = items[start:len(items) if end == -1 else end + 1]
+
+    async def rpush(self, key, *values):
+        self.lists.setdefault(key, []).extend(values)
+        return len(self.lists[key])
+
+    async def scan_iter(self, match):
+        prefix = match.rstrip("*")
+        for key in list(self.hashes) + list(self.lists) + list(self.strings):
+            if key.startswith(prefix):
+                yield key.encode()
+
+    async def delete(self, *keys):
+        for key in keys:
+            key = key.decode() if isinstance(key, bytes) else key
+            for store in (self.hashes, self.lists, self.strings):
+                store.pop(key, None)
+
+def make_indexing_chatbot(pdf_dir, persist_dir, embeddings=None):
+    """
+    A ChatbotFAISS with only what building and loading the vector store needs. PDFs are plain text files,
+    one chunk per line; `bot.parsed` lists the files the ingestion pool split.
+    """
+    bot = ChatbotFAISS.__new__(ChatbotFAISS)
+    bot.pdf_directory_path = str(pdf_dir)
+    bot.persist_directory = str(persist_dir)
+    bot.embeddings = embeddings or HashEmbeddings()
+    bot.index_settings = FaissIndexSettings()
+    bot.load_mode = "default"
+    bot.rebuild_lock = MagicMock()
+    bot.initialize_qa_chains = MagicMock(return_value={})
+    bot.retrieval_cache = None
+    bot.vector_store = None
+    bot.shard_layout = ShardLayout(str(persist_dir))
+    bot.index_versions = IndexVersions(str(persist_dir))
+    bot.store_directory = str(persist_dir)
+    bot.loaded_version = bot.rejected_version = None
+    bot.qa_chains = {}
+    bot.retired_chains = []
+    bot.shard_search_pool = None
+    bot.parsed = []
+
+    class FakeIngestionPool:
+        def split_pdfs(self, pdf_paths):
+            chunks_by_path = {}
+            for pdf_path in pdf_paths:
+                bot.parsed.append(os.path.basename(pdf_path))
+                with open(pdf_path, encoding="utf-8") as f:
+                    chunks_by_path[pdf_path] = [
+                        Document(page_content=line, metadata={"source": pdf_path}) for line in f.read().splitlines()
+                    ]
+            return chunks_by_path
+
+    bot.ingestion_pool = FakeIngestionPool()
+    return bot
+
+@pytest.fixture
+def chatbot(tmp_path):
+    pdf_dir = tmp_path / "pdfs"
+    pdf_dir.mkdir()
+    bot = make_indexing_chatbot(pdf_dir, tmp_path / "index")
+    yield bot
+    if bot.shard_search_pool is not None:
+        bot.shard_search_pool.shutdown()
+
+@pytest.fixture
+def shard_pool():
+    """The search threads of ShardedVectorStores built directly by a test."""
+    executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="faiss-shard")
+    yield executor
+    executor.shutdown()
+
+@pytest_asyncio.fixture
+async def client(chat_bot):
+    """The chat routes serving `chat_bot`, which each test module provides as a fixture."""
+    app = FastAPI()
+    app.include_router(langgpt.router)
+    app.dependency_overrides[valid_access_token] = lambda: {"detail": "Valid access token!"}
+
+    app_state.chat_bot = chat_bot
+    app_state.conversation_manager = AsyncMock()
+    app_state.conversation_manager.get_conversation_history = AsyncMock(return_value=[])
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
@@ -0,0 +1,145 @@
+# utilities/context_packer.py
+
+import logging
+import threading
+import numpy as np
+
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+def _get_encoding():
+    """cl100k_base if tiktoken and its encoding file are available; False otherwise (cached)."""
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception as e:
+                    logger.info(f"tiktoken unavailable ({type(e).__name__}); estimating tokens as characters / 4.")
+                    _encoding = False
+    return _encoding
+
+def count_tokens(text: str) -> int:
+    """Tokens in text; exact for OpenAI models, a close estimate for Claude."""
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text))
+    return (len(text) + 3) // 4
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    encoding = _get_encoding()
+    if encoding:
+        return encoding.decode(encoding.encode(text)[:max_tokens])
+    return text[:max_tokens * 4]
+
+def overlap_length(first: str, second: str, max_overlap: int, min_overlap: int = 20) -> int:
+    """Length of the longest suffix of `first` that is a prefix of `second` (0 if shorter than min_overlap)."""
+    for length in range(min(max_overlap, len(first), len(second)), min_overlap - 1, -1):
+        if first.endswith(second[:length]):
+            return length
+    return 0
+
+@dataclass
+class PackingReport:
+    chunks_in: int
+    chunks_out: int
+    tokens_in: int
+    tokens_out: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_in - self.tokens_out
+
+class ContextPacker:
+    """
+    Turns retrieved chunks into the `{context}` of a prompt within a token budget:
+    1. adaptive k: drops chunks scoring below `min_score`, or more than `max_score_gap` below the best one;
+    2. merges neighbouring chunks of the same page whose texts overlap (the splitter's chunk_overlap),
+       and drops chunks contained in another;
+    3. adds chunks in rank order until the budget is used, truncating the last one.
+    Scores are cosine similarities to the query; 0 disables a threshold.
+    """
+    def __init__(self, token_budget: int, min_score: float = 0.0, max_score_gap: float = 0.0,
+                 max_overlap: int = 400, separator: str = "\n\n"):
+        self.token_budget = token_budget
+        self.min_score = min_score
+        self.max_score_gap = max_score_gap
+        self.max_overlap = max_overlap
+        self.separator = separator
+
+    def _keep(self, scores: Sequence[float]) -> List[int]:
+        """Indices of the chunks that pass the score thresholds; the best chunk is always kept."""
+        if not len(scores):
+            return []
+        scores = np.asarray(scores, dtype=np.float32)
+        best = float(scores.max())
+        keep = np.ones(len(scores), dtype=bool)
+        if self.min_score > 0:
+            keep &= scores >= self.min_score
+        if self.max_score_gap > 0:
+            keep &= scores >= best - self.max_score_gap
+        keep[int(scores.argmax())] = True
+        return [int(i) for i in np.flatnonzero(keep)]
+
+    @staticmethod
+    def _same_page(first: Document, second: Document) -> bool:
+        return (first.metadata.get("source"), first.metadata.get("page")) == \
+            (second.metadata.get("source"), second.metadata.get("page"))
+
+    def _merge(self, documents: List[Document]) -> List[Document]:
+        """Merges overlapping chunks of the same page into the higher ranked one."""
+        merged: List[Document] = []
+        for document in documents:
+            text = document.page_content
+            for i, kept in enumerate(merged):
+                if not self._same_page(kept, document):
+                    continue
+                if text in kept.page_content:
+                    break
+                if kept.page_content in text:
+                    merged[i] = Document(id=kept.id, page_content=text, metadata=kept.metadata)
+                    break
+                after = overlap_length(kept.page_content, text, self.max_overlap)
+                before = overlap_length(text, kept.page_content, self.max_overlap)
+                if after or before:
+                    combined = kept.page_content + text[after:] if after >= before else text + kept.page_content[before:]
+                    merged[i] = Document(id=kept.id, page_content=combined, metadata=kept.metadata)
+                    break
+            else:
+                merged.append(document)
+        return merged
+
+    def pack(self, documents: List[Document], scores: Optional[Sequence[float]] = None) -> Tuple[List[Document], PackingReport]:
+        """Returns the documents to put into the prompt, in rank order, and what packing saved."""
+        chunks_in = len(documents)
+        tokens_in = sum(count_tokens(document.page_content) for document in documents)
+        if scores is not None:
+            documents = [documents[i] for i in self._keep(scores)]
+        documents = self._merge(documents)
+
+        packed, used = [], 0
+        separator_tokens = count_tokens(self.separator)
+        for document in documents:
+            remaining = self.token_budget - used - (separator_tokens if packed else 0)
+            if remaining <= 0:
+                break
+            tokens = count_tokens(document.page_content)
+            if tokens > remaining:
+                document = Document(id=document.id, page_content=truncate_to_tokens(document.page_content, remaining),
+                                    metadata=document.metadata)
+                tokens = count_tokens(document.page_content)
+            packed.append(document)
+            used += tokens + (separator_tokens if len(packed) > 1 else 0)
+
+        tokens_out = sum(count_tokens(document.page_content) for document in packed)
+        return packed, PackingReport(chunks_in, len(packed), tokens_in, tokens_out)
@@ -1,9 +1,11 @@
 # utilities/dependencies.py
 
 import asyncio
+from typing import Callable, Optional
 from fastapi import HTTPException, status
 
-from settings.configs import REQUEST_QUEUE_SIZE
+from settings.configs import REQUEST_QUEUE_SIZE, STARTUP_WAIT_SECONDS
+from utilities.startup_status import StartupStatus
 
 # Initialize the semaphore with the desired concurrency limit
 semaphore = asyncio.Semaphore(REQUEST_QUEUE_SIZE)  # e.g., REQUEST_QUEUE_SIZE = 10
@@ -17,4 +19,20 @@ async def limit_concurrency():
             detail="Too many requests, please try again later."
         )
     await semaphore.acquire()
-    return semaphore
\ No newline at end of file
+    return semaphore
+
+def wait_until_ready(get_status: Callable[[], Optional[StartupStatus]]):
+    """
+    Builds a dependency that holds requests for up to STARTUP_WAIT_SECONDS while the service
+    warms up, then rejects them with 503 so clients can retry elsewhere.
+    """
+    async def dependency():
+        startup_status = get_status()
+        if startup_status is None or not await startup_status.wait(STARTUP_WAIT_SECONDS):
+            stage = startup_status.stage if startup_status else "pending"
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"Service is starting up (stage: {stage}), please try again later.",
+                headers={"Retry-After": "5"}
+            )
+    return dependency
@@ -0,0 +1,86 @@
+# utilities/embedding_batcher.py
+
+import time
+import asyncio
+import logging
+
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent single-text embedding requests into one batched call.
+    Requests are collected for up to `max_wait_ms` (or until `max_batch_size` are waiting),
+    embedded together, and each caller gets back its own vector.
+    """
+    def __init__(self, embed_batch: Callable[[List[str]], Awaitable[List[List[float]]]],
+                 max_wait_ms: float = 10, max_batch_size: int = 64):
+        self.embed_batch = embed_batch
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_size = max(1, max_batch_size)
+        self._pending: List[Tuple[str, asyncio.Future, float]] = []
+        self._flush_handle = None
+        self._tasks = set()
+
+        # Metrics
+        self.requests = 0
+        self.batched = 0
+        self.batches = 0
+        self.max_batch = 0
+        self.total_wait = 0.0
+
+    async def embed(self, text: str) -> List[float]:
+        """Queues a text for the next batch and waits for its vector."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future, time.perf_counter()))
+        self.requests += 1
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, []
+        if pending:
+            task = asyncio.ensure_future(self._run_batch(pending))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, pending: List[Tuple[str, asyncio.Future, float]]):
+        started = time.perf_counter()
+        waits = [started - queued_at for _, _, queued_at in pending]
+        self.batches += 1
+        self.batched += len(pending)
+        self.max_batch = max(self.max_batch, len(pending))
+        self.total_wait += sum(waits)
+
+        # Identical concurrent questions share one input
+        texts = list(dict.fromkeys(text for text, _, _ in pending))
+        logger.info(f"Embedding batch | size: {len(pending)} ({len(texts)} unique) | max added wait: {max(waits) * 1000:.1f} ms")
+        try:
+            vectors = dict(zip(texts, await self.embed_batch(texts)))
+            for text, future, _ in pending:
+                if not future.done():
+                    future.set_result(vectors[text])
+        except Exception as e:
+            logger.error(f"Error in embedding batch: {e}")
+            for _, future, _ in pending:
+                if not future.done():
+                    future.set_exception(e)
+
+    def stats(self) -> Dict[str, float]:
+        """Batch size and added wait time metrics."""
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "avg_batch_size": self.batched / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch,
+            "avg_wait_ms": self.total_wait / self.batched * 1000 if self.batched else 0.0,
+        }
@@ -0,0 +1,183 @@
+# utilities/faiss_index_factory.py
+
+import os
+import json
+import logging
+import faiss
+import numpy as np
+
+from dataclasses import dataclass, asdict
+from typing import Optional, Sequence
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+INDEX_TYPES = ("Flat", "IVFFlat", "IVFPQ", "HNSW")
+# How Flat, IVFFlat and HNSW indexes store vectors: full float32, float16 or int8 scalar quantization
+# (1/2 and 1/4 of the memory), or float32 after a PCA down to pca_dimension
+VECTOR_ENCODINGS = ("float32", "float16", "int8", "pca")
+_STORAGE = {"float32": "Flat", "float16": "SQfp16", "int8": "SQ8", "pca": "Flat"}
+
+def base_index(index: faiss.Index) -> faiss.Index:
+    """The index behind a PCA transform (the index itself otherwise)."""
+    if isinstance(index, faiss.IndexPreTransform):
+        return faiss.downcast_index(index.index)
+    return index
+
+def reconstruct_vectors(index: faiss.Index, rows: Sequence[int]) -> Optional[np.ndarray]:
+    """The vectors stored at the given rows, or None if the index cannot reconstruct them."""
+    rows = np.asarray(rows, dtype=np.int64)
+    try:
+        try:
+            return index.reconstruct_batch(rows)
+        except RuntimeError:
+            # IVF indexes need a direct map from ids to list entries first
+            faiss.extract_index_ivf(index).make_direct_map()
+            return index.reconstruct_batch(rows)
+    except RuntimeError as e:
+        logger.warning(f"Cannot reconstruct vectors from the FAISS index: {e}")
+        return None
+
+@dataclass
+class FaissIndexSettings:
+    """
+    Describes which FAISS index to build and how to search it.
+    Build parameters (nlist, pq_m, pq_nbits, hnsw_m, ef_construction, vector_encoding, pca_dimension) only apply
+    when the index is built; search parameters (nprobe, ef_search, rescore_factor) are applied every time an index is loaded.
+    """
+    index_type: str = "Flat"
+    nlist: int = 256
+    nprobe: int = 16
+    pq_m: int = 64
+    pq_nbits: int = 8
+    hnsw_m: int = 32
+    ef_construction: int = 200
+    ef_search: int = 64
+    vector_encoding: str = "float32"
+    pca_dimension: int = 256
+    rescore_factor: int = 4
+
+    CONFIG_FILE_NAME = "index_config.json"
+
+    def __post_init__(self):
+        if self.index_type not in INDEX_TYPES:
+            raise ValueError(f"Unsupported FAISS index type: {self.index_type}. Choose one of {', '.join(INDEX_TYPES)}.")
+        if self.vector_encoding not in VECTOR_ENCODINGS:
+            raise ValueError(
+                f"Unsupported vector encoding: {self.vector_encoding}. Choose one of {', '.join(VECTOR_ENCODINGS)}."
+            )
+
+    @property
+    def supports_remove(self) -> bool:
+        """
+        Whether chunks can be deleted in place. LangChain's FAISS.delete renumbers the remaining rows as if
+        the index had compacted them, which only flat storage does: IVF lists keep the original ids (so the
+        next add reuses ids still in the lists) and HNSW graphs cannot drop vectors at all.
+        Changed or removed sources of the other types need a full rebuild.
+        """
+        return self.index_type == "Flat"
+
+    @property
+    def lossy(self) -> bool:
+        """Whether the index stores approximations, so full-precision vectors are kept for re-scoring."""
+        return self.vector_encoding != "float32" or self.index_type == "IVFPQ"
+
+    def pca_prefix(self, dimension: int, n_vectors: int) -> str:
+        if self.vector_encoding != "pca":
+            return ""
+        if self.pca_dimension >= dimension:
+            logger.warning(f"PCA dimension {self.pca_dimension} does not reduce dimension {dimension}; skipping PCA.")
+            return ""
+        if n_vectors < self.pca_dimension:
+            logger.warning(f"Only {n_vectors} vectors to train PCA to {self.pca_dimension} dimensions; skipping PCA.")
+            return ""
+        return f"PCA{self.pca_dimension},"
+
+    def factory_string(self, dimension: int, n_vectors: int) -> str:
+        """
+        Returns the faiss.index_factory description for this setting, shrinking or falling back
+        when there are too few vectors to train it.
+        """
+        prefix = self.pca_prefix(dimension, n_vectors)
+        storage = _STORAGE[self.vector_encoding]
+        if self.index_type == "Flat":
+            return f"{prefix}{storage}"
+        if self.index_type == "HNSW":
+            return f"{prefix}HNSW{self.hnsw_m}" + (f",{storage}" if storage != "Flat" else "")
+
+        # IVF: k-means wants ~39 training points per list
+        nlist = min(self.nlist, max(1, n_vectors // 39))
+        if nlist < self.nlist:
+            logger.warning(f"Only {n_vectors} vectors to train on; reducing nlist from {self.nlist} to {nlist}.")
+        if self.index_type == "IVFFlat":
+            return f"{prefix}IVF{nlist},{storage}"
+
+        if self.vector_encoding in ("float16", "int8"):
+            logger.warning(f"IVFPQ already compresses vectors; ignoring the {self.vector_encoding} encoding.")
+        if prefix:
+            dimension = self.pca_dimension
+        if dimension % self.pq_m != 0:
+            raise ValueError(f"PQ sub-quantizers ({self.pq_m}) must divide the embedding dimension ({dimension}).")
+        if n_vectors < 2 ** self.pq_nbits:
+            logger.warning(f"Only {n_vectors} vectors to train PQ{self.pq_m}x{self.pq_nbits}; falling back to IVFFlat.")
+            return f"{prefix}IVF{nlist},Flat"
+        return f"{prefix}IVF{nlist},PQ{self.pq_m}x{self.pq_nbits}"
+
+    def build_index(self, embeddings: np.ndarray) -> faiss.Index:
+        """Creates an empty index of this type, trained on `embeddings` when the type needs training."""
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        n_vectors, dimension = embeddings.shape
+        description = self.factory_string(dimension, n_vectors)
+        index = faiss.index_factory(dimension, description, faiss.METRIC_L2)
+        if self.index_type == "HNSW":
+            base_index(index).hnsw.efConstruction = self.ef_construction
+        if not index.is_trained:
+            logger.info(f"Training FAISS index '{description}' on {n_vectors} vectors.")
+            index.train(embeddings)
+        self.apply_search_params(index)
+        logger.info(f"Built FAISS index '{description}' (dimension: {dimension}).")
+        return index
+
+    def apply_search_params(self, index: faiss.Index):
+        """Sets nprobe / efSearch on a loaded or freshly built index."""
+        try:
+            faiss.extract_index_ivf(index).nprobe = self.nprobe
+        except RuntimeError:
+            pass  # Not an IVF index
+        hnsw = getattr(base_index(index), "hnsw", None)
+        if hnsw is not None:
+            hnsw.efSearch = self.ef_search
+
+    def save(self, directory: str, index: faiss.Index):
+        """Records the settings the index was built with next to it."""
+        path = os.path.join(directory, self.CONFIG_FILE_NAME)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump({**asdict(self), "dimension": index.d, "ntotal": index.ntotal}, f, indent=2)
+        os.replace(f"{path}.tmp", path)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["FaissIndexSettings"]:
+        """Reads the settings an existing index was built with; None for indexes built before this file existed."""
+        path = os.path.join(directory, cls.CONFIG_FILE_NAME)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        fields = cls.__dataclass_fields__
+        return cls(**{key: value for key, value in data.items() if key in fields})
+
+    def same_build(self, other: Optional["FaissIndexSettings"]) -> bool:
+        """Whether an index built with `other` matches these build parameters (search parameters may differ)."""
+        if other is None:
+            return self.index_type == "Flat" and self.vector_encoding == "float32"
+        if self.index_type != other.index_type or self.vector_encoding != other.vector_encoding:
+            return False
+        if self.vector_encoding == "pca" and self.pca_dimension != other.pca_dimension:
+            return False
+        if self.index_type in ("IVFFlat", "IVFPQ") and self.nlist != other.nlist:
+            return False
+        if self.index_type == "IVFPQ" and (self.pq_m, self.pq_nbits) != (other.pq_m, other.pq_nbits):
+            return False
+        if self.index_type == "HNSW" and self.hnsw_m != other.hnsw_m:
+            return False
+        return True
@@ -0,0 +1,155 @@
+# utilities/faiss_loader.py
+
+import os
+import uuid
+import pickle
+import hashlib
+import logging
+import resource
+import faiss
+
+from typing import Any, Dict, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_community.vectorstores import FAISS
+
+from utilities.chunk_store import ChunkStore
+from utilities.vector_compression import FullVectors
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# default: every worker reads its own copy of the index
+# mmap:    IVF inverted lists are memory-mapped read-only, so workers share the page cache
+#          (FAISS 1.8 loads Flat/HNSW indexes fully even with IO_FLAG_MMAP; use preload for those)
+# preload: the gunicorn master (--preload) reads the index once before forking and
+#          workers share its pages copy-on-write
+LOAD_MODES = ("default", "mmap", "preload")
+
+LEGACY_DOCSTORE_FILE = "index.pkl"
+
+VectorStoreFiles = Tuple[faiss.Index, Any, Dict[int, str]]
+
+_preloaded: Dict[str, Tuple[Tuple[float, float], VectorStoreFiles]] = {}
+
+def _docstore_file(folder_path: str) -> str:
+    if ChunkStore.exists(folder_path):
+        return os.path.join(folder_path, ChunkStore.OFFSETS_FILE)
+    return os.path.join(folder_path, LEGACY_DOCSTORE_FILE)
+
+def _signature(folder_path: str) -> Tuple[float, float]:
+    return (
+        os.path.getmtime(os.path.join(folder_path, "index.faiss")),
+        os.path.getmtime(_docstore_file(folder_path)),
+    )
+
+def index_version(*folder_paths: str) -> str:
+    """
+    Identifies the persisted index (or shards) by the files' modification times and sizes; every save
+    (full or incremental) yields a new version. A random one when nothing is persisted yet.
+    """
+    stats = []
+    for folder_path in folder_paths:
+        try:
+            paths = (os.path.join(folder_path, "index.faiss"), _docstore_file(folder_path))
+            stats.extend(os.stat(path) for path in paths)
+        except FileNotFoundError:
+            continue  # A shard without chunks
+    if not stats:
+        return uuid.uuid4().hex[:16]
+    signature = ":".join(f"{stat.st_mtime_ns}-{stat.st_size}" for stat in stats)
+    return hashlib.sha1(signature.encode("utf-8")).hexdigest()[:16]
+
+def read_vector_store_files(folder_path: str, mmap: bool = False, writable: bool = False) -> VectorStoreFiles:
+    """
+    Reads the index and its chunks. Chunks come from the memory-mapped chunk store, or decoded into
+    an InMemoryDocstore when `writable`. Stores saved before the chunk store existed are read from
+    the pickled index.pkl (our own output, the same trust model as load_local with
+    allow_dangerous_deserialization=True) and converted on the next save.
+    """
+    io_flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY if mmap else 0
+    index = faiss.read_index(os.path.join(folder_path, "index.faiss"), io_flags)
+    if ChunkStore.exists(folder_path):
+        store = ChunkStore(folder_path)
+        if writable:
+            return (index, *store.to_in_memory())
+        return index, store, store.index_to_docstore_id()
+
+    logger.info(f"Reading legacy {LEGACY_DOCSTORE_FILE}; it is replaced by the chunk store on the next save.")
+    with open(os.path.join(folder_path, LEGACY_DOCSTORE_FILE), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    return index, docstore, index_to_docstore_id
+
+def save_vector_store(folder_path: str, vector_store: FAISS):
+    """Writes the index, the chunk store and the full-precision vectors of a lossy index, and drops a legacy index.pkl."""
+    os.makedirs(folder_path, exist_ok=True)
+    positions = sorted(vector_store.index_to_docstore_id.items())
+    ids = [chunk_id for _, chunk_id in positions]
+    documents = [vector_store.docstore.search(chunk_id) for chunk_id in ids]
+    missing = [chunk_id for chunk_id, document in zip(ids, documents) if not isinstance(document, Document)]
+    if missing:
+        raise ValueError(f"{len(missing)} indexed chunks are missing from the docstore, e.g. {missing[0]}")
+
+    index_path = os.path.join(folder_path, "index.faiss")
+    faiss.write_index(vector_store.index, f"{index_path}.tmp")
+    ChunkStore.write(folder_path, ids, documents)
+    full_vectors = getattr(vector_store, "full_vectors", None)
+    if full_vectors is not None:
+        FullVectors.save(folder_path, full_vectors)
+    else:
+        FullVectors.remove(folder_path)  # Stale rows would no longer match the index
+    os.replace(f"{index_path}.tmp", index_path)
+
+    legacy_path = os.path.join(folder_path, LEGACY_DOCSTORE_FILE)
+    if os.path.exists(legacy_path):
+        os.remove(legacy_path)
+
+def preload_vector_store(folder_path: str) -> bool:
+    """Reads the persisted vector store into this process so forked workers can share it."""
+    try:
+        log_memory_usage("before preloading vector store")
+        signature = _signature(folder_path)
+        _preloaded[os.path.abspath(folder_path)] = (signature, read_vector_store_files(folder_path))
+        log_memory_usage("after preloading vector store")
+        return True
+    except FileNotFoundError:
+        logger.info(f"No FAISS index to preload at {folder_path}; workers will build or load it themselves.")
+        return False
+    except Exception as e:
+        logger.error(f"Error preloading FAISS vector store: {e}")
+        return False
+
+def get_preloaded(folder_path: str) -> Optional[VectorStoreFiles]:
+    """Returns the preloaded files if they are still what is on disk."""
+    entry = _preloaded.get(os.path.abspath(folder_path))
+    if entry is None:
+        return None
+    try:
+        if entry[0] != _signature(folder_path):
+            logger.info("Preloaded FAISS index is stale; reading it from disk.")
+            return None
+    except FileNotFoundError:
+        return None
+    return entry[1]
+
+def memory_usage() -> Dict[str, float]:
+    """
+    Resident memory of this process in MB. On Linux also PSS (shared pages divided between
+    the processes sharing them) and the shared part of RSS, which show what workers really cost.
+    """
+    usage = {"pid": os.getpid()}
+    try:
+        with open("/proc/self/smaps_rollup", "r") as f:
+            fields = {line.split(":")[0]: int(line.split()[1]) for line in f if line.split()[-1] == "kB"}
+        usage["rss_mb"] = round(fields.get("Rss", 0) / 1024, 1)
+        usage["pss_mb"] = round(fields.get("Pss", 0) / 1024, 1)
+        usage["shared_mb"] = round((fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0)) / 1024, 1)
+    except (OSError, ValueError, IndexError):
+        # Not Linux: fall back to peak RSS (kB on Linux, bytes on macOS; approximate)
+        usage["max_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return usage
+
+def log_memory_usage(label: str):
+    usage = memory_usage()
+    details = ", ".join(f"{key}: {value}" for key, value in usage.items())
+    logger.info(f"Memory | {label} | {details}")
@@ -0,0 +1,156 @@
+# utilities/hybrid_retriever.py
+
+import asyncio
+import logging
+import numpy as np
+
+from typing import Dict, List, Optional, Tuple, Union
+
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_community.vectorstores import FAISS
+
+from utilities.bm25_index import BM25Index
+from utilities.retrieval_cache import CachedRetrieval, RetrievalCache
+from utilities.vector_compression import search_batch
+from utilities.vector_shards import ShardedVectorStore
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+class HybridRetriever(BaseRetriever):
+    """
+    Dense FAISS search plus BM25 keyword search, fused with Reciprocal Rank Fusion:
+    score(chunk) = sum over both rankings of weight / (rrf_k + rank).
+    Exact names and codes that embed poorly are pulled up by BM25, so a smaller k suffices.
+    Without a sparse index it is a plain dense search. The vector store may be a single FAISS index or its shards.
+    With a RetrievalCache, repeated queries against the same index version skip embedding and search.
+    """
+    vector_store: Union[FAISS, ShardedVectorStore]
+    sparse_index: Optional[BM25Index] = None
+    k: int = 5
+    fetch_k: int = 20
+    rrf_k: int = 60
+    dense_weight: float = 1.0
+    sparse_weight: float = 1.0
+    cache: Optional[RetrievalCache] = None
+    index_version: str = ""
+
+    def _sparse_documents(self, query: str) -> List[Document]:
+        if self.sparse_index is None:
+            return []
+        documents = []
+        for chunk_id, _ in self.sparse_index.search(query, self.fetch_k):
+            document = self.vector_store.docstore.search(chunk_id)
+            if isinstance(document, Document):
+                documents.append(document)
+        return documents
+
+    def fuse_scored(self, dense: List[Document], sparse: List[Document]) -> List[Tuple[Document, float]]:
+        """Reciprocal Rank Fusion of the two rankings, keeping the k best chunks with their fused scores."""
+        scores: Dict[str, float] = {}
+        documents: Dict[str, Document] = {}
+        rankings: Tuple[Tuple[List[Document], float], ...] = ((dense, self.dense_weight), (sparse, self.sparse_weight))
+        for ranking, weight in rankings:
+            for rank, document in enumerate(ranking, start=1):
+                key = document.id or document.page_content
+                scores[key] = scores.get(key, 0.0) + weight / (self.rrf_k + rank)
+                documents.setdefault(key, document)
+        best = sorted(scores, key=scores.get, reverse=True)[:self.k]
+        return [(documents[key], scores[key]) for key in best]
+
+    def fuse(self, dense: List[Document], sparse: List[Document]) -> List[Document]:
+        return [document for document, _ in self.fuse_scored(dense, sparse)]
+
+    def _rank(self, query: str, dense: List[Tuple[Document, float]]) -> List[Tuple[Document, float]]:
+        """Final ranking: FAISS distances when dense-only, RRF scores when hybrid."""
+        if self.sparse_index is None:
+            return dense[:self.k]
+        return self.fuse_scored([document for document, _ in dense], self._sparse_documents(query))
+
+    def _cached(self, query: str) -> Tuple[Optional[str], Optional[Tuple[List[float], List[Document]]]]:
+        """Cache key for the query and the cached result, if any."""
+        if self.cache is None:
+            return None, None
+        key = self.cache.key(query, self.index_version)
+        cached = self.cache.get(key)
+        if cached is None:
+            return key, None
+        documents = [self.vector_store.docstore.search(chunk_id) for chunk_id in cached.chunk_ids]
+        if not all(isinstance(document, Document) for document in documents):
+            return key, None
+        return key, (cached.query_vector.tolist(), documents)
+
+    def _store(self, key: Optional[str], query_vector: List[float], ranked: List[Tuple[Document, float]]):
+        # Chunks without ids (stores saved by old versions) cannot be looked up again
+        if key is None or not all(document.id for document, _ in ranked):
+            return
+        self.cache.put(key, CachedRetrieval(
+            chunk_ids=tuple(document.id for document, _ in ranked),
+            scores=tuple(float(score) for _, score in ranked),
+            query_vector=np.asarray(query_vector, dtype=np.float32)
+        ))
+
+    def search(self, query: str) -> Tuple[List[float], List[Document]]:
+        """Returns the query embedding with the ranked results, from the cache when possible."""
+        key, cached = self._cached(query)
+        if cached is not None:
+            return cached
+        query_vector = self.vector_store.embeddings.embed_query(query)
+        ranked = self._rank(query, self.vector_store.similarity_search_with_score_by_vector(query_vector, k=self.fetch_k))
+        self._store(key, query_vector, ranked)
+        return query_vector, [document for document, _ in ranked]
+
+    async def asearch(self, query: str) -> Tuple[List[float], List[Document]]:
+        """
+        Embeds the query once and returns the embedding with the ranked results,
+        so later stages (reranking) can reuse it. Served from the cache when possible.
+        """
+        key, cached = self._cached(query)
+        if cached is not None:
+            return cached
+        query_vector = await self.vector_store.embeddings.aembed_query(query)
+        dense = await self.vector_store.asimilarity_search_with_score_by_vector(query_vector, k=self.fetch_k)
+        # BM25 scoring is a few numpy slices and runs inline
+        ranked = self._rank(query, dense)
+        self._store(key, query_vector, ranked)
+        return query_vector, [document for document, _ in ranked]
+
+    async def asearch_batch(self, queries: List[str]) -> List[Tuple[List[float], List[Document]]]:
+        """
+        asearch for many queries: the ones not in the cache are embedded together (aembed_documents,
+        so they skip the query batcher) and searched with one matrix search, then ranked one by one.
+        """
+        results: List[Optional[Tuple[List[float], List[Document]]]] = [None] * len(queries)
+        keys: List[Optional[str]] = []
+        misses = []
+        for i, query in enumerate(queries):
+            key, cached = self._cached(query)
+            keys.append(key)
+            if cached is None:
+                misses.append(i)
+            else:
+                results[i] = cached
+        if misses:
+            embeddings = self.vector_store.embeddings
+            # Query vectors stay out of the embedding cache when the model offers a query path
+            aembed = getattr(embeddings, "aembed_queries", embeddings.aembed_documents)
+            query_vectors = await aembed([queries[i] for i in misses])
+            dense = await asyncio.to_thread(
+                search_batch, self.vector_store, np.array(query_vectors, dtype=np.float32), self.fetch_k
+            )
+            for i, query_vector, query_dense in zip(misses, query_vectors, dense):
+                ranked = self._rank(queries[i], query_dense)
+                self._store(keys[i], query_vector, ranked)
+                results[i] = (query_vector, [document for document, _ in ranked])
+        return results
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        _, documents = self.search(query)
+        return documents
+
+    async def _aget_relevant_documents(self, query: str, *,
+                                       run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        _, documents = await self.asearch(query)
+        return documents
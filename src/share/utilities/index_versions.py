@@ -0,0 +1,140 @@
+# utilities/index_versions.py
+
+import os
+import re
+import fcntl
+import shutil
+import logging
+
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+from utilities.bm25_index import BM25Index
+from utilities.chunk_store import ChunkStore
+from utilities.faiss_index_factory import FaissIndexSettings
+from utilities.faiss_loader import LEGACY_DOCSTORE_FILE
+from utilities.ingestion_manifest import IngestionManifest
+from utilities.vector_compression import FullVectors
+from utilities.vector_shards import ShardLayout
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Everything that makes up a persisted vector store (the embedding cache is shared across versions)
+STORE_FILES = frozenset((
+    "index.faiss", LEGACY_DOCSTORE_FILE, BM25Index.FILE_NAME, IngestionManifest.FILE_NAME,
+    FaissIndexSettings.CONFIG_FILE_NAME, ShardLayout.FILE_NAME, FullVectors.FILE_NAME, *ChunkStore.FILE_NAMES
+))
+SHARD_FOLDER = re.compile(r"shard-\d+")
+
+def link_or_copy(source: str, target: str):
+    """Hard-links a file, copying it when the filesystem cannot link. Stores are only ever written
+    through a temporary file and os.replace, so a linked file is never changed under another version."""
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+class IndexVersions:
+    """
+    Blue/green versions of a persisted vector store. <root>/versions/<version>/ holds a complete store
+    and <root>/CURRENT names the live one. A new version is prepared in a staging folder next to the
+    live one (starting from hard links of the live files, so incremental updates stay cheap), validated,
+    then published by renaming it into place and atomically replacing CURRENT. Workers watching CURRENT
+    swap to it; requests in flight finish on the version they started with.
+    Stores persisted before versioning live directly in <root> until the first version is published.
+    """
+    POINTER_FILE = "CURRENT"
+    VERSIONS_FOLDER = "versions"
+    STAGING_PREFIX = ".staging-"
+    LOCK_FILE = ".rebuild.lock"
+
+    def __init__(self, root: str, keep: int = 3):
+        self.root = root
+        self.keep = max(1, keep)
+        self.versions_directory = os.path.join(root, self.VERSIONS_FOLDER)
+
+    def current(self) -> Optional[str]:
+        """The published version, or None for an unversioned store."""
+        try:
+            with open(os.path.join(self.root, self.POINTER_FILE), "r", encoding="utf-8") as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return version or None
+
+    def directory(self, version: Optional[str] = None) -> str:
+        """Folder of the given (default: current) version; the root for an unversioned store."""
+        version = version or self.current()
+        return os.path.join(self.versions_directory, version) if version else self.root
+
+    def versions(self) -> List[str]:
+        """Published versions, oldest first."""
+        if not os.path.isdir(self.versions_directory):
+            return []
+        return sorted(
+            name for name in os.listdir(self.versions_directory)
+            if not name.startswith(".") and os.path.isdir(os.path.join(self.versions_directory, name))
+        )
+
+    @contextmanager
+    def lock(self) -> Iterator[None]:
+        """Serializes builds across the worker processes sharing the root."""
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, self.LOCK_FILE), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def prepare(self) -> Tuple[str, str]:
+        """Creates the staging folder of the next version from the live store. Returns (version, folder)."""
+        # Names sort by creation time, which is how prune() finds the oldest versions
+        version = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        staging = os.path.join(self.versions_directory, f"{self.STAGING_PREFIX}{version}")
+        os.makedirs(staging)
+        source = self.directory()
+        if os.path.isdir(source):
+            for name in os.listdir(source):
+                path = os.path.join(source, name)
+                if name in STORE_FILES and os.path.isfile(path):
+                    link_or_copy(path, os.path.join(staging, name))
+                elif SHARD_FOLDER.fullmatch(name) and os.path.isdir(path):
+                    shutil.copytree(path, os.path.join(staging, name), copy_function=link_or_copy)
+        return version, staging
+
+    def publish(self, version: str) -> str:
+        """Moves the staged version into place and makes it current. Returns its folder."""
+        staging = os.path.join(self.versions_directory, f"{self.STAGING_PREFIX}{version}")
+        folder = os.path.join(self.versions_directory, version)
+        os.rename(staging, folder)
+        pointer = os.path.join(self.root, self.POINTER_FILE)
+        with open(f"{pointer}.tmp", "w", encoding="utf-8") as f:
+            f.write(version)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{pointer}.tmp", pointer)
+        logger.info(f"Published vector store version {version}.")
+        self.prune()
+        return folder
+
+    def discard(self, version: str):
+        shutil.rmtree(os.path.join(self.versions_directory, f"{self.STAGING_PREFIX}{version}"), ignore_errors=True)
+
+    def prune(self):
+        """
+        Keeps the newest `keep` versions (and always the current one) plus no abandoned staging folders.
+        Workers still serving an older version keep its files open, so removing them is safe on Linux.
+        Call with the lock held.
+        """
+        current = self.current()
+        versions = self.versions()
+        for version in versions[:max(0, len(versions) - self.keep)]:
+            if version != current:
+                shutil.rmtree(os.path.join(self.versions_directory, version), ignore_errors=True)
+                logger.info(f"Removed old vector store version {version}.")
+        for name in os.listdir(self.versions_directory):
+            if name.startswith(self.STAGING_PREFIX):
+                shutil.rmtree(os.path.join(self.versions_directory, name), ignore_errors=True)
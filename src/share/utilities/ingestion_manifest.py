@@ -0,0 +1,105 @@
+# utilities/ingestion_manifest.py
+
+import os
+import json
+import hashlib
+import logging
+
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+class IngestionManifest:
+    """
+    Records which source PDFs are in the vector store, their content hash and the ids
+    of the chunks they produced, so ingestion only has to touch files that changed.
+    """
+    FILE_NAME = "ingestion_manifest.json"
+    VERSION = 1
+
+    def __init__(self, persist_directory: str, files: Dict[str, dict] = None):
+        self.path = os.path.join(persist_directory, self.FILE_NAME)
+        self.files = files or {}
+
+    @classmethod
+    def load(cls, persist_directory: str) -> "IngestionManifest":
+        """Loads the manifest next to the index, or returns an empty one if missing or unreadable."""
+        manifest = cls(persist_directory)
+        if not os.path.exists(manifest.path):
+            return manifest
+        try:
+            with open(manifest.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == cls.VERSION:
+                manifest.files = data.get("files", {})
+            else:
+                logger.warning(f"Ignoring ingestion manifest with unsupported version: {data.get('version')}")
+        except Exception as e:
+            logger.error(f"Error reading ingestion manifest {manifest.path}: {e}")
+        return manifest
+
+    @property
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def save(self):
+        """Writes the manifest atomically."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": self.VERSION, "files": self.files}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def hash_file(path: str, block_size: int = 1 << 20) -> str:
+        """Returns the SHA-256 of a file's content."""
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def file_info(self, directory: str, file_name: str) -> dict:
+        """
+        Describes a source file. The content hash is reused when size and mtime are
+        unchanged, so unchanged files are not re-read on every start.
+        """
+        stat = os.stat(os.path.join(directory, file_name))
+        previous = self.files.get(file_name)
+        if previous and previous.get("size") == stat.st_size and previous.get("mtime") == stat.st_mtime:
+            sha256 = previous["sha256"]
+        else:
+            sha256 = self.hash_file(os.path.join(directory, file_name))
+        return {"sha256": sha256, "size": stat.st_size, "mtime": stat.st_mtime}
+
+    def diff(self, directory: str, file_names: List[str]) -> Tuple[Dict[str, dict], List[str]]:
+        """
+        Compares the files on disk with the manifest.
+        Returns ({file_name: file_info} for new or changed files, [removed file names]).
+        """
+        changed = {}
+        for file_name in sorted(file_names):
+            info = self.file_info(directory, file_name)
+            previous = self.files.get(file_name)
+            if previous is None or previous.get("sha256") != info["sha256"]:
+                changed[file_name] = info
+            else:
+                # Same content, refresh size/mtime so the next diff can skip hashing it
+                previous.update(size=info["size"], mtime=info["mtime"])
+        removed = sorted(set(self.files) - set(file_names))
+        return changed, removed
+
+    def record(self, file_name: str, info: dict, chunk_ids: List[str]):
+        self.files[file_name] = {**info, "chunk_ids": list(chunk_ids)}
+
+    def forget(self, file_name: str) -> List[str]:
+        """Drops a file from the manifest and returns the chunk ids it owned."""
+        entry = self.files.pop(file_name, None)
+        return entry.get("chunk_ids", []) if entry else []
+
+    @staticmethod
+    def chunk_ids(file_name: str, info: dict, count: int) -> List[str]:
+        """Deterministic chunk ids derived from the file name and content hash."""
+        prefix = hashlib.sha256(f"{file_name}:{info['sha256']}".encode("utf-8")).hexdigest()[:16]
+        return [f"{prefix}-{i}" for i in range(count)]
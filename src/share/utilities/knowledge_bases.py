@@ -0,0 +1,140 @@
+# utilities/knowledge_bases.py
+
+import os
+import re
+import time
+import asyncio
+import logging
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from utilities.faiss_loader import log_memory_usage
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Collection names become directory names, so only plain ones are accepted
+COLLECTION_NAME = re.compile(r"[A-Za-z0-9][A-Za-z0-9_-]{0,63}")
+
+def directory_size_mb(path: str) -> float:
+    """Size of the files under `path`: the estimate of what a loaded collection keeps in memory."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for file_name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, file_name))
+            except OSError:
+                pass
+    return total / (1024 * 1024)
+
+@dataclass
+class LoadedCollection:
+    chatbot: Any
+    memory_mb: float
+    loaded_at: float
+
+class KnowledgeBases:
+    """
+    Named document collections served next to the default corpus. The PDFs of collection `name` are in
+    <pdf_root>/<name> and its index versions in <persist_root>/<name>. A collection's vector store and QA chains
+    are loaded (or built) on first use by `factory(name)`; when the loaded collections exceed the memory
+    budget or `max_loaded`, the least recently used ones are dropped. In-flight requests keep the
+    chatbot they already hold, so eviction only releases memory once they finish. `on_unload` is called with
+    every evicted or dropped chatbot, e.g. to release its connections.
+    The budget is estimated from the persisted index files, an upper bound with memory-mapped loading.
+    """
+    def __init__(self, factory: Callable[[str], Any], pdf_root: str, persist_root: str,
+                 memory_budget_mb: float = 1024, max_loaded: int = 8,
+                 on_unload: Optional[Callable[[Any], None]] = None):
+        self.factory = factory
+        self.on_unload = on_unload
+        self.pdf_root = pdf_root
+        self.persist_root = persist_root
+        self.memory_budget_mb = memory_budget_mb
+        self.max_loaded = max(1, max_loaded)
+        self.loaded: "OrderedDict[str, LoadedCollection]" = OrderedDict()
+        self.loading: Dict[str, asyncio.Task] = {}
+        self.loads = 0
+        self.evictions = 0
+
+    def names(self) -> List[str]:
+        """Collections that have a PDF directory."""
+        if not os.path.isdir(self.pdf_root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.pdf_root)
+            if COLLECTION_NAME.fullmatch(name) and os.path.isdir(os.path.join(self.pdf_root, name))
+        )
+
+    def validate(self, name: str):
+        if not COLLECTION_NAME.fullmatch(name or ""):
+            raise ValueError(f"Invalid collection name: {name!r}.")
+        if not os.path.isdir(os.path.join(self.pdf_root, name)):
+            raise ValueError(f"Unknown collection: {name}.")
+
+    @property
+    def memory_mb(self) -> float:
+        return sum(entry.memory_mb for entry in self.loaded.values())
+
+    async def get(self, name: str):
+        """The collection's chatbot, loading it on first use. Concurrent first requests share one load."""
+        entry = self.loaded.get(name)
+        if entry is not None:
+            self.loaded.move_to_end(name)
+            return entry.chatbot
+
+        self.validate(name)
+        task = self.loading.get(name)
+        if task is None:
+            task = asyncio.ensure_future(self._load(name))
+            self.loading[name] = task
+            task.add_done_callback(lambda _: self.loading.pop(name, None))
+        # A cancelled request must not cancel the load other requests wait for
+        return await asyncio.shield(task)
+
+    async def _load(self, name: str):
+        start_time = time.time()
+        chatbot = self.factory(name)
+        await asyncio.to_thread(chatbot.initialize)
+        # Only the loaded version counts, not the older ones kept next to it
+        memory_mb = directory_size_mb(chatbot.store_directory)
+        self.loaded[name] = LoadedCollection(chatbot, memory_mb, time.time())
+        self.loads += 1
+        logger.info(f"Collections | loaded '{name}' (~{memory_mb:.1f} MB) in {time.time() - start_time:.2f} seconds")
+        self.evict()
+        return chatbot
+
+    def evict(self):
+        """Drops least recently used collections until the rest fit the budget; the newest always stays."""
+        while len(self.loaded) > 1 and (
+            len(self.loaded) > self.max_loaded or (self.memory_budget_mb > 0 and self.memory_mb > self.memory_budget_mb)
+        ):
+            name, entry = self.loaded.popitem(last=False)
+            self.evictions += 1
+            if self.on_unload is not None:
+                self.on_unload(entry.chatbot)
+            logger.info(f"Collections | evicted '{name}' (~{entry.memory_mb:.1f} MB)")
+        if self.memory_budget_mb > 0 and self.memory_mb > self.memory_budget_mb:
+            logger.warning(
+                f"Collections | '{next(reversed(self.loaded))}' alone exceeds the memory budget "
+                f"({self.memory_mb:.1f} > {self.memory_budget_mb} MB)."
+            )
+        log_memory_usage("after loading collections")
+
+    def drop(self, name: str) -> bool:
+        """Unloads a collection, e.g. so its next use reloads a rebuilt index."""
+        entry = self.loaded.pop(name, None)
+        if entry is not None and self.on_unload is not None:
+            self.on_unload(entry.chatbot)
+        return entry is not None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "loaded": {name: round(entry.memory_mb, 1) for name, entry in self.loaded.items()},
+            "memory_mb": round(self.memory_mb, 1),
+            "memory_budget_mb": self.memory_budget_mb,
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
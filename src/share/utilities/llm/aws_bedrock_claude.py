@@ -1,10 +1,19 @@
 # utilities/llm/aws_bedrock_claude.py
 import logging
 import json
+import base64
 import boto3
-from typing import Any, List
+import aiohttp
+from typing import Any, AsyncIterator, Iterator, List, Optional
+from urllib.parse import quote
+from yarl import URL
 from langchain.llms.base import LLM
 from langchain.schema import Generation, LLMResult
+from langchain_core.outputs import GenerationChunk
+from botocore.auth import SigV4Auth
+from botocore.awsrequest import AWSRequest
+from botocore.credentials import Credentials
+from botocore.eventstream import EventStreamBuffer
 from botocore.exceptions import BotoCoreError, ClientError
 from pydantic import PrivateAttr
 
@@ -13,6 +22,11 @@ from settings.configs import MAX_TOKENS
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# botocore's connect_timeout and read_timeout defaults. No total timeout, so long streams are not cut off;
+# a stalled connection fails after READ_TIMEOUT_SECONDS without a byte instead of aiohttp's 5 minutes.
+CONNECT_TIMEOUT_SECONDS = 60
+READ_TIMEOUT_SECONDS = 60
+
 class AWSBedrockClaude(LLM):
     """
     Custom LangChain LLM wrapper for Anthropic's Claude via AWS Bedrock.
@@ -21,11 +35,17 @@ class AWSBedrockClaude(LLM):
     _client: Any = PrivateAttr()
     _model_id: str = PrivateAttr()
     _max_tokens: int = PrivateAttr()
+    _region_name: str = PrivateAttr()
+    _credentials: Any = PrivateAttr()
+    _session: Optional[aiohttp.ClientSession] = PrivateAttr(default=None)
 
     def __init__(self, aws_access_key_id: str, aws_secret_access_key: str, region_name: str, model_id: str):
         super().__init__()
         self._model_id = model_id
         self._max_tokens = MAX_TOKENS
+        self._region_name = region_name
+        # Async calls sign requests themselves (SigV4) instead of going through the blocking boto3 client
+        self._credentials = Credentials(aws_access_key_id, aws_secret_access_key)
         self._client = self.get_bedrock_client(aws_access_key_id, aws_secret_access_key, region_name)
         if not self._client:
             raise ValueError("Failed to initialize AWS Bedrock client")
@@ -47,20 +67,73 @@ class AWSBedrockClaude(LLM):
     def _llm_type(self) -> str:
         return "aws_bedrock_claude"
 
+    def _build_body(self, prompt: str, **kwargs: Any) -> bytes:
+        """Prepare the request body as a JSON-encoded string."""
+        return json.dumps({
+            "max_tokens": self._max_tokens,
+            "temperature": kwargs.get("temperature", 0.3),
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            "anthropic_version": "bedrock-2023-05-31"
+        }).encode("utf-8")
+
+    @staticmethod
+    def _parse_response(response_json: dict) -> str:
+        """Extract the generated text from the 'content' field."""
+        return ''.join(item.get('text', '') for item in response_json.get('content', []))
+
+    @staticmethod
+    def _parse_stream_chunk(chunk_json: dict) -> str:
+        """Extract the text delta from a streamed Messages API event."""
+        if chunk_json.get("type") == "content_block_delta":
+            return chunk_json.get("delta", {}).get("text", "")
+        return ""
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Return the shared aiohttp session, creating it on the running event loop if needed."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(
+                total=None, sock_connect=CONNECT_TIMEOUT_SECONDS, sock_read=READ_TIMEOUT_SECONDS
+            ))
+        return self._session
+
+    async def aclose(self):
+        """Close the async HTTP session."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def _post_signed(self, action: str, body: bytes, accept: str = 'application/json') -> aiohttp.ClientResponse:
+        """
+        Sends a SigV4-signed POST to the Bedrock runtime REST API without blocking the event loop.
+        The caller owns the returned response and must release it.
+        """
+        url = (
+            f"https://bedrock-runtime.{self._region_name}.amazonaws.com"
+            f"/model/{quote(self._model_id, safe='')}/{action}"
+        )
+        request = AWSRequest(
+            method="POST",
+            url=url,
+            data=body,
+            headers={"Content-Type": "application/json", "Accept": accept}
+        )
+        SigV4Auth(self._credentials, "bedrock", self._region_name).add_auth(request)
+
+        # encoded=True keeps the already-quoted model id exactly as it was signed
+        response = await self._get_session().post(URL(url, encoded=True), data=body, headers=dict(request.headers))
+        if response.status != 200:
+            detail = await response.text()
+            response.release()
+            raise ValueError(f"Bedrock returned HTTP {response.status}: {detail}")
+        return response
+
     def _call(self, prompt: str, stop: List[str] = None, **kwargs: Any) -> str:
         try:
-            # Prepare the request body as a JSON-encoded string
-            body = json.dumps({
-                "max_tokens": self._max_tokens,
-                "temperature": kwargs.get("temperature", 0.3),
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                "anthropic_version": "bedrock-2023-05-31"
-            }).encode("utf-8")
+            body = self._build_body(prompt, **kwargs)
 
             response = self._client.invoke_model(
                 modelId=self._model_id,
@@ -71,16 +144,81 @@ class AWSBedrockClaude(LLM):
 
             response_body = response['body'].read().decode('utf-8')
             response_json = json.loads(response_body)
-            # Extract the generated text from the 'content' field
-            generated_text = ''.join(item.get('text', '') for item in response_json.get('content', []))
-            return generated_text
+            return self._parse_response(response_json)
         except Exception as e:
             raise ValueError(f"Error calling AWS Bedrock Claude: {e}")
 
+    async def _acall(self, prompt: str, stop: List[str] = None, **kwargs: Any) -> str:
+        try:
+            body = self._build_body(prompt, **kwargs)
+            response = await self._post_signed("invoke", body)
+            try:
+                response_json = await response.json(content_type=None)
+            finally:
+                response.release()
+            return self._parse_response(response_json)
+        except Exception as e:
+            raise ValueError(f"Async error calling AWS Bedrock Claude: {e}")
+
+    def _stream(self, prompt: str, stop: List[str] = None, run_manager: Any = None, **kwargs: Any) -> Iterator[GenerationChunk]:
+        try:
+            response = self._client.invoke_model_with_response_stream(
+                modelId=self._model_id,
+                contentType='application/json',
+                accept='application/json',
+                body=self._build_body(prompt, **kwargs)
+            )
+            for event in response['body']:
+                chunk = event.get('chunk')
+                if not chunk:
+                    continue
+                text = self._parse_stream_chunk(json.loads(chunk['bytes']))
+                if text:
+                    if run_manager:
+                        run_manager.on_llm_new_token(text)
+                    yield GenerationChunk(text=text)
+        except Exception as e:
+            raise ValueError(f"Error streaming AWS Bedrock Claude: {e}")
+
+    async def _astream(self, prompt: str, stop: List[str] = None, run_manager: Any = None, **kwargs: Any) -> AsyncIterator[GenerationChunk]:
+        try:
+            body = self._build_body(prompt, **kwargs)
+            response = await self._post_signed(
+                "invoke-with-response-stream", body, accept='application/vnd.amazon.eventstream'
+            )
+            # The REST stream uses AWS event-stream framing; each event carries a base64 JSON chunk
+            event_buffer = EventStreamBuffer()
+            try:
+                async for data in response.content.iter_any():
+                    event_buffer.add_data(data)
+                    for message in event_buffer:
+                        payload = json.loads(message.payload or b"{}")
+                        if message.headers.get(":message-type") == "exception":
+                            raise ValueError(payload.get("message", message.payload))
+                        if "bytes" not in payload:
+                            continue
+                        text = self._parse_stream_chunk(json.loads(base64.b64decode(payload["bytes"])))
+                        if text:
+                            if run_manager:
+                                await run_manager.on_llm_new_token(text)
+                            yield GenerationChunk(text=text)
+            finally:
+                response.release()
+        except Exception as e:
+            raise ValueError(f"Async error streaming AWS Bedrock Claude: {e}")
+
     def _generate(self, prompts: List[str], stop: List[str] = None, **kwargs: Any) -> LLMResult:
         generations = []
         for prompt in prompts:
             text = self._call(prompt, stop=stop, **kwargs)
             gen = Generation(text=text)
             generations.append([gen])  # Each prompt can have multiple generations
+        return LLMResult(generations=generations)
+
+    async def _agenerate(self, prompts: List[str], stop: List[str] = None, **kwargs: Any) -> LLMResult:
+        generations = []
+        for prompt in prompts:
+            text = await self._acall(prompt, stop=stop, **kwargs)
+            gen = Generation(text=text)
+            generations.append([gen])
         return LLMResult(generations=generations)
\ No newline at end of file
@@ -1,8 +1,9 @@
 # utilities/llm/openai_llm.py
 import logging
-from typing import Any, List
+from typing import Any, AsyncIterator, Iterator, List
 from langchain.llms.base import LLM
 from langchain.schema import Generation, LLMResult
+from langchain_core.outputs import GenerationChunk
 from pydantic import PrivateAttr
 from langchain_openai import ChatOpenAI
 
@@ -42,18 +43,44 @@ class OpenAIChatLLM(LLM):
             logger.error(f"Error calling OpenAI ChatOpenAI: {e}")
             raise ValueError(f"Error calling OpenAI ChatOpenAI: {e}")
 
+    async def _acall(self, prompt: str, stop: List[str] = None, **kwargs: Any) -> str:
+        try:
+            response = await self._client.ainvoke(prompt, stop=stop, **kwargs)
+            return response.content if hasattr(response, 'content') else str(response)
+        except Exception as e:
+            logger.error(f"Async error calling OpenAI ChatOpenAI: {e}")
+            raise ValueError(f"Async error calling OpenAI ChatOpenAI: {e}")
+
     async def _agenerate(self, prompts: List[str], stop: List[str] = None, **kwargs: Any) -> LLMResult:
         generations = []
         for prompt in prompts:
-            try:
-                text = await self._client.ainvoke(prompt, stop=stop, **kwargs)
-                gen = Generation(text=text.content if hasattr(text, 'content') else str(text))
-                generations.append([gen])
-            except Exception as e:
-                logger.error(f"Async error calling OpenAI ChatOpenAI: {e}")
-                raise ValueError(f"Async error calling OpenAI ChatOpenAI: {e}")
+            text = await self._acall(prompt, stop=stop, **kwargs)
+            gen = Generation(text=text)
+            generations.append([gen])
         return LLMResult(generations=generations)
 
+    def _stream(self, prompt: str, stop: List[str] = None, run_manager: Any = None, **kwargs: Any) -> Iterator[GenerationChunk]:
+        try:
+            for chunk in self._client.stream(prompt, stop=stop, **kwargs):
+                if chunk.content:
+                    if run_manager:
+                        run_manager.on_llm_new_token(chunk.content)
+                    yield GenerationChunk(text=chunk.content)
+        except Exception as e:
+            logger.error(f"Error streaming OpenAI ChatOpenAI: {e}")
+            raise ValueError(f"Error streaming OpenAI ChatOpenAI: {e}")
+
+    async def _astream(self, prompt: str, stop: List[str] = None, run_manager: Any = None, **kwargs: Any) -> AsyncIterator[GenerationChunk]:
+        try:
+            async for chunk in self._client.astream(prompt, stop=stop, **kwargs):
+                if chunk.content:
+                    if run_manager:
+                        await run_manager.on_llm_new_token(chunk.content)
+                    yield GenerationChunk(text=chunk.content)
+        except Exception as e:
+            logger.error(f"Async error streaming OpenAI ChatOpenAI: {e}")
+            raise ValueError(f"Async error streaming OpenAI ChatOpenAI: {e}")
+
     def _generate(self, prompts: List[str], stop: List[str] = None, **kwargs: Any) -> LLMResult:
         generations = []
         for prompt in prompts:
@@ -0,0 +1,135 @@
+# utilities/pdf_ingestion.py
+
+import os
+import time
+import logging
+import multiprocessing
+
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from pypdf import PdfReader
+from langchain_core.documents import Document
+from langchain.text_splitter import CharacterTextSplitter
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Worker functions live at module level (and this module avoids importing settings)
+# so they can be pickled into a spawned process pool.
+
+def count_pdf_pages(pdf_path: str) -> int:
+    """Returns the number of pages in a PDF."""
+    return len(PdfReader(pdf_path).pages)
+
+def load_pdf_pages(pdf_path: str, start_page: int = 0, end_page: Optional[int] = None) -> List[Document]:
+    """
+    Extracts pages [start_page, end_page) of a PDF as one Document per page,
+    with `source`, `page`, `page_label` and `total_pages` metadata as PyPDFLoader sets them.
+    """
+    reader = PdfReader(pdf_path)
+    total_pages = len(reader.pages)
+    end_page = total_pages if end_page is None else min(end_page, total_pages)
+    documents = []
+    for page_number in range(start_page, end_page):
+        text = reader.pages[page_number].extract_text()
+        documents.append(Document(
+            page_content=text.strip(),
+            metadata={
+                "source": pdf_path,
+                "total_pages": total_pages,
+                "page": page_number,
+                "page_label": reader.page_labels[page_number],
+            }
+        ))
+    return documents
+
+def split_pdf_pages(pdf_path: str, start_page: int, end_page: Optional[int],
+                    chunk_size: int, chunk_overlap: int) -> Tuple[int, List[Document]]:
+    """
+    Loads a page range of a PDF and splits it into chunks.
+    Splitting is per page, so chunking a file range by range gives the same chunks as chunking it whole.
+    Returns (pages loaded, chunks).
+    """
+    documents = load_pdf_pages(pdf_path, start_page, end_page)
+    text_splitter = CharacterTextSplitter(
+        separator="\n",
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len
+    )
+    return len(documents), text_splitter.split_documents(documents)
+
+@dataclass
+class IngestionStats:
+    files: int = 0
+    pages: int = 0
+    chunks: int = 0
+    seconds: float = 0.0
+
+    @property
+    def pages_per_sec(self) -> float:
+        return self.pages / self.seconds if self.seconds else 0.0
+
+    @property
+    def chunks_per_sec(self) -> float:
+        return self.chunks / self.seconds if self.seconds else 0.0
+
+class PDFIngestionPool:
+    """
+    Parses and chunks PDFs across a process pool. Large files are cut into page ranges
+    so one big PDF can use every worker. Results are reassembled in file and page order,
+    so chunk order and metadata do not depend on which worker finished first.
+    """
+    def __init__(self, max_workers: int = None, pages_per_task: int = 50,
+                 chunk_size: int = 1000, chunk_overlap: int = 200):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.pages_per_task = max(1, pages_per_task)
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.last_stats = IngestionStats()
+
+    def plan_tasks(self, pdf_paths: List[str]) -> List[Tuple[str, int, int]]:
+        """Cuts every file into (pdf_path, start_page, end_page) ranges of at most pages_per_task pages."""
+        tasks = []
+        for pdf_path in pdf_paths:
+            total_pages = count_pdf_pages(pdf_path)
+            for start_page in range(0, total_pages, self.pages_per_task):
+                tasks.append((pdf_path, start_page, min(start_page + self.pages_per_task, total_pages)))
+        return tasks
+
+    def split_pdfs(self, pdf_paths: List[str]) -> Dict[str, List[Document]]:
+        """Returns the chunks of each PDF, keyed by path in the given order."""
+        start_time = time.time()
+        tasks = self.plan_tasks(pdf_paths)
+        args = [(path, start, end, self.chunk_size, self.chunk_overlap) for path, start, end in tasks]
+
+        if self.max_workers <= 1 or len(tasks) <= 1:
+            results = [split_pdf_pages(*task_args) for task_args in args]
+        else:
+            # spawn: forking a process that already runs event-loop and client threads is not safe
+            with ProcessPoolExecutor(max_workers=min(self.max_workers, len(tasks)),
+                                     mp_context=multiprocessing.get_context("spawn")) as executor:
+                # map() yields in submission order, which keeps chunk order deterministic
+                results = list(executor.map(split_pdf_pages, *zip(*args)))
+
+        chunks_by_path = {pdf_path: [] for pdf_path in pdf_paths}
+        pages = 0
+        for (pdf_path, _, _), (page_count, chunks) in zip(tasks, results):
+            chunks_by_path[pdf_path].extend(chunks)
+            pages += page_count
+
+        self.last_stats = IngestionStats(
+            files=len(pdf_paths),
+            pages=pages,
+            chunks=sum(len(chunks) for chunks in chunks_by_path.values()),
+            seconds=time.time() - start_time
+        )
+        logger.info(
+            f"PDF Ingestion | {self.last_stats.files} files, {self.last_stats.pages} pages, "
+            f"{self.last_stats.chunks} chunks in {self.last_stats.seconds:.2f}s | "
+            f"{self.last_stats.pages_per_sec:.1f} pages/sec, {self.last_stats.chunks_per_sec:.1f} chunks/sec "
+            f"| workers: {self.max_workers}, pages per task: {self.pages_per_task}"
+        )
+        return chunks_by_path
@@ -0,0 +1,89 @@
+# utilities/query_condenser.py
+
+import logging
+
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# question: the latest question alone
+# recent:   the latest question after the user's previous questions (bounded by history_turns and max_chars)
+# llm:      the latest question rewritten by the LLM into a standalone question, falling back to recent
+QUERY_MODES = ("question", "recent", "llm")
+
+CONDENSE_PROMPT = """Given the conversation below and a follow-up question, rewrite the follow-up question \
+as a standalone question in its original language. Keep names, numbers and terms from the conversation that \
+the question refers to. Reply with the standalone question only.
+
+Conversation:
+{history}
+
+Follow-up question: {question}
+Standalone question:"""
+
+class QueryCondenser:
+    """
+    Builds the standalone query that retrieval embeds and the answer cache is keyed on from the latest turn
+    of a conversation. The generation prompt still gets the full history; only this query is condensed,
+    so embedding inputs stay short and the same question hits the caches whatever was said before it.
+    A first question is always used as is.
+    """
+    def __init__(self, mode: str = "recent", history_turns: int = 1, max_chars: int = 1000, llm: Any = None):
+        if mode not in QUERY_MODES:
+            logger.warning(f"Unknown retrieval query mode '{mode}'; using the latest question only.")
+            mode = "question"
+        self.mode = mode
+        self.history_turns = max(0, history_turns)
+        self.max_chars = max_chars
+        self.llm = llm
+
+    @staticmethod
+    def messages(conversation_history: List[Dict], sender: Optional[str] = None) -> List[Dict]:
+        """The non-empty messages of the history (oldest first), optionally of one sender."""
+        return [
+            message for message in conversation_history
+            if message.get("message") and message.get("sender")
+            and (sender is None or message["sender"].lower() == sender)
+        ]
+
+    def recent_query(self, conversation_history: List[Dict], question: str) -> str:
+        """The latest question after as many of the user's previous `history_turns` questions as fit max_chars."""
+        parts = [question]
+        length = len(question)
+        previous = self.messages(conversation_history, "user")[-self.history_turns:] if self.history_turns else []
+        for message in reversed(previous):
+            text = message["message"].strip()
+            if length + len(text) + 1 > self.max_chars:
+                break
+            parts.insert(0, text)
+            length += len(text) + 1
+        return "\n".join(parts)
+
+    def condense_prompt(self, conversation_history: List[Dict], question: str) -> str:
+        """The rewrite prompt with the last `history_turns` exchanges, newest kept when trimmed to max_chars."""
+        lines = []
+        length = 0
+        for message in reversed(self.messages(conversation_history)[-2 * max(1, self.history_turns):]):
+            sender = "User" if message["sender"].lower() == "user" else "Bot"
+            line = f"{sender}: {message['message'].strip()}"
+            if lines and length + len(line) > self.max_chars:
+                break
+            lines.insert(0, line[:self.max_chars])
+            length += len(line)
+        return CONDENSE_PROMPT.format(history="\n".join(lines), question=question)
+
+    async def condense(self, conversation_history: List[Dict], question: str) -> str:
+        question = question.strip()
+        if self.mode == "question" or not self.messages(conversation_history):
+            return question
+        if self.mode == "llm" and self.llm is not None:
+            try:
+                standalone = await self.llm.ainvoke(self.condense_prompt(conversation_history, question))
+                standalone = standalone.strip() if isinstance(standalone, str) else ""
+                if standalone:
+                    return standalone
+                logger.warning("The LLM returned no standalone question; using the recent questions instead.")
+            except Exception as e:
+                logger.error(f"Error condensing the retrieval query: {e}")
+        return self.recent_query(conversation_history, question)
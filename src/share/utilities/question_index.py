@@ -0,0 +1,152 @@
+# utilities/question_index.py
+
+import math
+import logging
+import numpy as np
+
+from collections import Counter
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from utilities.bm25_index import tokenize
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+def features(text: str) -> Dict[str, float]:
+    """L2-normalized term counts of a question; the dot product of two of them is their cosine similarity."""
+    counts = Counter(tokenize(text))
+    norm = math.sqrt(sum(count * count for count in counts.values()))
+    return {term: count / norm for term, count in counts.items()} if norm else {}
+
+def codes(text: str) -> FrozenSet[str]:
+    """
+    Tokens of a question holding a digit: model codes, prices, quantities, dates. Questions that differ
+    only in these still score as near-duplicates, so a cached answer is only reused when they agree.
+    """
+    return frozenset(token for token in tokenize(text) if any(char.isdigit() for char in token))
+
+class QuestionIndex:
+    """
+    In-memory cosine similarity index over the questions of the answer cache, updated on insert.
+    Weights are plain normalized term counts (no IDF), so adding a question never changes the vectors
+    of the others and nothing is ever refitted. Postings live in CSR form like BM25Index; new questions
+    go to a small per-term buffer that is spliced into the arrays (one np.insert, no re-sort) once it
+    holds `merge_every` postings. A lookup only touches the postings of its own terms.
+    """
+
+    def __init__(self, merge_every: int = 4096):
+        self.merge_every = merge_every
+        self.questions: List[Optional[str]] = []
+        self.rows_by_key: Dict[str, int] = {}
+        self.vocabulary: Dict[str, int] = {}
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.rows = np.zeros(0, dtype=np.int32)
+        self.weights = np.zeros(0, dtype=np.float32)
+        self.pending: Dict[int, Tuple[List[int], List[float]]] = {}
+        self.pending_size = 0
+        self.removed = 0
+
+    @staticmethod
+    def key(question: str) -> str:
+        return question.strip().lower()
+
+    def __len__(self) -> int:
+        return len(self.rows_by_key)
+
+    def __contains__(self, question: str) -> bool:
+        return self.key(question) in self.rows_by_key
+
+    def clear(self):
+        self.__init__(self.merge_every)
+
+    def add(self, question: str) -> bool:
+        """Indexes a question; returns False if the same question (ignoring case) is already indexed."""
+        added = self._insert(question)
+        if self.pending_size >= self.merge_every:
+            self._merge()
+        return added
+
+    def add_many(self, questions: Iterable[str]) -> int:
+        """Bulk load: buffers every question and merges once."""
+        added = sum(self._insert(question) for question in questions)
+        self._merge()
+        return added
+
+    def _insert(self, question: str) -> bool:
+        key = self.key(question)
+        if key in self.rows_by_key:
+            return False
+        row = len(self.questions)
+        self.questions.append(question)
+        self.rows_by_key[key] = row
+        for term, weight in features(question).items():
+            term_id = self.vocabulary.setdefault(term, len(self.vocabulary))
+            rows, weights = self.pending.setdefault(term_id, ([], []))
+            rows.append(row)
+            weights.append(weight)
+            self.pending_size += 1
+        return True
+
+    def remove(self, question: str) -> bool:
+        """Forgets a question. Its postings stay until the next merge and are masked in lookups."""
+        row = self.rows_by_key.pop(self.key(question), None)
+        if row is None:
+            return False
+        self.questions[row] = None
+        self.removed += 1
+        return True
+
+    def _merge(self):
+        """Folds the buffered postings into the CSR arrays, dropping the postings of removed questions."""
+        if self.pending_size:
+            term_ids = np.concatenate([np.full(len(rows), term_id, dtype=np.int64)
+                                       for term_id, (rows, _) in self.pending.items()])
+            rows = np.concatenate([np.array(rows, dtype=np.int32) for rows, _ in self.pending.values()])
+            weights = np.concatenate([np.array(weights, dtype=np.float32) for _, weights in self.pending.values()])
+            # Stable, so the postings of a term stay in row order
+            order = np.argsort(term_ids, kind="stable")
+            term_ids, rows, weights = term_ids[order], rows[order], weights[order]
+            # New postings go after the existing ones of their term; terms added since the last merge go at the end
+            merged_terms = len(self.offsets) - 1
+            positions = self.offsets[np.minimum(term_ids + 1, merged_terms)]
+            self.rows = np.insert(self.rows, positions, rows)
+            self.weights = np.insert(self.weights, positions, weights)
+            counts = np.bincount(term_ids, minlength=len(self.vocabulary))
+            counts[:merged_terms] += np.diff(self.offsets)
+            self.offsets = np.concatenate([[0], np.cumsum(counts)])
+            self.pending = {}
+            self.pending_size = 0
+        if self.removed:
+            term_ids = np.repeat(np.arange(len(self.offsets) - 1), np.diff(self.offsets))
+            live = np.array([question is not None for question in self.questions], dtype=bool)[self.rows]
+            self.rows, self.weights = self.rows[live], self.weights[live]
+            self.offsets = np.concatenate([[0], np.cumsum(np.bincount(term_ids[live], minlength=len(self.offsets) - 1))])
+            self.removed = 0
+
+    def search(self, question: str) -> Tuple[Optional[str], float]:
+        """The most similar indexed question and its cosine similarity; an exact match (ignoring case) scores 1."""
+        row = self.rows_by_key.get(self.key(question))
+        if row is not None:
+            return self.questions[row], 1.0
+        if not self.rows_by_key:
+            return None, 0.0
+        scores = np.zeros(len(self.questions), dtype=np.float32)
+        merged_terms = len(self.offsets) - 1
+        for term, weight in features(question).items():
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            if term_id < merged_terms:
+                start, end = self.offsets[term_id], self.offsets[term_id + 1]
+                scores[self.rows[start:end]] += weight * self.weights[start:end]
+            if term_id in self.pending:
+                rows, weights = self.pending[term_id]
+                scores[rows] += weight * np.array(weights, dtype=np.float32)
+        best = int(np.argmax(scores))
+        # Removed rows can only win with postings not merged away yet
+        while self.questions[best] is None and scores[best] > 0:
+            scores[best] = 0
+            best = int(np.argmax(scores))
+        if self.questions[best] is None or scores[best] <= 0:
+            return None, 0.0
+        return self.questions[best], float(scores[best])
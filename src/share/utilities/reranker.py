@@ -0,0 +1,135 @@
+# utilities/reranker.py
+
+import logging
+import numpy as np
+
+from typing import Dict, List, Optional
+
+from pydantic import PrivateAttr
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from utilities.chunk_store import ChunkStore
+from utilities.context_packer import ContextPacker
+from utilities.vector_compression import stored_vectors
+from utilities.hybrid_retriever import HybridRetriever
+from utilities.vector_shards import ShardedVectorStore
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+RERANK_MODES = ("none", "mmr")
+
+def mmr_select(query_vector: np.ndarray, candidate_vectors: np.ndarray, k: int, lambda_mult: float = 0.5) -> List[int]:
+    """
+    Maximal Marginal Relevance over cosine similarities: repeatedly picks the candidate maximising
+    lambda * sim(query, c) - (1 - lambda) * max sim(c, already picked).
+    All similarities are computed up front as one matrix product; each step is an O(n) vector update.
+    """
+    n = len(candidate_vectors)
+    if n == 0 or k <= 0:
+        return []
+    vectors = np.asarray(candidate_vectors, dtype=np.float32)
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    query = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+    relevance = vectors @ query
+    similarity = vectors @ vectors.T
+    selected = [int(np.argmax(relevance))]
+    redundancy = similarity[:, selected[0]].copy()
+    while len(selected) < min(k, n):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        redundancy = np.maximum(redundancy, similarity[:, best])
+    return selected
+
+class RerankingRetriever(BaseRetriever):
+    """
+    Per-chain post-retrieval stage: takes the over-fetched candidates of a shared HybridRetriever and
+    keeps the k best. With MMR, near-duplicate chunks (chunk_overlap) give way to chunks that add
+    new context, so the prompt carries fewer redundant tokens. Candidate vectors are reconstructed
+    from the FAISS index rather than embedded again. An optional ContextPacker then fits the
+    chunks to the chain's token budget.
+    """
+    candidates: HybridRetriever
+    k: int = 4
+    mode: str = "none"
+    lambda_mult: float = 0.7
+    packer: Optional[ContextPacker] = None
+    model: str = ""
+
+    _positions: Optional[Dict[str, int]] = PrivateAttr(default=None)
+
+    def _position(self, chunk_id: str) -> int:
+        vector_store = self.candidates.vector_store
+        if isinstance(vector_store.docstore, ChunkStore):
+            return vector_store.docstore.row_of(chunk_id)
+        if self._positions is None:
+            self._positions = {value: position for position, value in vector_store.index_to_docstore_id.items()}
+        return self._positions.get(chunk_id, -1)
+
+    def stored_vectors(self, documents: List[Document]) -> Optional[np.ndarray]:
+        """The documents' stored vectors (see vector_compression.stored_vectors), or None if they cannot be read."""
+        vector_store = self.candidates.vector_store
+        if not all(document.id for document in documents):
+            return None
+        if isinstance(vector_store, ShardedVectorStore):
+            return vector_store.stored_vectors([document.id for document in documents])
+        positions = [self._position(document.id) for document in documents]
+        if min(positions, default=0) < 0:
+            return None
+        return stored_vectors(vector_store, positions)
+
+    def select(self, query_vector: List[float], documents: List[Document],
+               document_vectors: Optional[np.ndarray] = None) -> List[Document]:
+        """Applies the configured stage to candidates retrieved for the query."""
+        if self.mode == "mmr" and len(documents) > 1:
+            if document_vectors is None:
+                document_vectors = self.stored_vectors(documents)
+            if document_vectors is None:
+                document_vectors = self.candidates.vector_store.embeddings.embed_documents(
+                    [document.page_content for document in documents]
+                )
+            picked = mmr_select(np.array(query_vector), np.array(document_vectors), self.k, self.lambda_mult)
+        else:
+            picked = list(range(min(self.k, len(documents))))
+        selected = [documents[i] for i in picked]
+        if self.packer is None or not selected:
+            return selected
+
+        # Packing scores are cosine similarities to the query; without stored vectors only merging and the budget apply
+        vectors = np.asarray(document_vectors)[picked] if document_vectors is not None else self.stored_vectors(selected)
+        scores = None
+        if vectors is not None:
+            vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+            query = np.asarray(query_vector, dtype=np.float32)
+            scores = vectors @ (query / max(float(np.linalg.norm(query)), 1e-12))
+        packed, report = self.packer.pack(selected, scores)
+        logger.info(
+            f"Context | {self.model} | chunks {report.chunks_in} -> {report.chunks_out} | "
+            f"tokens {report.tokens_in} -> {report.tokens_out} (saved {report.tokens_saved})"
+        )
+        return packed
+
+    async def aselect(self, query_vector: List[float], documents: List[Document]) -> List[Document]:
+        document_vectors = None
+        if self.mode == "mmr" and len(documents) > 1:
+            document_vectors = self.stored_vectors(documents)
+            if document_vectors is None:
+                document_vectors = await self.candidates.vector_store.embeddings.aembed_documents(
+                    [document.page_content for document in documents]
+                )
+        return self.select(query_vector, documents, document_vectors)
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        query_vector, documents = self.candidates.search(query)
+        return self.select(query_vector, documents)
+
+    async def _aget_relevant_documents(self, query: str, *,
+                                       run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        query_vector, documents = await self.candidates.asearch(query)
+        return await self.aselect(query_vector, documents)
@@ -0,0 +1,93 @@
+# utilities/retrieval_cache.py
+
+import re
+import time
+import hashlib
+import logging
+import threading
+import unicodedata
+import numpy as np
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+@dataclass(frozen=True)
+class CachedRetrieval:
+    """Ranked candidate chunk ids and scores, plus the query embedding for reranking and packing."""
+    chunk_ids: Tuple[str, ...]
+    scores: Tuple[float, ...]
+    query_vector: np.ndarray
+
+class RetrievalCache:
+    """
+    LRU + TTL cache of retrieval results keyed by the normalized query hash and the index version,
+    so repeated questions skip the query embedding and the FAISS/BM25 search.
+    Entries of an older index version never match; invalidate() drops them right away.
+    """
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries: "OrderedDict[str, Tuple[float, CachedRetrieval]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """Case, Unicode form and whitespace do not change what is retrieved."""
+        return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", query)).strip().lower()
+
+    @classmethod
+    def key(cls, query: str, index_version: str) -> str:
+        digest = hashlib.sha256(cls.normalize_query(query).encode("utf-8")).hexdigest()
+        return f"{index_version}:{digest}"
+
+    def get(self, key: str) -> Optional[CachedRetrieval]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl_seconds:
+                del self.entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, value: CachedRetrieval):
+        with self.lock:
+            self.entries[key] = (time.monotonic(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        """Drops every entry, e.g. after the index was rebuilt."""
+        with self.lock:
+            if self.entries:
+                logger.info(f"Retrieval cache | invalidated {len(self.entries)} entries")
+            self.entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, float]:
+        """Hit ratio, eviction and expiry metrics."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
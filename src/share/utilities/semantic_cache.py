@@ -0,0 +1,226 @@
+# utilities/semantic_cache.py
+
+import re
+import time
+import hashlib
+import logging
+import faiss
+import numpy as np
+
+from typing import List, Optional, Sequence, Set, Tuple
+
+from redis.exceptions import ResponseError
+from redis.commands.search.query import Query
+from redis.commands.search.field import NumericField, TagField, TextField, VectorField
+from redis.commands.search.indexDefinition import IndexDefinition, IndexType
+
+from utilities.question_index import codes
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+CACHE_PREFIX = "cache:"
+INDEX_NAME = "cache_index"
+
+class SemanticCache:
+    """
+    Answer cache looked up by the query embedding the retrieval already computed, so a paraphrase
+    (in Thai, English or any other language the embedding model covers) hits without another embedding call.
+    Entries are Redis hashes under cache:<collection>:<sha1 of the question> holding the question, the answer,
+    the float32 embedding and a timestamp. With RediSearch they are found with a KNN query on the cosine
+    vector index cache_index. Without it every worker keeps a FAISS inner-product index of the entries,
+    loaded on first use and updated from a log of inserted keys, like CacheAnswer's question index.
+    The log holds each key once; past `max_entries` the oldest entries are dropped in batches, and the
+    generation bump makes every worker reload its index from the trimmed log.
+    """
+
+    def __init__(self, redis_client, collection: str = "default", threshold: float = 0.95, max_entries: int = 10000):
+        self.redis_client = redis_client
+        self.collection = collection
+        self.threshold = threshold
+        self.max_entries = max_entries
+        # Compacting every `slack` inserts keeps the reloads it causes rare
+        self.slack = max(1, max_entries // 10)
+        self.key_prefix = f"{CACHE_PREFIX}{collection}:"
+        # Only used without RediSearch; lists and strings are never indexed
+        self.log_key = f"{self.key_prefix}log"
+        self.generation_key = f"{self.key_prefix}generation"
+        self.compact_lock_key = f"{self.key_prefix}compacting"
+        self.redisearch: Optional[bool] = None  # Decided on first use
+        self.index: Optional[faiss.IndexFlatIP] = None
+        self.keys: List[str] = []
+        self.indexed: Set[str] = set()
+        self.synced = None
+        self.generation = None
+
+    def key(self, question: str) -> str:
+        return self.key_prefix + hashlib.sha1(question.strip().lower().encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _vector(query_vector: Sequence[float]) -> np.ndarray:
+        vector = np.array(query_vector, dtype=np.float32).reshape(1, -1)
+        faiss.normalize_L2(vector)
+        return vector
+
+    @staticmethod
+    def _decode(value) -> str:
+        return value.decode("utf-8") if isinstance(value, bytes) else value
+
+    async def _use_redisearch(self, dimension: int) -> bool:
+        """Whether RediSearch serves the lookups; creates cache_index with the embedding dimension if needed."""
+        if self.redisearch is not None:
+            return self.redisearch
+        search = self.redis_client.ft(INDEX_NAME)
+        try:
+            await search.info()
+            self.redisearch = True
+        except ResponseError as e:
+            if "unknown command" in str(e).lower():
+                logger.warning("RediSearch module not available; the semantic cache uses a local FAISS index.")
+                self.redisearch = False
+                return False
+            logger.info(f"Creating Redis index '{INDEX_NAME}'.")
+            try:
+                await search.create_index(
+                    fields=[
+                        VectorField("embedding", "FLAT", {"TYPE": "FLOAT32", "DIM": dimension, "DISTANCE_METRIC": "COSINE"}),
+                        TagField("collection"),
+                        TextField("question"),
+                        TextField("answers"),
+                        NumericField("timestamp", sortable=True)
+                    ],
+                    definition=IndexDefinition(prefix=[CACHE_PREFIX], index_type=IndexType.HASH)
+                )
+            except ResponseError as e:
+                # Another worker created it first
+                if "already exists" not in str(e).lower():
+                    raise
+            self.redisearch = True
+        return self.redisearch
+
+    async def _search_redis(self, vector: np.ndarray) -> Tuple[Optional[str], Optional[str], float]:
+        collection = re.sub(r"(\W)", r"\\\1", self.collection)
+        query = Query(f"(@collection:{{{collection}}})=>[KNN 1 @embedding $vector AS distance]") \
+            .sort_by("distance").return_fields("question", "answers", "distance").paging(0, 1).dialect(2)
+        result = await self.redis_client.ft(INDEX_NAME).search(query, query_params={"vector": vector.tobytes()})
+        if not result.docs:
+            return None, None, 0.0
+        document = result.docs[0]
+        # Cosine distance is 1 - cosine similarity
+        return document.question, document.answers, 1.0 - float(document.distance)
+
+    async def _sync_local_index(self, dimension: int):
+        """
+        Brings the local FAISS index up to date: the whole log on first use (or after a clear),
+        afterwards only the keys added since the last call.
+        """
+        generation = await self.redis_client.get(self.generation_key)
+        length = await self.redis_client.llen(self.log_key)
+        if self.index is None or self.index.d != dimension or generation != self.generation or length < self.synced:
+            self.index = faiss.IndexFlatIP(dimension)
+            self.keys = []
+            self.indexed = set()
+            self.synced = 0
+            self.generation = generation
+        if length <= self.synced:
+            return
+        start = self.synced
+        keys = [self._decode(key) for key in await self.redis_client.lrange(self.log_key, start, length - 1)]
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.hget(key, "embedding")
+            embeddings = await pipe.execute()
+        if self.synced != start:
+            # A concurrent request applied these entries already
+            return
+        rows = {}
+        for key, embedding in zip(keys, embeddings):
+            # A key is logged once, but skip repeats rather than add a second row for it
+            if embedding is not None and len(embedding) == dimension * 4 and key not in self.indexed:
+                rows[key] = np.frombuffer(embedding, dtype=np.float32)
+        if rows:
+            self.index.add(np.vstack(list(rows.values())))
+            self.keys.extend(rows)
+            self.indexed.update(rows)
+        self.synced = start + len(keys)
+
+    async def _search_local(self, vector: np.ndarray) -> Tuple[Optional[str], Optional[str], float]:
+        await self._sync_local_index(vector.shape[1])
+        if not self.keys:
+            return None, None, 0.0
+        similarities, rows = self.index.search(vector, 1)
+        if rows[0][0] < 0:
+            return None, None, 0.0
+        question, answer = await self.redis_client.hmget(self.keys[rows[0][0]], ["question", "answers"])
+        if question is None or answer is None:
+            # Removed since it was indexed
+            return None, None, 0.0
+        return self._decode(question), self._decode(answer), float(similarities[0][0])
+
+    async def check_cache(self, question: str, query_vector: Sequence[float]) -> Tuple[Optional[List[str]], Optional[str]]:
+        """Same contract as CacheAnswer.check_cache: ([answer], "cache") for a close enough question, else (None, None)."""
+        try:
+            vector = self._vector(query_vector)
+            if await self._use_redisearch(vector.shape[1]):
+                best_question, answer, similarity = await self._search_redis(vector)
+            else:
+                best_question, answer, similarity = await self._search_local(vector)
+            logger.info(f"check_cache | Best match: {best_question} | Similarity: {similarity:.4f}")
+            # Questions about another product code or number embed almost alike; never reuse their answers
+            if answer and similarity >= self.threshold and codes(best_question) == codes(question):
+                return [answer], "cache"
+            return None, None
+        except Exception as e:
+            logger.error(f"Error checking the semantic cache: {e}")
+            return None, None
+
+    async def add_to_cache(self, question: str, answer: str, query_vector: Sequence[float]):
+        """Stores the answer with the question's embedding; asking the same question again overwrites it."""
+        try:
+            vector = self._vector(query_vector)
+            key = self.key(question)
+            added = await self.redis_client.hset(key, mapping={
+                "question": question.strip(),
+                "answers": answer,
+                "embedding": vector.tobytes(),
+                "collection": self.collection,
+                "timestamp": time.time()
+            })
+            # HSET counts the new fields: 0 is an overwrite of a key the log already holds
+            if added and not await self._use_redisearch(vector.shape[1]):
+                length = await self.redis_client.rpush(self.log_key, key)
+                if self.max_entries > 0 and length > self.max_entries + self.slack:
+                    await self._compact()
+        except Exception as e:
+            logger.error(f"Error adding to the semantic cache: {e}")
+
+    async def _compact(self):
+        """Deletes the oldest entries beyond max_entries and trims them from the log. One worker at a time."""
+        if not await self.redis_client.set(self.compact_lock_key, 1, nx=True, ex=60):
+            return
+        try:
+            excess = await self.redis_client.llen(self.log_key) - self.max_entries
+            if excess <= 0:
+                return
+            keys = await self.redis_client.lrange(self.log_key, 0, excess - 1)
+            await self.redis_client.delete(*keys)
+            # Inserts only append, so the first `excess` items are still the ones read above
+            await self.redis_client.ltrim(self.log_key, excess, -1)
+            await self.redis_client.incr(self.generation_key)
+            logger.info(f"Dropped the {excess} oldest entries of the semantic cache of '{self.collection}'.")
+        finally:
+            await self.redis_client.delete(self.compact_lock_key)
+
+    async def clear_cache(self):
+        """Deletes every entry of the collection; the local indexes of all workers reload on their next lookup."""
+        try:
+            # The generation counter has to survive, or a worker could see the same value again
+            keys = [key async for key in self.redis_client.scan_iter(match=f"{self.key_prefix}*")
+                    if self._decode(key) != self.generation_key]
+            if keys:
+                await self.redis_client.delete(*keys)
+            await self.redis_client.incr(self.generation_key)
+            self.index = None
+            logger.info(f"Cleared the semantic cache of '{self.collection}'.")
+        except Exception as e:
+            logger.error(f"Error clearing the semantic cache: {e}")
@@ -0,0 +1,65 @@
+# utilities/startup_status.py
+
+import time
+import asyncio
+import logging
+
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+class StartupStatus:
+    """
+    Tracks background initialization progress so the service can accept traffic
+    immediately and report readiness separately from liveness.
+    """
+    def __init__(self):
+        self.stage = "pending"
+        self.progress = 0
+        self.error: Optional[str] = None
+        self.started_at = time.time()
+        self.ready_at: Optional[float] = None
+        self._done = asyncio.Event()
+
+    @property
+    def is_ready(self) -> bool:
+        return self.stage == "ready"
+
+    @property
+    def failed(self) -> bool:
+        return self.stage == "failed"
+
+    def set_stage(self, stage: str, progress: int):
+        self.stage = stage
+        self.progress = progress
+        logger.info(f"Startup | stage: {stage} | {progress}%/100%")
+
+    def mark_ready(self):
+        self.ready_at = time.time()
+        self.set_stage("ready", 100)
+        self._done.set()
+
+    def mark_failed(self, error: Exception):
+        self.error = str(error)
+        self.stage = "failed"
+        logger.error(f"Startup | failed during initialization: {error}")
+        self._done.set()
+
+    async def wait(self, timeout: float) -> bool:
+        """Waits up to `timeout` seconds for initialization to finish; returns whether it is ready."""
+        if not self._done.is_set() and timeout > 0:
+            try:
+                await asyncio.wait_for(self._done.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.is_ready
+
+    def to_dict(self) -> Dict[str, Any]:
+        end = self.ready_at or time.time()
+        return {
+            "stage": self.stage,
+            "progress": self.progress,
+            "error": self.error,
+            "elapsed_seconds": round(end - self.started_at, 2),
+        }
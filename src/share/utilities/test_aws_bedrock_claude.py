@@ -0,0 +1,120 @@
+import json
+import base64
+import struct
+import binascii
+import pytest
+
+from unittest.mock import AsyncMock, MagicMock
+from utilities.llm.aws_bedrock_claude import AWSBedrockClaude
+
+@pytest.fixture
+def claude():
+    return AWSBedrockClaude(
+        aws_access_key_id="AKIDEXAMPLE",
+        aws_secret_access_key="secret",
+        region_name="us-west-2",
+        model_id="anthropic.claude-3-5-sonnet-20240620-v1:0"
+    )
+
+def fake_session(status=200, payload=None):
+    response = MagicMock()
+    response.status = status
+    response.json = AsyncMock(return_value=payload or {})
+    response.text = AsyncMock(return_value="boom")
+    session = MagicMock()
+    session.closed = False
+    session.post = AsyncMock(return_value=response)
+    return session
+
+@pytest.mark.asyncio
+async def test_acall_sends_signed_request(claude):
+    session = fake_session(payload={"content": [{"text": "Hello"}, {"text": " there"}]})
+    claude._session = session
+
+    text = await claude._acall("Hi")
+
+    assert text == "Hello there"
+    url, = session.post.call_args.args
+    kwargs = session.post.call_args.kwargs
+    assert str(url) == (
+        "https://bedrock-runtime.us-west-2.amazonaws.com"
+        "/model/anthropic.claude-3-5-sonnet-20240620-v1%3A0/invoke"
+    )
+    assert kwargs["headers"]["Authorization"].startswith("AWS4-HMAC-SHA256 Credential=AKIDEXAMPLE/")
+    assert json.loads(kwargs["data"])["messages"] == [{"role": "user", "content": "Hi"}]
+
+@pytest.mark.asyncio
+async def test_acall_raises_on_http_error(claude):
+    claude._session = fake_session(status=403)
+    with pytest.raises(ValueError, match="HTTP 403"):
+        await claude._acall("Hi")
+
+@pytest.mark.asyncio
+async def test_session_times_out_stalled_reads_but_not_long_streams(claude):
+    session = claude._get_session()
+    try:
+        assert session.timeout.total is None
+        assert session.timeout.sock_connect == session.timeout.sock_read == 60
+    finally:
+        await claude.aclose()
+    assert session.closed
+
+def event_frame(payload: dict, message_type="event", event_type="chunk") -> bytes:
+    """One AWS event-stream message: prelude, string headers, payload and the two CRC32s."""
+    headers = b""
+    for name, value in ((":message-type", message_type), (":event-type", event_type),
+                        (":content-type", "application/json")):
+        headers += bytes([len(name)]) + name.encode() + b"\x07" + struct.pack(">H", len(value)) + value.encode()
+    body = json.dumps(payload).encode()
+    prelude = struct.pack(">II", 16 + len(headers) + len(body), len(headers))
+    message = prelude + struct.pack(">I", binascii.crc32(prelude)) + headers + body
+    return message + struct.pack(">I", binascii.crc32(message))
+
+def chunk_frame(event: dict) -> bytes:
+    return event_frame({"bytes": base64.b64encode(json.dumps(event).encode()).decode()})
+
+def stream_session(network_chunks):
+    async def iter_any():
+        for data in network_chunks:
+            yield data
+
+    response = MagicMock()
+    response.status = 200
+    response.content.iter_any = iter_any
+    session = MagicMock()
+    session.closed = False
+    session.post = AsyncMock(return_value=response)
+    return session
+
+@pytest.mark.asyncio
+async def test_astream_decodes_event_stream_frames(claude):
+    frames = [
+        chunk_frame({"type": "message_start", "message": {"role": "assistant"}}),
+        chunk_frame({"type": "content_block_delta", "delta": {"type": "text_delta", "text": "สวัสดี"}}),
+        chunk_frame({"type": "content_block_delta", "delta": {"type": "text_delta", "text": " there"}}),
+        chunk_frame({"type": "message_stop"}),
+    ]
+    # The second frame arrives split across two network reads, the last two in one read
+    split = len(frames[1]) // 2
+    session = stream_session([frames[0] + frames[1][:split], frames[1][split:], frames[2] + frames[3]])
+    claude._session = session
+
+    chunks = [chunk.text async for chunk in claude._astream("Hi")]
+
+    assert chunks == ["สวัสดี", " there"]
+    url, = session.post.call_args.args
+    assert str(url).endswith("/invoke-with-response-stream")
+    assert session.post.call_args.kwargs["headers"]["Accept"] == "application/vnd.amazon.eventstream"
+    session.post.return_value.release.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_astream_raises_on_exception_events(claude):
+    claude._session = stream_session([
+        chunk_frame({"type": "content_block_delta", "delta": {"text": "partial"}}),
+        event_frame({"message": "Too many requests"}, message_type="exception", event_type="throttlingException"),
+    ])
+    received = []
+    with pytest.raises(ValueError, match="Too many requests"):
+        async for chunk in claude._astream("Hi"):
+            received.append(chunk.text)
+    assert received == ["partial"]
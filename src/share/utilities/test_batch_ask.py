@@ -0,0 +1,156 @@
+import json
+import argparse
+
+import numpy as np
+import pytest
+
+from unittest.mock import AsyncMock
+from langchain_community.docstore.in_memory import InMemoryDocstore
+
+from conftest import CountingEmbeddings, StubCombineChain, StubQAChain
+from utilities import redis_connector
+from utilities.batch_ask import read_questions, run
+from utilities.chatbot_faiss import ChatbotFAISS
+from utilities.faiss_index_factory import FaissIndexSettings
+from utilities.hybrid_retriever import HybridRetriever
+from utilities.reranker import RerankingRetriever
+from utilities.startup_status import StartupStatus
+from utilities.vector_compression import RescoringFAISS, search_batch
+from utilities.vector_shards import ShardLayout, ShardedVectorStore
+
+TEXTS = [f"chunk {i} about topic {i % 7}" for i in range(300)]
+
+def make_store(texts, settings, embeddings, prefix="id"):
+    vectors = np.array(embeddings.embed_documents(texts), dtype=np.float32)
+    index = settings.build_index(vectors)
+    store = RescoringFAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={},
+        full_vectors=np.empty((0, index.d), dtype=np.float32) if settings.lossy else None,
+        rescore_factor=settings.rescore_factor
+    )
+    store.add_embeddings(zip(texts, vectors.tolist()), ids=[f"{prefix}{i}" for i in range(len(texts))])
+    return store
+
+def contents(results):
+    return [(document.page_content, round(float(score), 4)) for document, score in results]
+
+@pytest.mark.parametrize("settings", [FaissIndexSettings(), FaissIndexSettings(vector_encoding="int8")])
+def test_matrix_search_matches_single_searches(tmp_path, shard_pool, settings):
+    embeddings = CountingEmbeddings()
+    queries = np.array(embeddings.embed_documents(["topic 1", "topic 3", "chunk 42"]), dtype=np.float32)
+    store = make_store(TEXTS, settings, embeddings)
+    sharded = ShardedVectorStore(
+        [make_store(TEXTS[:150], settings, embeddings, "a"), make_store(TEXTS[150:], settings, embeddings, "b")],
+        ShardLayout(str(tmp_path), 2, "hash"),
+        shard_pool
+    )
+    for vector_store in (store, sharded):
+        batch = search_batch(vector_store, queries, 5)
+        single = [vector_store.similarity_search_with_score_by_vector(query.tolist(), k=5) for query in queries]
+        assert [contents(results) for results in batch] == [contents(results) for results in single]
+    assert contents(search_batch(store, queries, 5)[0]) == contents(search_batch(sharded, queries, 5)[0])
+
+@pytest.mark.asyncio
+async def test_batch_search_embeds_uncached_queries_in_one_request():
+    embeddings = CountingEmbeddings()
+    retriever = HybridRetriever(vector_store=make_store(TEXTS, FaissIndexSettings(), embeddings), k=3, fetch_k=10)
+    queries = ["topic 1", "topic 2", "chunk 5"]
+    expected = [await retriever.asearch(query) for query in queries]
+    embeddings.query_calls = 0
+
+    results = await retriever.asearch_batch(queries)
+    assert embeddings.document_calls == 1 and embeddings.query_calls == 0
+    assert [[document.page_content for document in documents] for _, documents in results] == \
+           [[document.page_content for document in documents] for _, documents in expected]
+
+def answer_with_first_chunk(inputs):
+    return f"{inputs['question']}: {inputs['input_documents'][0].page_content}"
+
+def make_chatbot(cached=None):
+    embeddings = CountingEmbeddings()
+    candidates = HybridRetriever(vector_store=make_store(TEXTS, FaissIndexSettings(), embeddings), k=3, fetch_k=10)
+    chatbot = ChatbotFAISS.__new__(ChatbotFAISS)
+    chatbot.status = StartupStatus()
+    chatbot.status.mark_ready()
+    chatbot.qa_chains = {
+        model: StubQAChain(RerankingRetriever(candidates=candidates, k=1, model=model),
+                           StubCombineChain(0.02, answer_with_first_chunk))
+        for model in ("GPT", "CLAUDE")
+    }
+    cached = cached or {}
+    chatbot.cache_controller = AsyncMock()
+    chatbot.cache_controller.check_cache = AsyncMock(
+        side_effect=lambda question: ([cached[question]], "cache") if question in cached else (None, None)
+    )
+    chatbot.embeddings_used = embeddings
+    return chatbot
+
+@pytest.mark.asyncio
+async def test_answer_batch_serves_cache_hits_and_bounds_generation():
+    chatbot = make_chatbot(cached={"question 3": "cached answer"})
+    questions = [f"question {i}" for i in range(12)]
+    items = [item async for item in chatbot.answer_batch(questions, model_choice="gpt", concurrency=3)]
+
+    assert items[0] == {"index": 3, "question": "question 3", "answer": "cached answer", "type_res": "cache"}
+    assert sorted(item["index"] for item in items) == list(range(12))
+    assert all(item["answer"].startswith(item["question"]) for item in items[1:])
+    assert chatbot.embeddings_used.document_calls == 1 and chatbot.embeddings_used.query_calls == 0
+    assert chatbot.qa_chains["GPT"].combine_documents_chain.max_running == 3
+    chatbot.cache_controller.add_to_cache.assert_awaited()
+    with pytest.raises(ValueError):
+        [item async for item in chatbot.answer_batch(questions, model_choice="BOTH")]
+
+@pytest.fixture
+def chat_bot():
+    return make_chatbot()
+
+@pytest.mark.asyncio
+async def test_batch_endpoint_streams_ndjson(client):
+    payload = {"user_id": "dev_test007", "model": "CLAUDE", "questions": ["topic 1?", " topic 2? "], "concurrency": 1}
+    response = await client.post("/v1/ask/batch/", json=payload)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(line["question"] for line in lines[:-1]) == ["topic 1?", "topic 2?"]
+    assert lines[-1]["done"] and lines[-1]["generated"] == 2 and lines[-1]["errors"] == 0
+
+    for invalid in ({"questions": []}, {"questions": ["ok", ""]}, {"model": "BOTH"}, {"concurrency": 0},
+                    {"questions": ["q"] * 501}, {"collection": 3}):
+        response = await client.post("/v1/ask/batch/", json={**payload, **invalid})
+        assert response.status_code == 400, invalid
+
+def test_read_questions(tmp_path):
+    (tmp_path / "q.txt").write_text("first?\n\n  second?  \n", encoding="utf-8")
+    (tmp_path / "q.json").write_text(json.dumps(["first?", {"question": "second?"}]), encoding="utf-8")
+    (tmp_path / "q.jsonl").write_text('{"question": "first?"}\n"second?"\n', encoding="utf-8")
+    for name in ("q.txt", "q.json", "q.jsonl"):
+        assert read_questions(str(tmp_path / name)) == ["first?", "second?"]
+
+@pytest.mark.asyncio
+async def test_cli_closes_the_default_chatbot(tmp_path, monkeypatch):
+    (tmp_path / "q.txt").write_text("first?\n", encoding="utf-8")
+    redis_client = AsyncMock()
+    async def answer_batch(questions, **kwargs):
+        for index, question in enumerate(questions):
+            yield {"index": index, "answer": f"answer to {question}", "type_res": "generate"}
+
+    collection_bot = AsyncMock()
+    collection_bot.answer_batch = answer_batch
+    default_bot = AsyncMock()
+    default_bot.resolve_collection = AsyncMock(return_value=collection_bot)
+    monkeypatch.setattr(redis_connector, "get_client", AsyncMock(return_value=redis_client))
+    monkeypatch.setattr(ChatbotFAISS, "create", AsyncMock(return_value=default_bot))
+
+    args = argparse.Namespace(questions=str(tmp_path / "q.txt"), collection="hr", model="CLAUDE",
+                              concurrency=2, output=str(tmp_path / "answers.ndjson"))
+    await run(args)
+
+    default_bot.resolve_collection.assert_awaited_once_with("hr")
+    default_bot.aclose.assert_awaited_once()
+    collection_bot.aclose.assert_not_awaited()
+    redis_client.close.assert_awaited_once()
+    lines = (tmp_path / "answers.ndjson").read_text(encoding="utf-8").splitlines()
+    assert json.loads(lines[0])["answer"] == "answer to first?" and json.loads(lines[-1])["done"]
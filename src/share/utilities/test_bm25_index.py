@@ -0,0 +1,48 @@
+import pytest
+
+from langchain_community.embeddings import FakeEmbeddings
+from langchain_community.vectorstores import FAISS
+
+from utilities.bm25_index import BM25Index, tokenize
+from utilities.hybrid_retriever import HybridRetriever
+
+TEXTS = [
+    "The warranty for model AP-7731 covers two years.",
+    "Our head office is in Bangkok.",
+    "Model AP-7731 and AP-7732 share the same chassis.",
+    "บริษัท เอพี (ไทยแลนด์) จำกัด ก่อตั้งขึ้นในปี 1991",
+    "Opening hours are nine to five.",
+]
+IDS = [f"chunk-{i}" for i in range(len(TEXTS))]
+
+def test_tokenize_keeps_codes_and_splits_thai_into_bigrams():
+    assert tokenize("Model AP-7731, room_12") == ["model", "ap", "7731", "room", "12"]
+    assert tokenize("ไทยแลนด์") == ["ไท", "ทย", "ยแ", "แล", "ลน", "นด", "ด์"]
+
+def test_search_ranks_exact_terms_and_round_trips(tmp_path):
+    index = BM25Index.build(IDS, TEXTS)
+    results = index.search("warranty AP-7731", 3)
+    assert [chunk_id for chunk_id, _ in results] == ["chunk-0", "chunk-2"]
+    assert results[0][1] > results[1][1] > 0
+    assert index.search("ไทยแลนด์", 1)[0][0] == "chunk-3"
+    assert index.search("unknown words", 3) == []
+
+    index.save(str(tmp_path))
+    loaded = BM25Index.load(str(tmp_path))
+    assert loaded.search("warranty AP-7731", 3) == results
+    assert BM25Index.remove(str(tmp_path)) and BM25Index.load(str(tmp_path)) is None
+
+@pytest.mark.asyncio
+async def test_hybrid_retriever_pulls_up_keyword_matches():
+    vector_store = FAISS.from_texts(TEXTS, FakeEmbeddings(size=8), ids=IDS)
+    retriever = HybridRetriever(
+        vector_store=vector_store, sparse_index=BM25Index.from_vector_store(vector_store), k=2, fetch_k=5
+    )
+    # Random embeddings rank arbitrarily; BM25 agreement decides the top of the fused list
+    documents = await retriever.ainvoke("AP-7731 warranty")
+    assert {document.id for document in documents} == {"chunk-0", "chunk-2"}
+    assert {document.id for document in retriever.invoke("AP-7731 warranty")} == {"chunk-0", "chunk-2"}
+
+    dense = [vector_store.docstore.search(chunk_id) for chunk_id in ("chunk-4", "chunk-0")]
+    sparse = [vector_store.docstore.search(chunk_id) for chunk_id in ("chunk-0", "chunk-2")]
+    assert [document.id for document in retriever.fuse(dense, sparse)] == ["chunk-0", "chunk-4"]
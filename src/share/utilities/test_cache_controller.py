@@ -1,75 +1,83 @@
 import pytest
-import redis.asyncio as redis
 import pytest_asyncio
-import numpy as np
-from scipy.sparse import csr_matrix
 
-from unittest.mock import AsyncMock, patch, MagicMock
 from cache_controller import CacheAnswer
+from conftest import FakeRedis
 
 @pytest_asyncio.fixture
 async def cache_answer():
-    redis_client = AsyncMock(spec=redis.Redis)
-    return CacheAnswer(redis_client)
+    return CacheAnswer(FakeRedis())
 
 @pytest.mark.asyncio
 async def test_check_cache_with_similar_question(cache_answer):
-    # Mock data
-    test_question = "What is the capital of France?"
-    cached_question = "What's the capital of France?"
     cached_answer = "The capital of France is Paris."
-    
-    # Mock redis client methods
-    cache_answer.redis_client.hgetall = AsyncMock(return_value={cached_question: cached_answer})
-    cache_answer.redis_client.hget = AsyncMock(return_value=cached_answer)
-    
-    # Mock vectorizer
-    cache_answer.vectorizer = MagicMock()
-    cache_answer.vectorizer.fit_transform = MagicMock(return_value=csr_matrix([[1, 0, 0]]))
-    cache_answer.vectorizer.transform = MagicMock(return_value=csr_matrix([[1, 0, 0]]))
-    
-    # Set up cached questions and vectors
-    cache_answer.cached_questions = [cached_question]
-    cache_answer.cached_vectors = csr_matrix([[1, 0, 0]])
-    
-    # Test the cache check
-    result = await cache_answer.check_cache(test_question)
-    assert result[0] == [cached_answer]
-    assert result[1] == "cache"
+    await cache_answer.add_to_cache("What is the capital of France?", cached_answer)
+
+    for question in ("User: what is the capital of France", "What is the CAPITAL of France?"):
+        result = await cache_answer.check_cache(question)
+        assert result[0] == [cached_answer]
+        assert result[1] == "cache"
 
 @pytest.mark.asyncio
 async def test_check_cache_with_different_question(cache_answer):
-    # Mock data
-    test_question = "What is the capital of Spain?"
-    cached_question = "What is the capital of France?"
-    cached_answer = "The capital of France is Paris."
-    
-    # Mock redis client methods
-    cache_answer.redis_client.hgetall = AsyncMock(return_value={cached_question: cached_answer})
-    
-    # Mock vectorizer
-    cache_answer.vectorizer = MagicMock()
-    cache_answer.vectorizer.fit_transform = MagicMock(return_value=csr_matrix([[1, 0, 0]]))
-    cache_answer.vectorizer.transform = MagicMock(return_value=csr_matrix([[0, 1, 0]]))
-    
-    # Set up cached questions and vectors
-    cache_answer.cached_questions = [cached_question]
-    cache_answer.cached_vectors = csr_matrix([[1, 0, 0]])
-    
-    # Test the cache check
-    result = await cache_answer.check_cache(test_question)
+    await cache_answer.add_to_cache("What is the capital of France?", "The capital of France is Paris.")
+
+    result = await cache_answer.check_cache("What is the capital of Spain?")
     assert result == (None, None)
 
+@pytest.mark.asyncio
+async def test_questions_about_another_code_or_number_miss(cache_answer):
+    # Low enough that the wording alone would match, like a long question where one word in fifty differs
+    cache_answer.SIMILARITY_THRESHOLD = 0.7
+    await cache_answer.add_to_cache("What is the price of model AP-7731?", "AP-7731 costs 990 baht.")
+
+    for question in ("What is the price of model AP-7732?", "What is the price of 2 model AP-7731?"):
+        assert cache_answer.index.search(question)[1] >= cache_answer.SIMILARITY_THRESHOLD
+        assert await cache_answer.check_cache(question) == (None, None)
+    assert await cache_answer.check_cache("what's the price of model AP-7731") == (["AP-7731 costs 990 baht."], "cache")
+
+    await cache_answer.add_to_cache("What is the price of model AP-7732?", "AP-7732 costs 1290 baht.")
+    assert len(cache_answer.redis_client.hashes["cache_questions"]) == 2
+
 @pytest.mark.asyncio
 async def test_add_to_cache(cache_answer):
-    # Test data
     question = "What is the capital of Italy?"
     answer = "The capital of Italy is Rome."
-    
-    # Mock redis client methods
-    cache_answer.redis_client.hset = AsyncMock()
-    cache_answer.redis_client.hgetall = AsyncMock(return_value={})
-    
-    # Test adding to cache
+
     await cache_answer.add_to_cache(question, answer)
-    cache_answer.redis_client.hset.assert_called_once_with('cache_questions', question, answer)
+    await cache_answer.add_to_cache("what is the capital of italy", "A near-duplicate answer.")
+    assert cache_answer.redis_client.hashes == {'cache_questions': {question: answer}}
+    assert cache_answer.redis_client.lists == {'cache_questions:log': [question]}
+
+@pytest.mark.asyncio
+async def test_workers_share_inserts_without_reloading():
+    redis_client = FakeRedis()
+    redis_client.hashes['cache_questions'] = {"Cached before the log existed?": "old answer"}
+    first, second = CacheAnswer(redis_client), CacheAnswer(redis_client)
+
+    assert await second.check_cache("Cached before the log existed?") == (["old answer"], "cache")
+    await first.add_to_cache("Added by another worker?", "new answer")
+    assert await second.check_cache("added by another worker") == (["new answer"], "cache")
+    assert redis_client.calls.count("hkeys") == 2 and redis_client.calls.count("lrange") == 1
+
+    # A clear by any worker makes the others reload
+    await first.clear_cache()
+    await first.add_to_cache("Asked after the clear?", "fresh answer")
+    assert await second.check_cache("Added by another worker?") == (None, None)
+    assert await second.check_cache("Asked after the clear?") == (["fresh answer"], "cache")
+
+@pytest.mark.asyncio
+async def test_log_stays_bounded():
+    redis_client = FakeRedis()
+    cache, other = CacheAnswer(redis_client, max_entries=4), CacheAnswer(redis_client, max_entries=4)
+    questions = [f"Where is office {i}?" for i in range(6)]
+    await other.check_cache(questions[0])
+    for i, question in enumerate(questions):
+        await cache.add_to_cache(question, f"Building {i}.")
+
+    # One past max_entries + slack drops the oldest questions; every worker reloads the trimmed hash
+    assert redis_client.lists["cache_questions:log"] == questions[2:]
+    assert list(redis_client.hashes["cache_questions"]) == questions[2:]
+    assert await other.check_cache(questions[0]) == (None, None)
+    assert await other.check_cache(questions[5]) == (["Building 5."], "cache")
+    assert len(other.index) == 4
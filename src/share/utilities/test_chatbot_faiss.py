@@ -0,0 +1,242 @@
+import asyncio
+import time
+
+import pytest
+
+from unittest.mock import AsyncMock
+from langchain.chains import RetrievalQA
+from langchain.prompts import PromptTemplate
+from langchain_community.embeddings import FakeEmbeddings
+from langchain_community.vectorstores import FAISS
+from langchain_core.language_models.fake import FakeListLLM, FakeStreamingListLLM
+
+from conftest import CountingEmbeddings, StubCombineChain, StubQAChain
+from core import auth
+from instances import app_state
+from routes import langgpt
+from utilities import dependencies
+from utilities.chatbot_faiss import ChatbotFAISS
+from utilities.query_condenser import QueryCondenser
+from utilities.startup_status import StartupStatus
+
+LLM_DELAY = 0.2
+
+def make_chatbot() -> ChatbotFAISS:
+    chatbot = ChatbotFAISS.__new__(ChatbotFAISS)
+    chatbot.status = StartupStatus()
+    chatbot.status.mark_ready()
+    chatbot.qa_chains = {
+        model: StubQAChain(combine_documents_chain=StubCombineChain(LLM_DELAY)) for model in ("GPT", "CLAUDE")
+    }
+    chatbot.query_condenser = QueryCondenser()
+    chatbot.cache_controller = AsyncMock()
+    chatbot.cache_controller.check_cache = AsyncMock(return_value=(None, None))
+    return chatbot
+
+@pytest.fixture
+def chat_bot():
+    return make_chatbot()
+
+async def ask_many(client, n: int) -> float:
+    payloads = [
+        {"user_id": "dev_test007", "topic_id": f"topic-{i}", "question": f"question {i}?", "model": "GPT"}
+        for i in range(n)
+    ]
+    start = time.perf_counter()
+    responses = await asyncio.gather(*(client.post("/v1/ask/", json=p) for p in payloads))
+    elapsed = time.perf_counter() - start
+    assert all(r.status_code == 200 for r in responses), [r.text for r in responses]
+    assert all(r.json()["data"]["type_res"] == "generate" for r in responses)
+    return elapsed
+
+@pytest.mark.asyncio
+async def test_ask_requests_run_concurrently(client):
+    single = await ask_many(client, 1)
+    n = 8
+    concurrent = await ask_many(client, n)
+
+    # Serialized processing would take ~n * LLM_DELAY; concurrent should stay near one call
+    assert concurrent < n * LLM_DELAY / 2
+    throughput_gain = (n / concurrent) / (1 / single)
+    assert throughput_gain > 2
+
+@pytest.mark.asyncio
+async def test_process_query_does_not_hold_threads():
+    chatbot = make_chatbot()
+    n = 200  # well beyond the default executor's thread count
+    start = time.perf_counter()
+    results = await asyncio.gather(*(
+        chatbot.process_query("dev_test007", f"topic-{i}", f"question {i}?", model_choice="CLAUDE")
+        for i in range(n)
+    ))
+    elapsed = time.perf_counter() - start
+
+    assert all(r["msg"] == "success" for r in results)
+    assert elapsed < LLM_DELAY * 3
+
+def make_streaming_chain(answer: str) -> RetrievalQA:
+    vector_store = FAISS.from_texts(["The Jedi temple is on Coruscant."], FakeEmbeddings(size=8))
+    return RetrievalQA.from_chain_type(
+        llm=FakeStreamingListLLM(responses=[answer]),
+        chain_type="stuff",
+        retriever=vector_store.as_retriever(search_kwargs={"k": 1}),
+        chain_type_kwargs={"prompt": PromptTemplate(
+            input_variables=["context", "question"],
+            template="{context}\n{question}"
+        )}
+    )
+
+class SlowListLLM(FakeListLLM):
+    delay: float = LLM_DELAY
+
+    async def _acall(self, prompt, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.delay)
+        return self._call(prompt, stop, **kwargs)
+
+def make_compare_chains(embeddings: CountingEmbeddings) -> dict:
+    vector_store = FAISS.from_texts(["The Jedi temple is on Coruscant."], embeddings)
+    retriever = vector_store.as_retriever(search_kwargs={"k": 1})
+    prompt = PromptTemplate(input_variables=["context", "question"], template="{context}\n{question}")
+    return {
+        model: RetrievalQA.from_chain_type(
+            llm=SlowListLLM(responses=[f"{model} says Coruscant"]),
+            chain_type="stuff",
+            retriever=retriever,
+            chain_type_kwargs={"prompt": prompt}
+        )
+        for model in ("GPT", "CLAUDE")
+    }
+
+@pytest.mark.asyncio
+async def test_ask_both_retrieves_once_and_generates_concurrently(client):
+    chatbot = app_state.chat_bot
+    embeddings = CountingEmbeddings(size=8)
+    chatbot.qa_chains = make_compare_chains(embeddings)
+    chatbot.cache_controller.add_to_cache = AsyncMock()
+
+    payload = {"user_id": "dev_test007", "topic_id": "001", "question": "Where is the temple?", "model": "BOTH"}
+    start = time.perf_counter()
+    response = await client.post("/v1/ask/", json=payload)
+    elapsed = time.perf_counter() - start
+
+    assert response.status_code == 200, response.text
+    data = response.json()["data"]
+    assert data["type_res"] == "compare"
+    assert {model: result["answer"] for model, result in data["answers"].items()} == {
+        "GPT": "GPT says Coruscant", "CLAUDE": "CLAUDE says Coruscant"
+    }
+    assert embeddings.query_calls == 1
+    # The two generations overlap: max(LLM_DELAY, LLM_DELAY), not their sum
+    assert elapsed < LLM_DELAY * 1.8
+    chatbot.cache_controller.check_cache.assert_not_awaited()
+    app_state.conversation_manager.add_message.assert_any_await(
+        "dev_test007", "001", "bot", "[GPT] GPT says Coruscant\n\n[CLAUDE] CLAUDE says Coruscant"
+    )
+
+@pytest.mark.asyncio
+async def test_stream_rejects_compare_mode(client):
+    payload = {"user_id": "dev_test007", "topic_id": "001", "question": "Hi?", "model": "BOTH"}
+    response = await client.post("/v1/ask/stream/", json=payload)
+    assert response.status_code == 400
+
+@pytest.mark.asyncio
+async def test_ask_stream_sends_tokens_then_saves_answer(client):
+    chatbot = app_state.chat_bot
+    chatbot.qa_chains["GPT"] = make_streaming_chain("Coruscant")
+    chatbot.cache_controller.add_to_cache = AsyncMock()
+
+    payload = {"user_id": "dev_test007", "topic_id": "001", "question": "Where is the temple?", "model": "GPT"}
+    response = await client.post("/v1/ask/stream/", json=payload)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [block for block in response.text.split("\n\n") if block]
+    assert [e.splitlines()[0] for e in events] == ["event: token"] * len("Coruscant") + ["event: done"]
+    assert '"answer": "Coruscant"' in events[-1]
+
+    # Cached under the standalone question, not the prompt with the conversation
+    chatbot.cache_controller.add_to_cache.assert_awaited_once_with("Where is the temple?", "Coruscant")
+    app_state.conversation_manager.add_message.assert_any_await("dev_test007", "001", "bot", "Coruscant")
+
+@pytest.mark.asyncio
+async def test_ask_retrieves_with_the_condensed_query_and_generates_with_the_history(client):
+    chatbot = app_state.chat_bot
+    chatbot.cache_controller.add_to_cache = AsyncMock()
+    app_state.conversation_manager.get_conversation_history = AsyncMock(return_value=[
+        {"sender": "user", "message": "Where is the Jedi temple?"},
+        {"sender": "bot", "message": "On Coruscant, in the Federal District. " * 20},
+    ])
+
+    payload = {"user_id": "dev_test007", "topic_id": "001", "question": "How old is it?", "model": "GPT"}
+    response = await client.post("/v1/ask/", json=payload)
+    assert response.status_code == 200
+
+    qa_chain = chatbot.qa_chains["GPT"]
+    retrieval_query = "Where is the Jedi temple?\nHow old is it?"
+    qa_chain.retriever.ainvoke.assert_awaited_once_with(retrieval_query)
+    assert "Federal District" in qa_chain.combine_documents_chain.questions[0]
+    chatbot.cache_controller.check_cache.assert_awaited_once_with(retrieval_query)
+    assert chatbot.cache_controller.add_to_cache.await_args.args[0] == retrieval_query
+
+@pytest.mark.asyncio
+async def test_ask_stream_flushes_cache_hit_at_once(client):
+    chatbot = app_state.chat_bot
+    chatbot.cache_controller.check_cache = AsyncMock(return_value=(["cached answer"], "cache"))
+
+    payload = {"user_id": "dev_test007", "topic_id": "001", "question": "Again?", "model": "CLAUDE"}
+    response = await client.post("/v1/ask/stream/", json=payload)
+
+    events = [block for block in response.text.split("\n\n") if block]
+    assert len(events) == 2
+    assert '"token": "cached answer"' in events[0]
+    assert '"type_res": "cache"' in events[1]
+
+@pytest.mark.asyncio
+async def test_requests_are_rejected_until_warm_up_finishes(client, monkeypatch):
+    monkeypatch.setattr(dependencies, "STARTUP_WAIT_SECONDS", 0.05)
+    chatbot = app_state.chat_bot
+    chatbot.status = StartupStatus()
+    chatbot.status.set_stage("vector_store", 20)
+
+    ready = await client.get("/v1/ready/")
+    assert ready.status_code == 503
+    assert ready.json()["stage"] == "vector_store"
+    assert (await client.get("/v1/health/")).status_code == 200
+
+    payload = {"user_id": "dev_test007", "topic_id": "001", "question": "Hi?", "model": "GPT"}
+    rejected = await client.post("/v1/ask/", json=payload)
+    assert rejected.status_code == 503
+    assert rejected.headers["retry-after"] == "5"
+
+    chatbot.status.mark_ready()
+    assert (await client.get("/v1/ready/")).json()["status"] == "ready"
+    assert (await client.post("/v1/ask/", json=payload)).status_code == 200
+
+@pytest.mark.asyncio
+async def test_admin_reload_needs_the_admin_token(client, monkeypatch):
+    reload = AsyncMock(return_value={"msg": "success", "data": {"version": "v2", "previous_version": "v1"}})
+    monkeypatch.setattr(langgpt, "ai_langchain_reload", reload)
+
+    # Off by default; chat access tokens never reach it
+    assert (await client.post("/v1/admin/reload/", json={})).status_code == 403
+    monkeypatch.setattr(auth, "ADMIN_API_TOKEN", "admin-secret")
+    assert (await client.post("/v1/admin/reload/", json={})).status_code == 401
+    assert (await client.post("/v1/admin/reload/", json={}, headers={"X-Admin-Token": "wrong"})).status_code == 401
+    reload.assert_not_awaited()
+
+    response = await client.post("/v1/admin/reload/", json={}, headers={"X-Admin-Token": "admin-secret"})
+    assert response.status_code == 200 and response.json()["data"]["version"] == "v2"
+
+@pytest.mark.asyncio
+async def test_warm_up_records_failure_without_raising(monkeypatch):
+    chatbot = ChatbotFAISS.__new__(ChatbotFAISS)
+    chatbot.status = StartupStatus()
+
+    def broken_initialize():
+        raise RuntimeError("index missing")
+
+    chatbot.initialize = broken_initialize
+    await chatbot.warm_up()
+    assert chatbot.status.failed
+    assert chatbot.status.error == "index missing"
+    assert not await chatbot.status.wait(timeout=1)
@@ -0,0 +1,52 @@
+import pytest
+
+from langchain_core.documents import Document
+from langchain_community.embeddings import FakeEmbeddings
+from langchain_community.vectorstores import FAISS
+
+from utilities.chunk_store import ChunkStore
+from utilities.faiss_loader import read_vector_store_files, save_vector_store
+
+def test_chunks_round_trip_and_decode_lazily(tmp_path):
+    ids = ["b-1", "a-0", "c-10", "c-2"]
+    documents = [
+        Document(page_content=f"Chunk {chunk_id} – ünïcode", metadata={"source": f"{chunk_id}.pdf", "page": i})
+        for i, chunk_id in enumerate(ids)
+    ]
+    ChunkStore.write(str(tmp_path), ids, documents)
+
+    store = ChunkStore(str(tmp_path))
+    assert len(store) == 4
+    assert [store.row_of(chunk_id) for chunk_id in ids] == [0, 1, 2, 3]
+    assert store.row_of("missing") == -1 and store.row_of("c-1") == -1
+    assert store.search("c-2").page_content == documents[3].page_content
+    assert store.search("c-2").metadata == documents[3].metadata and store.search("c-2").id == "c-2"
+    assert store.search("missing") == "ID missing not found."
+    assert dict(store.index_to_docstore_id()) == dict(enumerate(ids))
+
+    docstore, mapping = store.to_in_memory()
+    assert mapping == dict(enumerate(ids))
+    assert docstore.search("a-0").page_content == documents[1].page_content
+
+def test_empty_and_inconsistent_stores(tmp_path):
+    ChunkStore.write(str(tmp_path), [], [])
+    assert len(ChunkStore(str(tmp_path))) == 0
+
+    ChunkStore.write(str(tmp_path), ["a"], [Document(page_content="text")])
+    with open(tmp_path / ChunkStore.TEXT_FILE, "ab") as f:
+        f.write(b"garbage")
+    with pytest.raises(ValueError):
+        ChunkStore(str(tmp_path))
+    assert len(ChunkStore.remove(str(tmp_path))) == len(ChunkStore.FILE_NAMES)
+    assert not ChunkStore.exists(str(tmp_path))
+
+def test_vector_store_searches_through_the_chunk_store(tmp_path):
+    texts = [f"document number {i}" for i in range(50)]
+    store = FAISS.from_texts(texts, FakeEmbeddings(size=8), metadatas=[{"i": i} for i in range(50)])
+    save_vector_store(str(tmp_path), store)
+
+    index, docstore, mapping = read_vector_store_files(str(tmp_path))
+    loaded = FAISS(FakeEmbeddings(size=8), index, docstore, mapping)
+    query = store.index.reconstruct(7).reshape(1, -1)
+    # Same neighbours from the original and the chunk store backed vector store
+    assert loaded.similarity_search_by_vector(query[0].tolist(), k=3) == store.similarity_search_by_vector(query[0].tolist(), k=3)
@@ -0,0 +1,41 @@
+from langchain_core.documents import Document
+
+from utilities.context_packer import ContextPacker, count_tokens, overlap_length
+
+PAGE = {"source": "manual.pdf", "page": 3}
+TEXT = " ".join(f"sentence {i} of the manual." for i in range(200))
+
+def chunk(start: int, end: int, metadata=PAGE) -> Document:
+    return Document(page_content=TEXT[start:end], metadata=metadata)
+
+def test_overlapping_neighbours_are_merged():
+    assert overlap_length("abcdefghij" * 3, "ghij" * 10, 50, min_overlap=4) == 4
+    assert overlap_length("abc", "xyz", 50, min_overlap=1) == 0
+
+    # Split with a 200 character overlap, retrieved out of order plus an unrelated page
+    first, second, other = chunk(0, 1000), chunk(800, 1600), chunk(0, 300, {"source": "other.pdf", "page": 1})
+    packer = ContextPacker(token_budget=10_000, max_overlap=400)
+    packed, report = packer.pack([second, other, first])
+
+    assert [document.page_content for document in packed] == [TEXT[0:1600], TEXT[0:300]]
+    assert report.chunks_in == 3 and report.chunks_out == 2
+    assert report.tokens_saved == report.tokens_in - report.tokens_out > 0
+
+def test_adaptive_k_drops_weak_chunks_but_keeps_the_best():
+    documents = [chunk(0, 100), chunk(2000, 2100), chunk(3000, 3100, {"page": 9})]
+    packer = ContextPacker(token_budget=10_000, max_score_gap=0.1)
+    packed, _ = packer.pack(documents, scores=[0.82, 0.78, 0.55])
+    assert packed == documents[:2]
+
+    packed, _ = ContextPacker(token_budget=10_000, min_score=0.9).pack(documents, scores=[0.82, 0.78, 0.55])
+    assert packed == documents[:1]
+
+def test_budget_truncates_the_last_chunk():
+    documents = [chunk(0, 400), chunk(2000, 2400, {"page": 4}), chunk(3000, 3400, {"page": 5})]
+    budget = count_tokens(documents[0].page_content) + 30
+    packed, report = ContextPacker(token_budget=budget).pack(documents)
+
+    assert packed[0] == documents[0]
+    assert len(packed) == 2 and documents[1].page_content.startswith(packed[1].page_content)
+    assert report.tokens_out <= budget
+    assert report.tokens_saved > 0
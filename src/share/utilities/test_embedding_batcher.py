@@ -0,0 +1,45 @@
+import asyncio
+import pytest
+
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+from utilities.chatbot_faiss import SimpleOpenAIEmbeddings
+from utilities.embedding_batcher import EmbeddingBatcher
+
+@pytest.mark.asyncio
+async def test_concurrent_queries_share_one_request():
+    embeddings = SimpleOpenAIEmbeddings(api_key="test", batch_window_ms=20, batch_max_size=64)
+    embeddings.async_client = AsyncMock()
+    embeddings.async_client.embeddings.create.side_effect = lambda model, input: SimpleNamespace(
+        data=[SimpleNamespace(embedding=[float(len(text)), 1.0]) for text in input]
+    )
+
+    texts = [f"question {'?' * i}" for i in range(40)] + ["question "]
+    vectors = await asyncio.gather(*(embeddings.aembed_query(text) for text in texts))
+
+    assert embeddings.async_client.embeddings.create.await_count == 1
+    assert len(embeddings.async_client.embeddings.create.call_args.kwargs["input"]) == 40
+    assert vectors[0] == vectors[-1]
+    assert vectors[1] != vectors[2]
+    stats = embeddings.batcher.stats()
+    assert stats["batches"] == 1 and stats["max_batch_size"] == 41
+
+@pytest.mark.asyncio
+async def test_batches_flush_at_max_size_and_propagate_errors():
+    calls = []
+
+    async def embed_batch(texts):
+        calls.append(list(texts))
+        if "bad" in texts:
+            raise RuntimeError("API down")
+        return [[float(len(text))] for text in texts]
+
+    batcher = EmbeddingBatcher(embed_batch, max_wait_ms=1000, max_batch_size=3)
+    results = await asyncio.wait_for(asyncio.gather(*(batcher.embed(t) for t in ["a", "bb", "ccc"])), timeout=0.5)
+    assert results == [[1.0], [2.0], [3.0]]
+
+    with pytest.raises(RuntimeError, match="API down"):
+        await asyncio.gather(*(batcher.embed(t) for t in ["x", "bad", "y"]))
+    assert calls == [["a", "bb", "ccc"], ["x", "bad", "y"]]
+    assert batcher.stats()["avg_batch_size"] == 3
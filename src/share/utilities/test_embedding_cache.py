@@ -0,0 +1,70 @@
+import threading
+import numpy as np
+import pytest
+
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+from utilities.chatbot_faiss import SimpleOpenAIEmbeddings
+from utilities.embedding_cache import EmbeddingCache
+
+def fake_response(texts):
+    # Deterministic 4-d vectors derived from text length
+    return SimpleNamespace(data=[SimpleNamespace(embedding=[len(t), 1.0, 0.0, 0.0]) for t in texts])
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache" / "embeddings.sqlite3"))
+    yield cache
+    cache.close()
+
+def test_cache_roundtrip_is_keyed_by_model(cache):
+    cache.put_many("model-a", ["hello"], [[1.0, 2.0]])
+    assert np.array_equal(cache.get_many("model-a", ["hello"])[0], np.array([1.0, 2.0], dtype=np.float32))
+    assert cache.get_many("model-b", ["hello"]) == [None]
+    assert cache.get_many("model-a", ["other"]) == [None]
+    assert len(cache) == 1
+
+def test_only_cache_misses_reach_the_api(cache):
+    embeddings = SimpleOpenAIEmbeddings(api_key="test", cache=cache)
+    embeddings.client = MagicMock()
+    embeddings.client.embeddings.create.side_effect = lambda model, input: fake_response(input)
+
+    first = embeddings.embed_documents(["a", "bb", "ccc"])
+    second = embeddings.embed_documents(["bb", "dddd", "a"])
+
+    sent = [call.kwargs["input"] for call in embeddings.client.embeddings.create.call_args_list]
+    assert sent == [["a", "bb", "ccc"], ["dddd"]]
+    assert second[0] == first[1] and second[2] == first[0]
+    assert np.isclose(np.linalg.norm(second[1]), 1.0)
+
+    # Queries always go to the API and never grow the table
+    assert embeddings.embed_query("ccc") == first[2]
+    assert embeddings.embed_query("eeeee") and len(cache) == 4
+    assert embeddings.client.embeddings.create.call_count == 4
+
+@pytest.mark.asyncio
+async def test_async_lookups_run_off_the_event_loop(cache, monkeypatch):
+    embeddings = SimpleOpenAIEmbeddings(api_key="test", cache=cache)
+    embeddings.async_client = AsyncMock()
+    embeddings.async_client.embeddings.create.side_effect = lambda model, input: fake_response(input)
+    loop_thread = threading.get_ident()
+    cache_threads = []
+    get_many, put_many = cache.get_many, cache.put_many
+
+    def record(method):
+        def wrapper(*args):
+            cache_threads.append(threading.get_ident())
+            return method(*args)
+        return wrapper
+
+    monkeypatch.setattr(cache, "get_many", record(get_many))
+    monkeypatch.setattr(cache, "put_many", record(put_many))
+
+    first = await embeddings.aembed_documents(["a", "bb"])
+    assert await embeddings.aembed_documents(["bb", "a"]) == first[::-1]
+    assert len(cache_threads) == 3 and loop_thread not in cache_threads
+
+    assert await embeddings.aembed_query("a") == first[0]
+    assert len(cache_threads) == 3 and len(cache) == 2
+    assert embeddings.async_client.embeddings.create.await_count == 2
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from utilities.faiss_index_factory import FaissIndexSettings
+
+@pytest.fixture
+def vectors():
+    rng = np.random.default_rng(0)
+    data = rng.standard_normal((2000, 32)).astype("float32")
+    return data / np.linalg.norm(data, axis=1, keepdims=True)
+
+@pytest.mark.parametrize("settings, expected", [
+    (FaissIndexSettings("Flat"), "Flat"),
+    (FaissIndexSettings("IVFFlat", nlist=16), "IVF16,Flat"),
+    (FaissIndexSettings("IVFPQ", nlist=16, pq_m=8, pq_nbits=4), "IVF16,PQ8x4"),
+    (FaissIndexSettings("HNSW", hnsw_m=16), "HNSW16"),
+])
+def test_built_indexes_find_exact_neighbours(vectors, settings, expected):
+    assert settings.factory_string(32, len(vectors)) == expected
+    index = settings.build_index(vectors)
+    index.add(vectors)
+    _, ids = index.search(vectors[:20], 1)
+    # Approximate indexes may miss a few, but the query itself should almost always be top-1
+    assert (ids[:, 0] == np.arange(20)).mean() >= 0.9
+
+def test_small_corpora_shrink_or_fall_back():
+    assert FaissIndexSettings("IVFFlat", nlist=256).factory_string(32, 390) == "IVF10,Flat"
+    assert FaissIndexSettings("IVFPQ", nlist=4, pq_m=8).factory_string(32, 100) == "IVF2,Flat"
+    with pytest.raises(ValueError):
+        FaissIndexSettings("IVFPQ", pq_m=7).factory_string(32, 5000)
+    with pytest.raises(ValueError):
+        FaissIndexSettings("Annoy")
+
+def test_settings_persist_and_search_params_apply(tmp_path, vectors):
+    settings = FaissIndexSettings("IVFFlat", nlist=16, nprobe=4)
+    index = settings.build_index(vectors)
+    settings.save(str(tmp_path), index)
+
+    loaded = FaissIndexSettings.load(str(tmp_path))
+    assert loaded == settings
+    assert settings.same_build(FaissIndexSettings("IVFFlat", nlist=16, nprobe=8))
+    assert not settings.same_build(FaissIndexSettings("IVFFlat", nlist=32))
+    assert FaissIndexSettings().same_build(None)
+
+    FaissIndexSettings("IVFFlat", nprobe=8).apply_search_params(index)
+    assert index.nprobe == 8
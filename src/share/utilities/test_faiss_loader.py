@@ -0,0 +1,75 @@
+import os
+import time
+
+import faiss
+import numpy as np
+import pytest
+
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.embeddings import FakeEmbeddings
+from langchain_community.vectorstores import FAISS
+
+from utilities import faiss_loader
+from utilities.faiss_index_factory import FaissIndexSettings
+from utilities.chunk_store import ChunkStore
+from utilities.faiss_loader import get_preloaded, memory_usage, preload_vector_store, read_vector_store_files, \
+                                    save_vector_store
+
+@pytest.fixture
+def persisted_store(tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((300, 16)).astype("float32")
+    index = FaissIndexSettings("IVFFlat", nlist=8).build_index(vectors)
+    store = FAISS(FakeEmbeddings(size=16), index, InMemoryDocstore(), {})
+    store.add_embeddings(
+        text_embeddings=[(f"chunk {i}", vector.tolist()) for i, vector in enumerate(vectors)],
+        ids=[f"id-{i}" for i in range(len(vectors))]
+    )
+    save_vector_store(str(tmp_path), store)
+    yield str(tmp_path), vectors
+    faiss_loader._preloaded.clear()
+
+def test_mmap_load_returns_the_same_results(persisted_store):
+    folder, vectors = persisted_store
+    index, docstore, mapping = read_vector_store_files(folder)
+    mmap_index, _, mmap_mapping = read_vector_store_files(folder, mmap=True)
+
+    assert mmap_index.ntotal == index.ntotal == len(vectors)
+    assert mmap_mapping == mapping
+    assert isinstance(docstore, ChunkStore)
+    assert docstore.search(mapping[0]).page_content == "chunk 0"
+    for loaded in (index, mmap_index):
+        loaded.nprobe = 8
+    np.testing.assert_array_equal(index.search(vectors[:5], 3)[1], mmap_index.search(vectors[:5], 3)[1])
+
+def test_preloaded_store_is_reused_until_files_change(persisted_store):
+    folder, _ = persisted_store
+    assert get_preloaded(folder) is None
+    assert preload_vector_store(folder)
+    first = get_preloaded(folder)
+    assert first is not None and get_preloaded(folder + os.sep) is first
+
+    # A rebuild rewrites the files, so the preloaded copy must not be served any more
+    later = time.time() + 10
+    os.utime(os.path.join(folder, ChunkStore.OFFSETS_FILE), (later, later))
+    assert get_preloaded(folder) is None
+
+def test_preload_without_index_and_memory_report(tmp_path):
+    assert not preload_vector_store(str(tmp_path))
+    usage = memory_usage()
+    assert usage["pid"] == os.getpid()
+    assert usage.get("rss_mb", usage.get("max_rss_mb")) > 0
+
+def test_legacy_pickle_is_read_and_replaced_on_save(persisted_store):
+    folder, vectors = persisted_store
+    index, docstore, mapping = read_vector_store_files(folder, writable=True)
+    legacy = FAISS(FakeEmbeddings(size=16), index, docstore, mapping)
+    ChunkStore.remove(folder)
+    legacy.save_local(folder)
+
+    _, legacy_docstore, _ = read_vector_store_files(folder)
+    assert not isinstance(legacy_docstore, ChunkStore)
+    save_vector_store(folder, FAISS(FakeEmbeddings(size=16), *read_vector_store_files(folder)))
+    assert not os.path.exists(os.path.join(folder, "index.pkl"))
+    _, docstore, mapping = read_vector_store_files(folder)
+    assert isinstance(docstore, ChunkStore) and len(mapping) == len(vectors)
@@ -0,0 +1,149 @@
+import os
+import asyncio
+import numpy as np
+import pytest
+
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+
+from conftest import HashEmbeddings, make_indexing_chatbot
+from utilities.faiss_index_factory import FaissIndexSettings
+from utilities.index_versions import IndexVersions
+
+def write_file(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+def test_prepare_links_the_store_files_and_publish_prunes(tmp_path):
+    versions = IndexVersions(str(tmp_path), keep=2)
+    assert versions.current() is None and versions.directory() == str(tmp_path)
+    write_file(tmp_path / "index.faiss", "legacy")
+    write_file(tmp_path / "embedding_cache.sqlite3", "shared")
+    (tmp_path / "collections").mkdir()
+
+    version, staging = versions.prepare()
+    assert sorted(os.listdir(staging)) == ["index.faiss"]
+    assert os.stat(os.path.join(staging, "index.faiss")).st_ino == os.stat(tmp_path / "index.faiss").st_ino
+    assert versions.current() is None
+    assert versions.publish(version) == versions.directory()
+    assert versions.current() == version
+
+    published = [version]
+    for _ in range(3):
+        version, staging = versions.prepare()
+        published.append(version)
+        versions.publish(version)
+    assert versions.versions() == sorted(published)[-2:]
+
+    version, staging = versions.prepare()
+    versions.discard(version)
+    assert not os.path.exists(staging) and versions.current() == published[-1]
+
+def texts(vector_store):
+    ids = vector_store.index_to_docstore_id.values()
+    return sorted(vector_store.docstore.search(chunk_id).page_content for chunk_id in ids)
+
+def test_rebuild_publishes_a_new_version_and_workers_follow(tmp_path):
+    pdf_dir, persist_dir = tmp_path / "pdfs", tmp_path / "index"
+    pdf_dir.mkdir()
+    write_file(pdf_dir / "a.pdf", "a1\na2")
+    worker = make_indexing_chatbot(pdf_dir, persist_dir)
+    first = worker.rebuild_vector_store()
+    assert worker.loaded_version == first and worker.store_directory == worker.index_versions.directory(first)
+
+    other = make_indexing_chatbot(pdf_dir, persist_dir)
+    other.vector_store = other.initialize_vector_store()
+    assert other.loaded_version == first and texts(other.vector_store) == ["a1", "a2"]
+
+    # The live version keeps answering while and after the next one is built
+    live = worker.vector_store
+    write_file(pdf_dir / "b.pdf", "b1")
+    second = worker.rebuild_vector_store()
+    assert second != first and texts(worker.vector_store) == ["a1", "a2", "b1"]
+    assert texts(live) == ["a1", "a2"]
+    assert os.path.exists(os.path.join(worker.index_versions.directory(first), "index.faiss"))
+
+    assert other.reload_published_version()
+    assert other.loaded_version == second and texts(other.vector_store) == ["a1", "a2", "b1"]
+    assert not other.reload_published_version()
+
+def test_failed_build_keeps_the_live_version(tmp_path):
+    pdf_dir, persist_dir = tmp_path / "pdfs", tmp_path / "index"
+    pdf_dir.mkdir()
+    write_file(pdf_dir / "a.pdf", "a1")
+    worker = make_indexing_chatbot(pdf_dir, persist_dir)
+    version = worker.rebuild_vector_store()
+    live, live_directory = worker.vector_store, worker.store_directory
+
+    os.remove(pdf_dir / "a.pdf")
+    with pytest.raises(FileNotFoundError):
+        worker.rebuild_vector_store()
+    worker.initialize_qa_chains.side_effect = RuntimeError("chains failed")
+    write_file(pdf_dir / "b.pdf", "b1")
+    with pytest.raises(RuntimeError):
+        worker.rebuild_vector_store(full=True)
+
+    assert worker.index_versions.current() == version
+    assert worker.vector_store is live and worker.store_directory == live_directory
+    assert os.listdir(worker.index_versions.versions_directory) == [version]
+
+def stub_chains():
+    llm = SimpleNamespace(aclose=AsyncMock())
+    return {"CLAUDE": SimpleNamespace(combine_documents_chain=SimpleNamespace(llm_chain=SimpleNamespace(llm=llm)))}
+
+def closed(qa_chains):
+    return qa_chains["CLAUDE"].combine_documents_chain.llm_chain.llm.aclose.await_count
+
+@pytest.mark.asyncio
+async def test_swapped_out_chains_are_closed(tmp_path):
+    pdf_dir, persist_dir = tmp_path / "pdfs", tmp_path / "index"
+    pdf_dir.mkdir()
+    write_file(pdf_dir / "a.pdf", "a1")
+    worker = make_indexing_chatbot(pdf_dir, persist_dir)
+    worker.closing_tasks = {}
+    worker.collections = None
+    first, second, third = stub_chains(), stub_chains(), stub_chains()
+    worker.initialize_qa_chains.side_effect = [first, second, third]
+    worker.rebuild_vector_store()
+    worker.rebuild_vector_store(full=True)
+    assert worker.retired_chains == [first]
+
+    # Requests that already hold the old chains get a grace period
+    worker.close_retired_chains(delay=0.05)
+    assert worker.retired_chains == [] and closed(first) == 0
+    await asyncio.sleep(0.1)
+    assert closed(first) == 1 and not worker.closing_tasks
+
+    # Shutdown closes pending and live chains right away
+    worker.rebuild_vector_store(full=True)
+    worker.close_retired_chains()
+    await worker.aclose()
+    assert (closed(first), closed(second), closed(third)) == (1, 1, 1)
+    assert not worker.closing_tasks
+
+def test_validation_rejects_rows_without_chunks(tmp_path):
+    # What an in-place update of an IVF index used to produce: remove_ids keeps the ids of the remaining
+    # vectors while the mapping is renumbered, so the next add reuses ids still in the lists
+    embeddings = HashEmbeddings()
+    texts_ = [f"chunk {i}" for i in range(80)]
+    vectors = np.array(embeddings.embed_documents(texts_), dtype=np.float32)
+    index = FaissIndexSettings(index_type="IVFFlat", nlist=2).build_index(vectors)
+    store = FAISS(embeddings, index, InMemoryDocstore(), {})
+    store.add_embeddings(zip(texts_, vectors.tolist()), ids=[f"id{i}" for i in range(80)])
+    store.delete([f"id{i}" for i in range(40)])
+    store.add_texts([f"new {i}" for i in range(30)], ids=[f"new{i}" for i in range(30)])
+    assert store.index.ntotal == len(store.index_to_docstore_id) == 70
+
+    bot = make_indexing_chatbot(tmp_path, tmp_path)
+    # IVF cannot reconstruct after remove_ids; the probe falls back to embedding the first chunk
+    assert bot.probe_vector(store).tolist() == [embeddings.embed_query("chunk 40")]
+    # Rows 70-79 are still in the lists but no longer in the mapping
+    bot.probe_vector = MagicMock(return_value=np.array([embeddings.embed_query("chunk 75")], dtype=np.float32))
+    with pytest.raises(ValueError, match="has no chunk"):
+        bot.validate_vector_store(store)
+
+    healthy = FAISS.from_texts(texts_, embeddings, ids=[f"id{i}" for i in range(80)])
+    bot = make_indexing_chatbot(tmp_path, tmp_path)
+    bot.validate_vector_store(healthy)
@@ -0,0 +1,112 @@
+import os
+import pytest
+
+from utilities.bm25_index import BM25Index
+from utilities.chunk_store import chunk_ids_digest
+from utilities.faiss_index_factory import FaissIndexSettings
+from utilities.ingestion_manifest import IngestionManifest
+
+def write_pdf(directory, name, text):
+    with open(os.path.join(directory, name), "w", encoding="utf-8") as f:
+        f.write(text)
+
+def test_diff_detects_new_changed_and_removed_files(tmp_path):
+    pdf_dir, persist_dir = tmp_path / "pdfs", tmp_path / "index"
+    pdf_dir.mkdir()
+    write_pdf(pdf_dir, "a.pdf", "alpha")
+    write_pdf(pdf_dir, "b.pdf", "bravo")
+
+    manifest = IngestionManifest(str(persist_dir))
+    changed, removed = manifest.diff(str(pdf_dir), ["a.pdf", "b.pdf"])
+    assert list(changed) == ["a.pdf", "b.pdf"] and removed == []
+    for name, info in changed.items():
+        manifest.record(name, info, IngestionManifest.chunk_ids(name, info, 2))
+    manifest.save()
+
+    reloaded = IngestionManifest.load(str(persist_dir))
+    write_pdf(pdf_dir, "b.pdf", "bravo v2")
+    write_pdf(pdf_dir, "c.pdf", "charlie")
+    os.remove(pdf_dir / "a.pdf")
+    changed, removed = reloaded.diff(str(pdf_dir), ["b.pdf", "c.pdf"])
+    assert list(changed) == ["b.pdf", "c.pdf"]
+    assert removed == ["a.pdf"]
+    assert len(reloaded.forget("a.pdf")) == 2
+
+def test_chunk_ids_are_deterministic_and_file_scoped():
+    info = {"sha256": "0" * 64}
+    assert IngestionManifest.chunk_ids("a.pdf", info, 2) == IngestionManifest.chunk_ids("a.pdf", info, 2)
+    assert IngestionManifest.chunk_ids("a.pdf", info, 1) != IngestionManifest.chunk_ids("b.pdf", info, 1)
+
+def stored_texts(bot):
+    return sorted(doc.page_content for doc in bot.vector_store.docstore._dict.values())
+
+def test_rebuild_only_processes_changed_pdfs(chatbot):
+    write_pdf(chatbot.pdf_directory_path, "a.pdf", "a1\na2")
+    write_pdf(chatbot.pdf_directory_path, "b.pdf", "b1")
+    chatbot.rebuild_vector_store()
+    assert chatbot.parsed == ["a.pdf", "b.pdf"]
+    assert stored_texts(chatbot) == ["a1", "a2", "b1"]
+
+    chatbot.parsed.clear()
+    write_pdf(chatbot.pdf_directory_path, "b.pdf", "b1 changed")
+    write_pdf(chatbot.pdf_directory_path, "c.pdf", "c1")
+    os.remove(os.path.join(chatbot.pdf_directory_path, "a.pdf"))
+    chatbot.rebuild_vector_store()
+
+    assert chatbot.parsed == ["b.pdf", "c.pdf"]
+    assert stored_texts(chatbot) == ["b1 changed", "c1"]
+    assert chatbot.vector_store.index.ntotal == 2
+    # The keyword index follows the incremental update
+    sparse_index = BM25Index.load(chatbot.store_directory)
+    assert sorted(sparse_index.chunk_ids) == sorted(chatbot.vector_store.index_to_docstore_id.values())
+    assert chatbot.vector_store.docstore.search(sparse_index.search("changed", 1)[0][0]).page_content == "b1 changed"
+
+    chatbot.parsed.clear()
+    chatbot.rebuild_vector_store()
+    assert chatbot.parsed == []
+
+def test_persisted_keyword_index_is_matched_by_chunk_ids_digest(chatbot, monkeypatch):
+    write_pdf(chatbot.pdf_directory_path, "a.pdf", "a1\na2")
+    chatbot.rebuild_vector_store()
+    loaded = chatbot.load_vector_store()
+    saved = BM25Index.load(chatbot.store_directory)
+    assert saved.ids_digest == chunk_ids_digest(loaded) == chunk_ids_digest(chatbot.vector_store)
+
+    # Matching count and digest: the saved index is used as is
+    monkeypatch.setattr(BM25Index, "from_vector_store", classmethod(lambda cls, store: pytest.fail("rebuilt")))
+    assert chatbot.load_sparse_index(loaded).chunk_ids == saved.chunk_ids
+
+    # Same count, different ids: rebuilt
+    monkeypatch.undo()
+    saved.ids_digest = "0" * 40
+    saved.save(chatbot.store_directory)
+    assert chatbot.load_sparse_index(loaded).ids_digest == chunk_ids_digest(loaded)
+    assert BM25Index.load(chatbot.store_directory).ids_digest == chunk_ids_digest(loaded)
+
+@pytest.mark.parametrize("settings", [
+    FaissIndexSettings(),
+    FaissIndexSettings(vector_encoding="int8"),
+    FaissIndexSettings(vector_encoding="pca", pca_dimension=4),
+    FaissIndexSettings(index_type="IVFFlat", nlist=2),
+    FaissIndexSettings(index_type="IVFPQ", nlist=2, pq_m=2, pq_nbits=2),
+    FaissIndexSettings(index_type="HNSW", hnsw_m=8),
+], ids=lambda settings: f"{settings.index_type}-{settings.vector_encoding}")
+def test_changed_pdf_keeps_every_index_type_searchable(chatbot, settings):
+    chatbot.index_settings = settings
+    write_pdf(chatbot.pdf_directory_path, "a.pdf", "\n".join(f"a{i}" for i in range(40)))
+    write_pdf(chatbot.pdf_directory_path, "b.pdf", "\n".join(f"b{i}" for i in range(40)))
+    chatbot.rebuild_vector_store()
+
+    chatbot.parsed.clear()
+    write_pdf(chatbot.pdf_directory_path, "b.pdf", "\n".join(f"b{i} changed" for i in range(40)))
+    chatbot.rebuild_vector_store()
+
+    # Only Flat storage compacts rows on removal the way the docstore mapping expects; the others rebuild
+    assert chatbot.parsed == (["b.pdf"] if settings.index_type == "Flat" else ["a.pdf", "b.pdf"])
+    vector_store = chatbot.vector_store
+    texts = [f"a{i}" for i in range(40)] + [f"b{i} changed" for i in range(40)]
+    assert stored_texts(chatbot) == sorted(texts)
+    assert vector_store.index.ntotal == len(vector_store.index_to_docstore_id) == 80
+    results = vector_store.similarity_search_with_score_by_vector(chatbot.embeddings.embed_query("b1"), k=10)
+    assert len(results) == 10 and all(document.page_content in texts for document, _ in results)
+    assert FaissIndexSettings.load(chatbot.store_directory).index_type == settings.index_type
@@ -0,0 +1,80 @@
+import os
+import asyncio
+import pytest
+
+from unittest.mock import AsyncMock
+
+from utilities.chatbot_faiss import ChatbotFAISS
+from utilities.knowledge_bases import KnowledgeBases
+
+class StubCollectionBot:
+    def __init__(self, name, persist_root, size_mb, loads):
+        self.name = name
+        self.folder = os.path.join(persist_root, name)
+        self.store_directory = self.folder
+        self.size_mb = size_mb
+        self.loads = loads
+
+    def initialize(self):
+        self.loads.append(self.name)
+        os.makedirs(self.folder, exist_ok=True)
+        with open(os.path.join(self.folder, "index.faiss"), "wb") as f:
+            f.write(b"\0" * int(self.size_mb * 1024 * 1024))
+
+    async def process_query(self, user_id, topic_id, user_query, **kwargs):
+        return {"msg": "success", "data": {"answer": f"{self.name}: {user_query}", "type_res": "generate"}}
+
+@pytest.fixture
+def knowledge_bases(tmp_path):
+    pdf_root, persist_root = tmp_path / "collections", tmp_path / "index"
+    for name in ("hr", "legal", "sales"):
+        (pdf_root / name).mkdir(parents=True)
+    loads = []
+    bases = KnowledgeBases(
+        factory=lambda name: StubCollectionBot(name, str(persist_root), 1.0, loads),
+        pdf_root=str(pdf_root), persist_root=str(persist_root), memory_budget_mb=2.5,
+        on_unload=lambda bot: bases.unloaded.append(bot)
+    )
+    bases.load_log = loads
+    bases.unloaded = []
+    return bases
+
+@pytest.mark.asyncio
+async def test_collections_load_once_and_evict_least_recently_used(knowledge_bases):
+    assert knowledge_bases.names() == ["hr", "legal", "sales"]
+    first = await asyncio.gather(*(knowledge_bases.get("hr") for _ in range(5)))
+    assert all(bot is first[0] for bot in first)
+    assert knowledge_bases.load_log == ["hr"]
+
+    await knowledge_bases.get("legal")
+    await knowledge_bases.get("hr")  # hr is now the most recently used
+    await knowledge_bases.get("sales")  # 3 MB > 2.5 MB budget: legal goes
+    assert list(knowledge_bases.loaded) == ["hr", "sales"]
+    stats = knowledge_bases.stats()
+    assert stats["evictions"] == 1 and stats["memory_mb"] == pytest.approx(2.0)
+
+    await knowledge_bases.get("legal")
+    assert knowledge_bases.load_log == ["hr", "legal", "sales", "legal"]
+    assert [bot.name for bot in knowledge_bases.unloaded] == ["legal", "hr"]
+    assert knowledge_bases.drop("sales") and not knowledge_bases.drop("sales")
+    assert [bot.name for bot in knowledge_bases.unloaded] == ["legal", "hr", "sales"]
+
+@pytest.mark.asyncio
+async def test_collection_names_are_validated(knowledge_bases):
+    for name in ("../etc", "", "missing"):
+        with pytest.raises(ValueError):
+            await knowledge_bases.get(name)
+
+@pytest.mark.asyncio
+async def test_process_query_routes_to_the_collection(knowledge_bases):
+    chatbot = ChatbotFAISS.__new__(ChatbotFAISS)
+    chatbot.collection = None
+    chatbot.collections = knowledge_bases
+    chatbot.qa_chains = {}
+    chatbot.retired_chains = []
+    chatbot.cache_controller = AsyncMock()
+
+    result = await chatbot.process_query("dev_test007", "topic", "leave policy?", model_choice="GPT", collection="hr")
+    assert result["data"]["answer"] == "hr: leave policy?"
+    result = await chatbot.process_query("dev_test007", "topic", "leave policy?", model_choice="GPT", collection="nope")
+    assert result["error_code"] == "06"
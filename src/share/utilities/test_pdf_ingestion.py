@@ -0,0 +1,57 @@
+import pytest
+
+from utilities.pdf_ingestion import PDFIngestionPool, split_pdf_pages
+
+def write_text_pdf(path, pages):
+    """Writes a minimal PDF with one text line per entry in `pages`."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for text in pages:
+        lines = b"".join(b"(%s) Tj 0 -14 Td " % line.encode("latin-1") for line in text.splitlines())
+        stream = b"BT /F1 12 Tf 72 720 Td " + lines + b"ET"
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects))
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % i for i in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    body, offsets = b"%PDF-1.4\n", []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(body))
+        body += b"%d 0 obj\n%s\nendobj\n" % (number, obj)
+    xref = len(body)
+    body += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    body += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    body += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    path.write_bytes(body)
+
+@pytest.fixture
+def pdf_paths(tmp_path):
+    paths = []
+    for name, page_count in (("a.pdf", 5), ("b.pdf", 2)):
+        path = tmp_path / name
+        write_text_pdf(path, [f"{name} page {i}\nsecond line {i}" for i in range(page_count)])
+        paths.append(str(path))
+    return paths
+
+def test_page_ranges_chunk_like_whole_file(pdf_paths):
+    _, whole = split_pdf_pages(pdf_paths[0], 0, None, 20, 0)
+    _, first = split_pdf_pages(pdf_paths[0], 0, 2, 20, 0)
+    _, rest = split_pdf_pages(pdf_paths[0], 2, None, 20, 0)
+    assert whole == first + rest
+    assert [doc.metadata["page"] for doc in whole] == sorted(doc.metadata["page"] for doc in whole)
+
+def test_parallel_split_is_deterministic_and_reports_stats(pdf_paths):
+    serial = PDFIngestionPool(max_workers=1, chunk_size=20, chunk_overlap=0)
+    parallel = PDFIngestionPool(max_workers=2, pages_per_task=2, chunk_size=20, chunk_overlap=0)
+
+    assert len(parallel.plan_tasks(pdf_paths)) == 4
+    expected = serial.split_pdfs(pdf_paths)
+    assert parallel.split_pdfs(pdf_paths) == expected
+    assert list(expected) == pdf_paths
+    assert "a.pdf page 0" in expected[pdf_paths[0]][0].page_content
+
+    stats = parallel.last_stats
+    assert (stats.files, stats.pages, stats.chunks) == (2, 7, 14)
+    assert stats.pages_per_sec > 0 and stats.chunks_per_sec > 0
@@ -0,0 +1,39 @@
+import pytest
+
+from unittest.mock import AsyncMock
+
+from utilities.query_condenser import QueryCondenser
+
+HISTORY = [
+    {"sender": "user", "message": "What is the warranty on the AP-7731 dishwasher?"},
+    {"sender": "bot", "message": "Two years on parts and labour."},
+    {"sender": "user", "message": "And for the pump?"},
+    {"sender": "bot", "message": "Five years."},
+]
+
+@pytest.mark.asyncio
+async def test_first_question_is_used_as_is():
+    for mode in ("question", "recent", "llm"):
+        assert await QueryCondenser(mode).condense([], "  What is the warranty? ") == "What is the warranty?"
+
+@pytest.mark.asyncio
+async def test_recent_mode_keeps_the_previous_user_questions_within_the_limits():
+    assert await QueryCondenser("question").condense(HISTORY, "Is it extendable?") == "Is it extendable?"
+    assert await QueryCondenser("recent").condense(HISTORY, "Is it extendable?") == "And for the pump?\nIs it extendable?"
+    two_turns = await QueryCondenser("recent", history_turns=2).condense(HISTORY, "Is it extendable?")
+    assert two_turns.splitlines() == [HISTORY[0]["message"], "And for the pump?", "Is it extendable?"]
+    # Older questions are dropped first when the query would get too long
+    short = await QueryCondenser("recent", history_turns=2, max_chars=40).condense(HISTORY, "Is it extendable?")
+    assert short == "And for the pump?\nIs it extendable?"
+
+@pytest.mark.asyncio
+async def test_llm_mode_rewrites_and_falls_back_to_recent():
+    llm = AsyncMock()
+    llm.ainvoke = AsyncMock(return_value=" Is the AP-7731 pump warranty extendable?\n")
+    condenser = QueryCondenser("llm", llm=llm)
+    assert await condenser.condense(HISTORY, "Is it extendable?") == "Is the AP-7731 pump warranty extendable?"
+    prompt = llm.ainvoke.await_args.args[0]
+    assert "Bot: Five years." in prompt and "Two years" not in prompt
+
+    llm.ainvoke = AsyncMock(side_effect=RuntimeError("rate limited"))
+    assert await condenser.condense(HISTORY, "Is it extendable?") == "And for the pump?\nIs it extendable?"
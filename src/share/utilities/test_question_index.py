@@ -0,0 +1,56 @@
+import time
+
+import numpy as np
+import pytest
+
+from utilities.question_index import QuestionIndex, features
+
+def reference_similarities(questions, query):
+    """Cosine similarities computed densely, to check the postings against."""
+    vectors = [features(question) for question in questions]
+    query_vector = features(query)
+    return [sum(weight * vector.get(term, 0.0) for term, weight in query_vector.items()) for vector in vectors]
+
+@pytest.mark.parametrize("merge_every", [1, 3, 1000])
+def test_search_matches_dense_cosine(merge_every):
+    rng = np.random.default_rng(0)
+    words = [f"w{i}" for i in range(40)]
+    questions = [" ".join(rng.choice(words, size=rng.integers(2, 8))) for _ in range(200)]
+    index = QuestionIndex(merge_every=merge_every)
+    for question in questions:
+        index.add(question)
+    for query in questions[:20] + ["w1 w2 w3", "nothing matches"]:
+        expected = reference_similarities(index.questions, query)
+        best, similarity = index.search(query)
+        if max(expected) <= 0:
+            assert best is None
+        else:
+            assert similarity == pytest.approx(max(expected), abs=1e-5)
+            assert expected[index.questions.index(best)] == pytest.approx(max(expected), abs=1e-5)
+
+def test_exact_match_and_removal():
+    index = QuestionIndex(merge_every=2)
+    index.add_many(["What is the fee?", "Where is the office?", "What are the opening hours?"])
+    assert not index.add("what is the FEE?")
+    assert index.search("WHAT IS THE FEE?") == ("What is the fee?", 1.0)
+    assert index.search("?!") == (None, 0.0)
+
+    assert index.remove("What is the fee?") and not index.remove("What is the fee?")
+    best, similarity = index.search("what is the fee")
+    assert best != "What is the fee?" and similarity < 0.98
+    index.add("New question?")
+    assert len(index) == 3 and index.search("new question") == ("New question?", pytest.approx(1.0))
+
+def test_lookup_stays_fast_at_100k_questions():
+    rng = np.random.default_rng(1)
+    vocabulary = np.array([f"term{i}" for i in range(20000)] + ["what", "is", "the", "how", "do", "i"])
+    index = QuestionIndex()
+    index.add_many(" ".join(words) for words in rng.choice(vocabulary, size=(100000, 8)))
+    # Incremental inserts on top of the bulk load
+    for i in range(2000):
+        index.add(f"what is the term{i} of the how do i {i}")
+
+    start = time.perf_counter()
+    for i in range(200):
+        index.search(f"how do i term{i} what is the")
+    assert (time.perf_counter() - start) / 200 < 0.005
@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from unittest.mock import AsyncMock
+from langchain.chains import RetrievalQA
+from langchain.prompts import PromptTemplate
+from langchain_core.language_models.fake import FakeListLLM
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+
+from conftest import KeywordEmbeddings
+from utilities.chatbot_faiss import ChatbotFAISS
+from utilities.faiss_index_factory import FaissIndexSettings
+from utilities.hybrid_retriever import HybridRetriever
+from utilities.reranker import RerankingRetriever, mmr_select
+
+TEXTS = [
+    "warranty warranty repair",
+    "warranty warranty repair.",   # overlap copy of the first chunk
+    "warranty warranty repair!",   # and another
+    "warranty refund",
+    "shipping",
+]
+
+def test_mmr_prefers_new_information_over_duplicates():
+    vectors = np.array(KeywordEmbeddings().embed_documents(TEXTS))
+    query = np.array(KeywordEmbeddings().embed_query("warranty warranty repair refund"))
+    assert mmr_select(query, vectors, 2, lambda_mult=1.0) == [0, 1]
+    assert mmr_select(query, vectors, 2, lambda_mult=0.5) == [0, 3]
+    assert mmr_select(query, vectors[:0], 3) == []
+
+@pytest.mark.parametrize("settings", [FaissIndexSettings("Flat"), FaissIndexSettings("IVFFlat", nlist=2)])
+@pytest.mark.asyncio
+async def test_reranking_retriever_uses_stored_vectors(settings):
+    embeddings = KeywordEmbeddings()
+    vectors = np.array(embeddings.embed_documents(TEXTS), dtype=np.float32)
+    vector_store = FAISS(embeddings, settings.build_index(np.tile(vectors, (20, 1))), InMemoryDocstore(), {})
+    vector_store.add_embeddings(list(zip(TEXTS, vectors.tolist())), ids=[f"chunk-{i}" for i in range(len(TEXTS))])
+    settings.apply_search_params(vector_store.index)
+
+    candidates = HybridRetriever(vector_store=vector_store, k=5, fetch_k=5)
+    plain = RerankingRetriever(candidates=candidates, k=2)
+    mmr = RerankingRetriever(candidates=candidates, k=2, mode="mmr", lambda_mult=0.5)
+
+    query = "warranty warranty repair refund"
+    assert {d.page_content for d in await plain.ainvoke(query)} <= set(TEXTS[:3])
+    assert [d.id for d in await mmr.ainvoke(query)][1] == "chunk-3"
+    stored = mmr.stored_vectors([vector_store.docstore.search("chunk-3")])
+    np.testing.assert_allclose(stored[0], vectors[3], atol=1e-6)
+
+class RecordingLLM(FakeListLLM):
+    prompts: list = []
+
+    def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+        self.prompts.append(prompt)
+        return super()._call(prompt, stop, run_manager, **kwargs)
+
+    async def _acall(self, prompt, stop=None, run_manager=None, **kwargs):
+        return self._call(prompt, stop, **kwargs)
+
+@pytest.mark.asyncio
+async def test_compare_mode_searches_once_and_reranks_per_chain():
+    embeddings = KeywordEmbeddings()
+    vector_store = FAISS.from_texts(TEXTS, embeddings, ids=[f"chunk-{i}" for i in range(len(TEXTS))])
+    candidates = HybridRetriever(vector_store=vector_store, k=5, fetch_k=5)
+    prompt = PromptTemplate(input_variables=["context", "question"], template="{context}|{question}")
+    chains = {
+        model: RetrievalQA.from_chain_type(
+            llm=RecordingLLM(responses=[model], prompts=[]),
+            chain_type="stuff",
+            retriever=RerankingRetriever(candidates=candidates, k=2, mode=mode, lambda_mult=0.5),
+            chain_type_kwargs={"prompt": prompt}
+        )
+        for model, mode in (("GPT", "none"), ("CLAUDE", "mmr"))
+    }
+    chatbot = ChatbotFAISS.__new__(ChatbotFAISS)
+    chatbot.cache_controller = AsyncMock()
+
+    answers = await chatbot.compare_models("warranty warranty repair refund", chains)
+    assert {model: result["answer"] for model, result in answers.items()} == {"GPT": "GPT", "CLAUDE": "CLAUDE"}
+    assert embeddings.queries == 1
+    gpt_prompt, = chains["GPT"].combine_documents_chain.llm_chain.llm.prompts
+    claude_prompt, = chains["CLAUDE"].combine_documents_chain.llm_chain.llm.prompts
+    assert "warranty refund" not in gpt_prompt
+    assert "warranty refund" in claude_prompt
+
+@pytest.mark.asyncio
+async def test_packer_merges_duplicates_and_drops_weak_chunks():
+    from utilities.context_packer import ContextPacker
+
+    vector_store = FAISS.from_texts(TEXTS, KeywordEmbeddings(), ids=[f"chunk-{i}" for i in range(len(TEXTS))])
+    candidates = HybridRetriever(vector_store=vector_store, k=5, fetch_k=5)
+    retriever = RerankingRetriever(
+        candidates=candidates, k=5, packer=ContextPacker(token_budget=1000, max_score_gap=0.2), model="GPT"
+    )
+    documents = await retriever.ainvoke("warranty warranty repair")
+    # The chunk contained in its overlap copies is merged away; "refund" and "shipping" score far below the best
+    assert sorted(document.page_content for document in documents) == sorted(TEXTS[1:3])
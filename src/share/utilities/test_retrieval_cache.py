@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from langchain_community.vectorstores import FAISS
+
+from conftest import KeywordEmbeddings
+from utilities.bm25_index import BM25Index
+from utilities.faiss_loader import index_version, save_vector_store
+from utilities.hybrid_retriever import HybridRetriever
+from utilities.retrieval_cache import CachedRetrieval, RetrievalCache
+
+def entry(*chunk_ids):
+    return CachedRetrieval(chunk_ids, tuple(1.0 for _ in chunk_ids), np.zeros(2, dtype=np.float32))
+
+def test_lru_eviction_and_stats():
+    cache = RetrievalCache(max_entries=2)
+    cache.put("a", entry("1"))
+    cache.put("b", entry("2"))
+    assert cache.get("a") is not None  # a is now the most recently used
+    cache.put("c", entry("3"))
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+    stats = cache.stats()
+    assert stats["size"] == 2 and stats["evictions"] == 1
+    assert stats["hits"] == 2 and stats["misses"] == 1
+    assert stats["hit_ratio"] == pytest.approx(2 / 3)
+
+def test_ttl_expiry(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("utilities.retrieval_cache.time.monotonic", lambda: now[0])
+    cache = RetrievalCache(ttl_seconds=10)
+    cache.put("a", entry("1"))
+    now[0] += 5
+    assert cache.get("a") is not None
+    now[0] += 6
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+def test_keys_normalize_the_query_and_include_the_index_version():
+    assert RetrievalCache.key("  What is the WARRANTY?\n", "v1") == RetrievalCache.key("what is  the warranty?", "v1")
+    assert RetrievalCache.key("what is the warranty?", "v1") != RetrievalCache.key("what is the warranty?", "v2")
+
+def test_index_version_changes_on_save(tmp_path):
+    vector_store = FAISS.from_texts(["warranty repair", "shipping"], KeywordEmbeddings())
+    save_vector_store(str(tmp_path), vector_store)
+    first = index_version(str(tmp_path))
+    assert index_version(str(tmp_path)) == first
+    vector_store.add_texts(["refund"])
+    save_vector_store(str(tmp_path), vector_store)
+    assert index_version(str(tmp_path)) != first
+
+@pytest.mark.asyncio
+async def test_hybrid_search_skips_embedding_on_a_cache_hit():
+    embeddings = KeywordEmbeddings()
+    vector_store = FAISS.from_texts(["warranty repair", "refund policy", "shipping times"], embeddings)
+    cache = RetrievalCache()
+    retriever = HybridRetriever(
+        vector_store=vector_store, sparse_index=BM25Index.from_vector_store(vector_store),
+        k=2, fetch_k=3, cache=cache, index_version="v1"
+    )
+    embeddings.queries = 0
+
+    query_vector, documents = await retriever.asearch("Warranty repair?")
+    cached_vector, cached_documents = await retriever.asearch("warranty   REPAIR?")
+    assert embeddings.queries == 1
+    assert [document.id for document in cached_documents] == [document.id for document in documents]
+    assert np.allclose(cached_vector, query_vector)
+    assert cache.stats()["hits"] == 1
+
+    cache.invalidate()
+    await retriever.asearch("warranty repair?")
+    assert embeddings.queries == 2
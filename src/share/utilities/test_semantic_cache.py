@@ -0,0 +1,156 @@
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import numpy as np
+import pytest
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+from redis.exceptions import ResponseError
+
+from conftest import FakeRedis, StubCombineChain, StubQAChain
+from utilities.chatbot_faiss import ChatbotFAISS
+from utilities.hybrid_retriever import HybridRetriever
+from utilities.reranker import RerankingRetriever
+from utilities.semantic_cache import SemanticCache
+
+def unit(*values):
+    vector = np.array(values, dtype=np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+@pytest.mark.asyncio
+async def test_local_faiss_fallback_is_shared_between_workers():
+    redis_client = FakeRedis()
+    first, second = SemanticCache(redis_client, "hr", 0.95), SemanticCache(redis_client, "hr", 0.95)
+    other_collection = SemanticCache(redis_client, "finance", 0.95)
+
+    assert await first.check_cache("How many leave days?", unit(1, 0, 0)) == (None, None)
+    await first.add_to_cache("How many leave days?", "Twelve.", unit(1, 0, 0))
+    assert first.redisearch is False
+
+    # A paraphrase embeds close to the question; another worker picks the entry up from the log
+    assert await second.check_cache("วันลาพักร้อนมีกี่วัน", unit(1, 0.1, 0)) == (["Twelve."], "cache")
+    assert await second.check_cache("Where is the office?", unit(0, 1, 0)) == (None, None)
+    assert await other_collection.check_cache("How many leave days?", unit(1, 0, 0)) == (None, None)
+
+    await second.clear_cache()
+    assert await first.check_cache("How many leave days?", unit(1, 0, 0)) == (None, None)
+    await first.add_to_cache("Where is the office?", "Building B.", unit(0, 1, 0))
+    assert await second.check_cache("Office location?", unit(0, 1, 0.05)) == (["Building B."], "cache")
+
+@pytest.mark.asyncio
+async def test_questions_about_another_code_or_number_miss():
+    cache = SemanticCache(FakeRedis(), "sales", 0.95)
+    await cache.add_to_cache("What is the price of the X100?", "It costs 990 baht.", unit(1, 0.2, 0))
+
+    # Embeddings of questions that differ in one code or number sit as close as paraphrases
+    for question in ("What is the price of the X200?", "What is the price of 2 X100?"):
+        assert await cache.check_cache(question, unit(1, 0.21, 0)) == (None, None)
+    assert await cache.check_cache("How much does the X100 cost?", unit(1, 0.21, 0)) == (["It costs 990 baht."], "cache")
+
+@pytest.mark.asyncio
+async def test_local_log_skips_overwrites_and_stays_bounded():
+    redis_client = FakeRedis()
+    cache = SemanticCache(redis_client, "hr", 0.95, max_entries=4)
+    for answer in ("Twelve.", "Twelve days.", "Still twelve."):
+        await cache.add_to_cache("How many leave days?", answer, unit(1, 0, 0))
+    assert redis_client.lists[cache.log_key] == [cache.key("How many leave days?")]
+    assert await cache.check_cache("How many leave days?", unit(1, 0, 0)) == (["Still twelve."], "cache")
+    assert cache.index.ntotal == 1
+
+    # One past max_entries + slack drops the oldest entries; every worker reloads the trimmed log
+    other = SemanticCache(redis_client, "hr", 0.95, max_entries=4)
+    questions = [f"Question {i}?" for i in range(5)]
+    for i, question in enumerate(questions):
+        await cache.add_to_cache(question, f"Answer {i}.", unit(1, i + 1, 0))
+    assert len(redis_client.lists[cache.log_key]) == 4
+    assert await redis_client.hget(cache.key("How many leave days?"), "answers") is None
+    assert await redis_client.hget(cache.key(questions[0]), "answers") is None
+    assert await other.check_cache("Question 4?", unit(1, 5, 0)) == (["Answer 4."], "cache")
+    assert await cache.check_cache("Question 1?", unit(1, 2, 0)) == (["Answer 1."], "cache")
+    assert cache.index.ntotal == other.index.ntotal == 4
+    assert await cache.check_cache("How many leave days?", unit(1, 0, 0)) == (None, None)
+
+@pytest.mark.asyncio
+async def test_redisearch_knn_lookup():
+    search = MagicMock()
+    search.info = AsyncMock(side_effect=ResponseError("Unknown index name"))
+    search.create_index = AsyncMock()
+    search.search = AsyncMock(return_value=SimpleNamespace(docs=[
+        SimpleNamespace(question="How many leave days?", answers="Twelve.", distance="0.02")
+    ]))
+    redis_client = MagicMock()
+    redis_client.ft = MagicMock(return_value=search)
+    redis_client.hset = AsyncMock()
+    redis_client.rpush = AsyncMock()
+    cache = SemanticCache(redis_client, "hr-docs", 0.95)
+
+    assert await cache.check_cache("วันลาพักร้อนมีกี่วัน", unit(1, 0.1, 0)) == (["Twelve."], "cache")
+    definition = search.create_index.await_args.kwargs["definition"]
+    assert definition.args[definition.args.index("PREFIX") + 2] == "cache:"
+    query, = search.search.await_args.args
+    assert query.query_string() == "(@collection:{hr\\-docs})=>[KNN 1 @embedding $vector AS distance]"
+    assert np.frombuffer(search.search.await_args.kwargs["query_params"]["vector"], dtype=np.float32).shape == (3,)
+
+    search.search.return_value = SimpleNamespace(docs=[
+        SimpleNamespace(question="Where is the office?", answers="Building B.", distance="0.4")
+    ])
+    assert await cache.check_cache("How many leave days?", unit(1, 0, 0)) == (None, None)
+
+    await cache.add_to_cache("How many leave days?", "Twelve.", unit(1, 0, 0))
+    key, = redis_client.hset.await_args.args
+    assert key == cache.key("how many leave days?  ") and key.startswith("cache:hr-docs:")
+    assert redis_client.hset.await_args.kwargs["mapping"]["collection"] == "hr-docs"
+    redis_client.rpush.assert_not_awaited()
+
+class TopicEmbeddings(Embeddings):
+    """One dimension per topic, with its English and Thai keywords, so paraphrases embed the same."""
+    TOPICS = [("leave", "ลา"), ("office", "สำนักงาน"), ("salary", "เงินเดือน")]
+
+    def __init__(self):
+        self.queries = 0
+
+    def vector(self, text):
+        vector = np.array([0.5] + [float(any(word in text.lower() for word in words))
+                                  for words in self.TOPICS], dtype=np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts):
+        return [self.vector(text) for text in texts]
+
+    def embed_query(self, text):
+        self.queries += 1
+        return self.vector(text)
+
+    async def aembed_query(self, text):
+        return self.embed_query(text)
+
+@pytest.mark.asyncio
+async def test_paraphrase_hits_without_an_extra_embedding_call():
+    embeddings = TopicEmbeddings()
+    texts = ["Annual leave is twelve days.", "The office is in Building B.", "Salary is paid monthly."]
+    vector_store = FAISS.from_texts(texts, embeddings, ids=[f"chunk-{i}" for i in range(len(texts))])
+    candidates = HybridRetriever(vector_store=vector_store, k=2, fetch_k=3)
+    qa_chain = StubQAChain(RerankingRetriever(candidates=candidates, k=1),
+                           StubCombineChain(answer=lambda inputs: inputs["input_documents"][0].page_content))
+    chatbot = ChatbotFAISS.__new__(ChatbotFAISS)
+    chatbot.cache_controller = AsyncMock()
+    chatbot.semantic_cache = SemanticCache(FakeRedis(), "default", 0.95)
+
+    first = await chatbot.process_single_question("How many leave days do I get?", qa_chain)
+    assert first == {"answer": "Annual leave is twelve days.", "type_res": "generate"}
+    second = await chatbot.process_single_question("ลาพักร้อนได้กี่วัน", qa_chain)
+    assert second == {"answer": "Annual leave is twelve days.", "type_res": "cache"}
+    third = await chatbot.process_single_question("Where is the office?", qa_chain)
+    assert third["type_res"] == "generate"
+
+    # One query embedding per question, shared by the retrieval and the cache
+    assert embeddings.queries == 3
+    assert len(qa_chain.combine_documents_chain.questions) == 2
+    chatbot.cache_controller.check_cache.assert_not_awaited()
+
+    # Batches look the cache up with the embeddings of their matrix search
+    chatbot.qa_chains = {"GPT": qa_chain}
+    items = [item async for item in chatbot.answer_batch(["ขอวันลา", "When is the salary paid?"])]
+    assert [(item["index"], item["type_res"]) for item in items] == [(0, "cache"), (1, "generate")]
+    assert embeddings.queries == 3 and len(qa_chain.combine_documents_chain.questions) == 3
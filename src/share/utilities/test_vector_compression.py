@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_core.embeddings import Embeddings
+
+from utilities.faiss_index_factory import FaissIndexSettings
+from utilities.faiss_loader import read_vector_store_files, save_vector_store
+from utilities.vector_compression import FullVectors, RescoringFAISS, compression_report, stored_vectors
+
+DIMENSION = 32
+
+class TableEmbeddings(Embeddings):
+    def __init__(self, table):
+        self.table = table
+
+    def embed_query(self, text):
+        return self.table[text].tolist()
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+@pytest.fixture
+def vectors():
+    rng = np.random.default_rng(0)
+    data = rng.standard_normal((600, DIMENSION)).astype("float32")
+    return data / np.linalg.norm(data, axis=1, keepdims=True)
+
+def make_store(vectors, settings):
+    index = settings.build_index(vectors)
+    store = RescoringFAISS(
+        embedding_function=TableEmbeddings({f"t{i}": vector for i, vector in enumerate(vectors)}),
+        index=index,
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={},
+        full_vectors=np.empty((0, index.d), dtype=np.float32) if settings.lossy else None,
+        rescore_factor=settings.rescore_factor
+    )
+    store.add_texts([f"t{i}" for i in range(len(vectors))], ids=[f"id{i}" for i in range(len(vectors))])
+    return store
+
+@pytest.mark.parametrize("settings, expected", [
+    (FaissIndexSettings("Flat", vector_encoding="float16"), "SQfp16"),
+    (FaissIndexSettings("Flat", vector_encoding="int8"), "SQ8"),
+    (FaissIndexSettings("Flat", vector_encoding="pca", pca_dimension=16), "PCA16,Flat"),
+    (FaissIndexSettings("HNSW", hnsw_m=16, vector_encoding="int8"), "HNSW16,SQ8"),
+    (FaissIndexSettings("IVFFlat", nlist=8, vector_encoding="float16"), "IVF8,SQfp16"),
+    (FaissIndexSettings("IVFPQ", nlist=8, pq_m=4, pq_nbits=4, vector_encoding="pca", pca_dimension=16), "PCA16,IVF8,PQ4x4"),
+])
+def test_encodings_build_searchable_indexes(vectors, settings, expected):
+    assert settings.lossy
+    assert settings.factory_string(DIMENSION, len(vectors)) == expected
+    index = settings.build_index(vectors)
+    index.add(vectors)
+    _, ids = index.search(vectors[:20], 1)
+    assert (ids[:, 0] == np.arange(20)).mean() >= 0.8
+
+def test_encoding_changes_require_a_rebuild():
+    assert not FaissIndexSettings(vector_encoding="int8").same_build(FaissIndexSettings())
+    assert not FaissIndexSettings(vector_encoding="pca", pca_dimension=128).same_build(
+        FaissIndexSettings(vector_encoding="pca", pca_dimension=256))
+    assert FaissIndexSettings(vector_encoding="int8", rescore_factor=2).same_build(FaissIndexSettings(vector_encoding="int8"))
+    assert not FaissIndexSettings(vector_encoding="int8").same_build(None)
+    assert FaissIndexSettings(pca_dimension=16).factory_string(DIMENSION, 600) == "Flat"
+    with pytest.raises(ValueError):
+        FaissIndexSettings(vector_encoding="binary")
+
+def test_rescoring_returns_exact_distances_and_follows_deletes(vectors):
+    store = make_store(vectors, FaissIndexSettings(vector_encoding="pca", pca_dimension=8))
+    assert len(store.full_vectors) == store.index.ntotal == len(vectors)
+
+    results = store.similarity_search_with_score_by_vector(vectors[5].tolist(), k=3)
+    expected = np.square(vectors - vectors[5]).sum(axis=1)
+    assert results[0][0].page_content == "t5" and results[0][1] == pytest.approx(0.0, abs=1e-6)
+    for document, score in results:
+        assert score == pytest.approx(expected[int(document.page_content[1:])], abs=1e-5)
+
+    store.delete(["id5", "id7"])
+    assert len(store.full_vectors) == store.index.ntotal == len(vectors) - 2
+    row = next(row for row, chunk_id in store.index_to_docstore_id.items() if chunk_id == "id8")
+    assert np.array_equal(stored_vectors(store, [row])[0], vectors[8])
+    assert store.similarity_search_with_score_by_vector(vectors[5].tolist(), k=1)[0][0].page_content != "t5"
+
+def test_full_vectors_are_saved_and_memory_mapped(tmp_path, vectors):
+    store = make_store(vectors, FaissIndexSettings(vector_encoding="int8"))
+    save_vector_store(str(tmp_path), store)
+    loaded = FullVectors.load(str(tmp_path))
+    assert isinstance(loaded, np.memmap) and np.array_equal(loaded, vectors)
+    index, _, _ = read_vector_store_files(str(tmp_path))
+    assert index.ntotal == len(loaded)
+
+    # A lossless store drops stale full vectors
+    save_vector_store(str(tmp_path), make_store(vectors, FaissIndexSettings()))
+    assert FullVectors.load(str(tmp_path)) is None
+
+def test_compression_report_trades_memory_for_recall(vectors):
+    report = {row["encoding"]: row for row in compression_report(vectors, queries=50, k=5)}
+    # pca-384 and pca-256 do not reduce 32 dimensions, so they are plain float32
+    assert report["float32"]["recall_at_k"] == 1.0
+    assert report["float16"]["index_mb"] < report["float32"]["index_mb"]
+    assert report["int8"]["index_mb"] < report["float16"]["index_mb"]
+    assert report["int8 + rescore"]["recall_at_k"] >= report["int8"]["recall_at_k"]
+    assert report["int8 + rescore"]["full_vectors_mb_on_disk"] > 0
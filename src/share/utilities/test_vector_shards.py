@@ -0,0 +1,117 @@
+import os
+import numpy as np
+import pytest
+
+from langchain_core.documents import Document
+from langchain_community.vectorstores import FAISS
+
+from conftest import HashEmbeddings
+from utilities.bm25_index import BM25Index
+from utilities.hybrid_retriever import HybridRetriever
+from utilities.vector_shards import ShardLayout, ShardedVectorStore
+
+TEXTS = [f"chunk {i} about topic {i % 7}" for i in range(60)]
+IDS = [f"chunk-{i}" for i in range(60)]
+
+def sharded_store(layout, executor):
+    embeddings = HashEmbeddings()
+    stores = []
+    for shard in range(layout.count):
+        texts = [(text, chunk_id) for text, chunk_id in zip(TEXTS, IDS) if layout.shard_of("", chunk_id) == shard]
+        stores.append(FAISS.from_texts([t for t, _ in texts], embeddings, ids=[i for _, i in texts]) if texts else None)
+    return ShardedVectorStore(stores, layout, executor)
+
+def test_layout_partitions_and_folders(tmp_path):
+    layout = ShardLayout(str(tmp_path), 4, "source")
+    assert layout.folder(2) == os.path.join(str(tmp_path), "shard-002")
+    assert ShardLayout(str(tmp_path)).folder(0) == str(tmp_path)
+    # A PDF's chunks never span shards with source partitioning
+    shard = layout.shard_of("a.pdf", "x")
+    assert {layout.shard_of("a.pdf", chunk_id) for chunk_id in IDS} == {shard}
+    assert "a.pdf" in layout.files_of(shard, ["a.pdf", "b.pdf"])
+    chunks, ids = ShardLayout(str(tmp_path), 4, "hash").select(1, "a.pdf", [Document(page_content=t) for t in TEXTS], IDS)
+    assert 0 < len(ids) < len(IDS) and len(chunks) == len(ids)
+
+    assert ShardLayout(str(tmp_path)).same_layout(None)
+    assert not layout.same_layout(None)
+    layout.save()
+    assert layout.same_layout(ShardLayout.load(str(tmp_path)))
+    assert not ShardLayout(str(tmp_path), 4, "hash").same_layout(ShardLayout.load(str(tmp_path)))
+
+@pytest.mark.asyncio
+async def test_fan_out_matches_a_single_index(tmp_path, shard_pool):
+    single = FAISS.from_texts(TEXTS, HashEmbeddings(), ids=IDS)
+    sharded = sharded_store(ShardLayout(str(tmp_path), 3, "hash"), shard_pool)
+    query = HashEmbeddings().embed_query("topic 3")
+
+    expected = single.similarity_search_with_score_by_vector(query, k=8)
+    merged = sharded.similarity_search_with_score_by_vector(query, k=8)
+    assert [document.id for document, _ in merged] == [document.id for document, _ in expected]
+    assert np.allclose([score for _, score in merged], [score for _, score in expected], atol=1e-5)
+    amerged = await sharded.asimilarity_search_with_score_by_vector(query, k=8)
+    assert [document.id for document, _ in amerged] == [document.id for document, _ in expected]
+
+    D, I = sharded.search(np.array([query], dtype=np.float32), 8)
+    assert [sharded.index_to_docstore_id[int(i)] for i in I[0]] == [document.id for document, _ in expected]
+    assert len(sharded.index_to_docstore_id) == sharded.ntotal == len(TEXTS)
+    assert sharded.docstore.search("chunk-5").page_content == TEXTS[5]
+    assert np.allclose(sharded.stored_vectors(["chunk-5", "chunk-40"]), HashEmbeddings().embed_documents([TEXTS[5], TEXTS[40]]))
+
+    # Hybrid retrieval sees the shards as one store
+    retriever = HybridRetriever(vector_store=sharded, sparse_index=BM25Index.from_vector_store(sharded), k=3, fetch_k=8)
+    _, documents = await retriever.asearch("chunk 12")
+    assert "chunk-12" in [document.id for document in documents]
+
+@pytest.fixture
+def chatbot(chatbot):
+    chatbot.shard_layout = ShardLayout(chatbot.persist_directory, 2, "source")
+    return chatbot
+
+def write_pdfs(bot, names):
+    for name in names:
+        with open(os.path.join(bot.pdf_directory_path, name), "w", encoding="utf-8") as f:
+            f.write(f"{name} first\n{name} second")
+
+def stored_texts(bot):
+    ids = bot.vector_store.index_to_docstore_id.values()
+    return sorted(bot.vector_store.docstore.search(chunk_id).page_content for chunk_id in ids)
+
+def test_shards_are_rebuilt_independently(chatbot):
+    layout = chatbot.shard_layout
+    names = [f"doc{i}.pdf" for i in range(8)]
+    write_pdfs(chatbot, names)
+    chatbot.rebuild_vector_store()
+    assert sorted(chatbot.parsed) == names
+    assert isinstance(chatbot.vector_store, ShardedVectorStore)
+    assert len(stored_texts(chatbot)) == 16
+    pool = chatbot.vector_store.executor
+
+    # Only the shard holding the changed PDF is touched: the new version links the other shard's files
+    changed = names[0]
+    shard = layout.shard_of(changed, "")
+    def other_index():
+        return os.stat(os.path.join(chatbot.shard_layout.folder(1 - shard), "index.faiss")).st_ino
+    other_inode = other_index()
+    chatbot.parsed.clear()
+    with open(os.path.join(chatbot.pdf_directory_path, changed), "w", encoding="utf-8") as f:
+        f.write("rewritten")
+    chatbot.rebuild_vector_store()
+    assert chatbot.parsed == [changed]
+    assert other_index() == other_inode
+    assert "rewritten" in stored_texts(chatbot)
+
+    # A forced rebuild of one shard parses only that shard's PDFs and keeps the other shard live
+    chatbot.parsed.clear()
+    chatbot.rebuild_vector_store(full=True, shards=[shard])
+    assert sorted(chatbot.parsed) == layout.files_of(shard, names)
+    assert other_index() == other_inode
+    assert len(stored_texts(chatbot)) == 15
+    # Every swapped-in snapshot searches on the chatbot's one pool
+    assert chatbot.vector_store.executor is pool is chatbot.shard_search_pool
+
+    # A global keyword index covers every shard
+    sparse_index = chatbot.load_sparse_index(chatbot.vector_store)
+    assert sorted(sparse_index.chunk_ids) == sorted(chatbot.vector_store.index_to_docstore_id.values())
+
+    with pytest.raises(ValueError):
+        chatbot.rebuild_vector_store(shards=[5])
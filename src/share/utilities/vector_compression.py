@@ -0,0 +1,242 @@
+# utilities/vector_compression.py
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import faiss
+import numpy as np
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+from langchain_community.vectorstores import FAISS
+
+from utilities.faiss_index_factory import FaissIndexSettings, reconstruct_vectors
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+class FullVectors:
+    """
+    Full-precision float32 copies of the vectors of a lossy index (compressed encodings, IVFPQ),
+    one row per index row, kept next to it for exact re-scoring. Read-only loads are memory-mapped,
+    so only the rows of re-scored candidates are paged in.
+    """
+    FILE_NAME = "vectors.f32.npy"
+
+    @classmethod
+    def path(cls, folder: str) -> str:
+        return os.path.join(folder, cls.FILE_NAME)
+
+    @classmethod
+    def save(cls, folder: str, vectors: np.ndarray):
+        path = cls.path(folder)
+        with open(f"{path}.tmp", "wb") as f:
+            np.save(f, np.ascontiguousarray(vectors, dtype=np.float32))
+        os.replace(f"{path}.tmp", path)
+
+    @classmethod
+    def load(cls, folder: str, writable: bool = False) -> Optional[np.ndarray]:
+        path = cls.path(folder)
+        if not os.path.exists(path):
+            return None
+        return np.load(path) if writable else np.load(path, mmap_mode="r")
+
+    @classmethod
+    def remove(cls, folder: str) -> bool:
+        path = cls.path(folder)
+        if os.path.exists(path):
+            os.remove(path)
+            return True
+        return False
+
+class RescoringFAISS(FAISS):
+    """
+    FAISS vector store over a compressed index that re-scores with full-precision vectors: a search
+    takes `rescore_factor` times the requested candidates from the compressed index, computes their exact
+    L2 distances from `full_vectors` and keeps the best k. Adding and deleting chunks keeps the full
+    vectors aligned with the index rows. Without full vectors it behaves like FAISS.
+    """
+
+    def __init__(self, *args, full_vectors: Optional[np.ndarray] = None, rescore_factor: int = 4, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.full_vectors = full_vectors
+        self.rescore_factor = rescore_factor
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        return self.add_embeddings(zip(texts, self._embed_documents(texts)), metadatas=metadatas, ids=ids)
+
+    def add_embeddings(self, text_embeddings: Iterable[Tuple[str, List[float]]], metadatas: Optional[List[dict]] = None,
+                       ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        text_embeddings = list(text_embeddings)
+        if self.full_vectors is not None:
+            vectors = np.array([embedding for _, embedding in text_embeddings], dtype=np.float32)
+            self.full_vectors = np.concatenate([np.asarray(self.full_vectors), vectors.reshape(-1, self.index.d)])
+        return super().add_embeddings(text_embeddings, metadatas=metadatas, ids=ids, **kwargs)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        rows = None
+        if ids is not None and self.full_vectors is not None:
+            deleted = set(ids)
+            rows = [row for row, chunk_id in self.index_to_docstore_id.items() if chunk_id in deleted]
+        result = super().delete(ids, **kwargs)
+        # Like FAISS.delete this assumes the index compacts its rows (flat storage, see supports_remove)
+        if rows is not None:
+            self.full_vectors = np.delete(np.asarray(self.full_vectors), rows, axis=0)
+        return result
+
+    @property
+    def rescoring(self) -> bool:
+        return self.full_vectors is not None and self.rescore_factor > 1
+
+    def _ranked(self, query: np.ndarray, rows: np.ndarray, distances: np.ndarray, k: int) -> List[Tuple[Document, float]]:
+        """The best k of one query's search results, re-scored with the full vectors when kept."""
+        found = rows >= 0
+        rows, distances = rows[found], distances[found]
+        if self.rescoring:
+            rows = np.sort(rows)  # Ascending rows read the memory-mapped file sequentially
+            distances = np.square(np.asarray(self.full_vectors[rows]) - query).sum(axis=1)
+        results = []
+        for i in np.argsort(distances, kind="stable")[:k]:
+            document = self.docstore.search(self.index_to_docstore_id[int(rows[i])])
+            if isinstance(document, Document):
+                results.append((document, float(distances[i])))
+        return results
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4,
+                                               filter: Optional[Any] = None, **kwargs: Any) -> List[Tuple[Document, float]]:
+        if not self.rescoring or filter is not None:
+            return super().similarity_search_with_score_by_vector(embedding, k=k, filter=filter, **kwargs)
+        return self.similarity_search_batch_by_vectors(np.array([embedding], dtype=np.float32), k)[0]
+
+    def similarity_search_batch_by_vectors(self, embeddings: np.ndarray, k: int = 4) -> List[List[Tuple[Document, float]]]:
+        """similarity_search_with_score_by_vector for every row of `embeddings` with a single index.search."""
+        queries = np.ascontiguousarray(embeddings, dtype=np.float32)
+        fetch = min(self.index.ntotal, k * self.rescore_factor if self.rescoring else k)
+        if len(queries) == 0 or fetch == 0:
+            return [[] for _ in queries]
+        distances, rows = self.index.search(queries, fetch)
+        return [self._ranked(query, query_rows, query_distances, k)
+                for query, query_rows, query_distances in zip(queries, rows, distances)]
+
+def stored_vectors(vector_store: FAISS, rows: Sequence[int]) -> Optional[np.ndarray]:
+    """The vectors at the given index rows: full precision when kept, otherwise reconstructed from the index."""
+    full_vectors = getattr(vector_store, "full_vectors", None)
+    if full_vectors is not None:
+        return np.asarray(full_vectors[np.asarray(rows, dtype=np.int64)], dtype=np.float32)
+    return reconstruct_vectors(vector_store.index, rows)
+
+def search_batch(vector_store: Any, embeddings: np.ndarray, k: int) -> List[List[Tuple[Document, float]]]:
+    """Searches many query vectors at once when the store supports it (RescoringFAISS, shards), one by one otherwise."""
+    if hasattr(vector_store, "similarity_search_batch_by_vectors"):
+        return vector_store.similarity_search_batch_by_vectors(embeddings, k)
+    return [vector_store.similarity_search_with_score_by_vector(np.asarray(embedding).tolist(), k=k) for embedding in embeddings]
+
+# Encodings compared by compression_report: (label, index settings overrides, re-scored)
+REPORT_SETTINGS = (
+    ("float32", {"vector_encoding": "float32"}, False),
+    ("float16", {"vector_encoding": "float16"}, False),
+    ("int8", {"vector_encoding": "int8"}, False),
+    ("int8 + rescore", {"vector_encoding": "int8"}, True),
+    ("pca-384", {"vector_encoding": "pca", "pca_dimension": 384}, False),
+    ("pca-384 + rescore", {"vector_encoding": "pca", "pca_dimension": 384}, True),
+    ("pca-256", {"vector_encoding": "pca", "pca_dimension": 256}, False),
+    ("pca-256 + rescore", {"vector_encoding": "pca", "pca_dimension": 256}, True),
+)
+
+def recall_at_k(found: np.ndarray, expected: np.ndarray) -> float:
+    """Share of the exact top-k rows that were found, averaged over the queries."""
+    k = expected.shape[1]
+    return float(np.mean([len(set(f[:k]) & set(e)) / k for f, e in zip(found, expected)]))
+
+def rescore_rows(vectors: np.ndarray, queries: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """Each query's result rows (from index.search) reordered by exact L2 distance to `vectors`, missing (-1) rows last."""
+    distances = np.square(vectors[np.clip(rows, 0, None)] - queries[:, None, :]).sum(axis=2)
+    distances[rows < 0] = np.inf
+    return np.take_along_axis(rows, np.argsort(distances, axis=1, kind="stable"), axis=1)
+
+def compression_report(vectors: np.ndarray, queries: int = 200, k: int = 10, rescore_factor: int = 4,
+                       index_type: str = "Flat", seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Builds the index with each encoding of REPORT_SETTINGS from the same vectors and measures recall@k
+    against exact search, the index size in memory and the search latency. Queries are stored vectors
+    themselves, each excluded from its own results. Sizes are what every worker holds per index;
+    re-scoring adds no resident memory beyond the memory-mapped pages it reads.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(len(vectors), size=min(queries, len(vectors)), replace=False)
+    query_vectors = vectors[sample]
+
+    def without_self(rows: np.ndarray) -> np.ndarray:
+        return np.array([[row for row in found if row != query][:k] for found, query in zip(rows, sample)])
+
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    expected = without_self(exact.search(query_vectors, k + 1)[1])
+
+    report = []
+    for label, overrides, rescore in REPORT_SETTINGS:
+        settings = FaissIndexSettings(index_type=index_type, **overrides)
+        try:
+            index = settings.build_index(vectors)
+        except ValueError as e:
+            logger.warning(f"Skipping {label}: {e}")
+            continue
+        index.add(vectors)
+        fetch = (k + 1) * (rescore_factor if rescore else 1)
+        start = time.perf_counter()
+        _, rows = index.search(query_vectors, fetch)
+        if rescore:
+            rows = rescore_rows(vectors, query_vectors, rows)
+        elapsed = time.perf_counter() - start
+        report.append({
+            "encoding": label,
+            "recall_at_k": round(recall_at_k(without_self(rows), expected), 4),
+            "index_mb": round(faiss.serialize_index(index).nbytes / (1024 * 1024), 2),
+            "full_vectors_mb_on_disk": round(vectors.nbytes / (1024 * 1024), 2) if rescore else 0,
+            "ms_per_query": round(1000 * elapsed / len(query_vectors), 3),
+        })
+    return report
+
+def load_index_vectors(folder: str) -> np.ndarray:
+    """The full-precision vectors of a persisted index: its full vectors file, or reconstructed from a lossless index."""
+    full_vectors = FullVectors.load(folder)
+    if full_vectors is not None:
+        return np.asarray(full_vectors)
+    index = faiss.read_index(os.path.join(folder, "index.faiss"))
+    vectors = reconstruct_vectors(index, range(index.ntotal))
+    if vectors is None:
+        raise ValueError(f"Cannot read full-precision vectors from the index in {folder}.")
+    return vectors
+
+def main(argv: Optional[List[str]] = None):
+    """python -m utilities.vector_compression <index folder>: recall vs memory of each vector encoding."""
+    parser = argparse.ArgumentParser(description="Recall vs memory of the FAISS vector encodings on a persisted index.")
+    parser.add_argument("folder", help="Folder with index.faiss (PERSIST_DIRECTORY, a version or a shard folder)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rescore-factor", type=int, default=4)
+    parser.add_argument("--index-type", default="Flat")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    vectors = load_index_vectors(args.folder)
+    report = compression_report(vectors, args.queries, args.k, args.rescore_factor, args.index_type)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{len(vectors)} vectors of dimension {vectors.shape[1]}, recall@{args.k} over {args.queries} queries")
+    print(f"{'encoding':<20}{'recall':>8}{'index MB':>10}{'disk MB':>9}{'ms/query':>10}")
+    for row in report:
+        print(f"{row['encoding']:<20}{row['recall_at_k']:>8.3f}{row['index_mb']:>10.2f}"
+              f"{row['full_vectors_mb_on_disk']:>9.2f}{row['ms_per_query']:>10.3f}")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, stream=sys.stderr)
+    main()
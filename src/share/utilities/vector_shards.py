@@ -0,0 +1,243 @@
+# utilities/vector_shards.py
+
+import os
+import json
+import hashlib
+import heapq
+import bisect
+import asyncio
+import logging
+import threading
+import numpy as np
+
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from langchain_core.documents import Document
+from langchain_community.docstore.base import Docstore
+from langchain_community.vectorstores import FAISS
+
+from utilities.chunk_store import ChunkStore
+from utilities.vector_compression import search_batch, stored_vectors
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# source: every chunk of a PDF goes to the same shard, so a changed PDF touches a single shard
+# hash:   chunks are spread by chunk id, which balances shards when a few PDFs dominate the corpus
+SHARD_PARTITIONS = ("source", "hash")
+
+class ShardLayout:
+    """
+    How the vector store is split into independently built FAISS shards under the persist directory.
+    A single shard is the unsharded layout: the index lives in the persist directory itself.
+    """
+    FILE_NAME = "shards.json"
+
+    def __init__(self, persist_directory: str, count: int = 1, partition: str = "source"):
+        if count < 1:
+            raise ValueError(f"The vector store needs at least one shard, not {count}.")
+        if partition not in SHARD_PARTITIONS:
+            raise ValueError(f"Unsupported shard partition: {partition}. Choose one of {', '.join(SHARD_PARTITIONS)}.")
+        self.persist_directory = persist_directory
+        self.count = count
+        self.partition = partition
+
+    @property
+    def sharded(self) -> bool:
+        return self.count > 1
+
+    def folder(self, shard: int) -> str:
+        if not self.sharded:
+            return self.persist_directory
+        return os.path.join(self.persist_directory, f"shard-{shard:03d}")
+
+    def folders(self) -> List[str]:
+        return [self.folder(shard) for shard in range(self.count)]
+
+    def shard_of(self, pdf_file: str, chunk_id: str) -> int:
+        """Stable shard of a chunk: blake2b of the key, independent of PYTHONHASHSEED and even for similar names."""
+        if not self.sharded:
+            return 0
+        key = pdf_file if self.partition == "source" else chunk_id
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "big") % self.count
+
+    def files_of(self, shard: int, pdf_files: Sequence[str]) -> List[str]:
+        """The PDFs that may have chunks in the shard."""
+        if self.partition == "hash" or not self.sharded:
+            return list(pdf_files)
+        return [pdf_file for pdf_file in pdf_files if self.shard_of(pdf_file, "") == shard]
+
+    def select(self, shard: int, pdf_file: str, chunks: List[Document], chunk_ids: List[str]) -> Tuple[List[Document], List[str]]:
+        """The chunks of one PDF, and their ids, that belong to the shard."""
+        if not self.sharded:
+            return chunks, chunk_ids
+        kept = [(chunk, chunk_id) for chunk, chunk_id in zip(chunks, chunk_ids) if self.shard_of(pdf_file, chunk_id) == shard]
+        return [chunk for chunk, _ in kept], [chunk_id for _, chunk_id in kept]
+
+    def save(self):
+        os.makedirs(self.persist_directory, exist_ok=True)
+        path = os.path.join(self.persist_directory, self.FILE_NAME)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump({"count": self.count, "partition": self.partition}, f, indent=2)
+        os.replace(f"{path}.tmp", path)
+
+    @classmethod
+    def load(cls, persist_directory: str) -> Optional["ShardLayout"]:
+        """The layout the persisted shards were built with; None for stores built before sharding."""
+        path = os.path.join(persist_directory, cls.FILE_NAME)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(persist_directory, data["count"], data["partition"])
+
+    def same_layout(self, other: Optional["ShardLayout"]) -> bool:
+        """Whether shards persisted with `other` hold the chunks this layout expects."""
+        if other is None:
+            return not self.sharded
+        return self.count == other.count and (not self.sharded or self.partition == other.partition)
+
+class ShardedIndexMapping(Mapping):
+    """Global FAISS positions (shard after shard) to chunk ids, like FAISS.index_to_docstore_id."""
+
+    def __init__(self, shards: List[FAISS]):
+        self.shards = shards
+        self.offsets = [0]
+        for shard in shards:
+            self.offsets.append(self.offsets[-1] + len(shard.index_to_docstore_id))
+
+    def __getitem__(self, position: int) -> str:
+        if not 0 <= position < self.offsets[-1]:
+            raise KeyError(position)
+        shard = bisect.bisect_right(self.offsets, position) - 1
+        return self.shards[shard].index_to_docstore_id[position - self.offsets[shard]]
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(self.offsets[-1]))
+
+    def __len__(self) -> int:
+        return self.offsets[-1]
+
+class ShardedDocstore(Docstore):
+    """Chunk lookup across the shards' docstores."""
+
+    def __init__(self, vector_store: "ShardedVectorStore"):
+        self.vector_store = vector_store
+
+    def search(self, search: str) -> Union[str, Document]:
+        shard, _ = self.vector_store.locate(search)
+        if shard < 0:
+            return f"ID {search} not found."
+        return self.vector_store.stores[shard].docstore.search(search)
+
+class ShardedVectorStore:
+    """
+    Read-only view over the FAISS shards that answers the part of the FAISS vector store interface
+    retrieval uses. A query is searched on every shard in parallel (FAISS releases the GIL while
+    searching) and the per-shard results, each sorted by distance, are merged with a heap into
+    the global top k. Every index is built with METRIC_L2, so smaller distances are better in all shards.
+    The searches run on `executor`, which belongs to the caller: it is shared by every snapshot of the
+    store, so swapping one out leaves no threads behind.
+    """
+
+    def __init__(self, stores: List[Optional[FAISS]], layout: ShardLayout, executor: ThreadPoolExecutor):
+        if len(stores) != layout.count:
+            raise ValueError(f"Expected {layout.count} shards, got {len(stores)}.")
+        self.stores = stores  # One per shard, None for shards without chunks
+        self.layout = layout
+        self.shards = [store for store in stores if store is not None]
+        if not self.shards:
+            raise ValueError("No chunks were created from any PDF files.")
+        self.executor = executor
+        self.index_to_docstore_id = ShardedIndexMapping(self.shards)
+        self.docstore = ShardedDocstore(self)
+        self._rows: Dict[int, Dict[str, int]] = {}
+        self._rows_lock = threading.Lock()
+
+    @property
+    def embeddings(self):
+        return self.shards[0].embeddings
+
+    @property
+    def ntotal(self) -> int:
+        return sum(shard.index.ntotal for shard in self.shards)
+
+    def _row(self, shard: int, chunk_id: str) -> int:
+        docstore = self.stores[shard].docstore
+        if isinstance(docstore, ChunkStore):
+            return docstore.row_of(chunk_id)
+        with self._rows_lock:
+            rows = self._rows.get(shard)
+            if rows is None:
+                rows = {value: row for row, value in self.stores[shard].index_to_docstore_id.items()}
+                self._rows[shard] = rows
+        return rows.get(chunk_id, -1)
+
+    def locate(self, chunk_id: str) -> Tuple[int, int]:
+        """(shard, row) of an indexed chunk, or (-1, -1)."""
+        if self.layout.partition == "hash":
+            candidates = [self.layout.shard_of("", chunk_id)]
+        else:
+            candidates = range(len(self.stores))
+        for shard in candidates:
+            if self.stores[shard] is None:
+                continue
+            row = self._row(shard, chunk_id)
+            if row >= 0:
+                return shard, row
+        return -1, -1
+
+    def stored_vectors(self, chunk_ids: List[str]) -> Optional[np.ndarray]:
+        """The chunks' vectors as stored in their shards, or None if one cannot be reconstructed."""
+        located = [self.locate(chunk_id) for chunk_id in chunk_ids]
+        if any(shard < 0 for shard, _ in located):
+            return None
+        vectors = np.empty((len(chunk_ids), self.shards[0].index.d), dtype=np.float32)
+        by_shard: Dict[int, List[Tuple[int, int]]] = {}
+        for i, (shard, row) in enumerate(located):
+            by_shard.setdefault(shard, []).append((i, row))
+        for shard, entries in by_shard.items():
+            shard_vectors = stored_vectors(self.stores[shard], [row for _, row in entries])
+            if shard_vectors is None:
+                return None
+            vectors[[i for i, _ in entries]] = shard_vectors
+        return vectors
+
+    @staticmethod
+    def _merge(results: List[List[Tuple[Document, float]]], k: int) -> List[Tuple[Document, float]]:
+        return list(islice(heapq.merge(*results, key=lambda pair: pair[1]), k))
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4,
+                                               **kwargs) -> List[Tuple[Document, float]]:
+        results = self.executor.map(
+            lambda shard: shard.similarity_search_with_score_by_vector(embedding, k=k, **kwargs), self.shards
+        )
+        return self._merge(list(results), k)
+
+    async def asimilarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4,
+                                                      **kwargs) -> List[Tuple[Document, float]]:
+        # The shards are searched on the shard pool; the event loop only awaits them
+        results = await asyncio.gather(*(
+            asyncio.wrap_future(self.executor.submit(shard.similarity_search_with_score_by_vector, embedding, k=k, **kwargs))
+            for shard in self.shards
+        ))
+        return self._merge(list(results), k)
+
+    def similarity_search_batch_by_vectors(self, embeddings: np.ndarray, k: int = 4) -> List[List[Tuple[Document, float]]]:
+        """Every query of the matrix searched on every shard at once, merged per query."""
+        results = list(self.executor.map(lambda shard: search_batch(shard, embeddings, k), self.shards))
+        return [self._merge([shard_results[i] for shard_results in results], k) for i in range(len(embeddings))]
+
+    def search(self, vectors: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """faiss.Index.search over all shards: distances and global positions (-1 for missing results)."""
+        offsets = self.index_to_docstore_id.offsets
+        results = list(self.executor.map(lambda shard: shard.index.search(vectors, k), self.shards))
+        distances = np.concatenate([D for D, _ in results], axis=1)
+        positions = np.concatenate([np.where(I >= 0, I + offset, -1) for (_, I), offset in zip(results, offsets)], axis=1)
+        distances = np.where(positions >= 0, distances, np.inf)
+        order = np.argsort(distances, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(distances, order, axis=1), np.take_along_axis(positions, order, axis=1)
@@ -0,0 +1,300 @@
+"""
+Offline retrieval benchmark: FAISS build time, query latency percentiles, memory and recall@k
+against exact search, across index configurations, chunk sizes and k values. No network:
+embeddings are synthetic, or read from the embedding cache (EMBEDDING_CACHE_PATH) of a deployment.
+
+    python3 src/tests/benchmark/retrieval_benchmark.py --profile quick --output report.json
+    python3 src/tests/benchmark/retrieval_benchmark.py --embedding-cache /app/service/data/faiss_index/embedding_cache.sqlite3
+    python3 src/tests/benchmark/retrieval_benchmark.py --profile quick --baseline src/tests/benchmark/baseline.json
+
+The report is JSON with one result row per (corpus, index configuration, k). With --baseline, rows are
+matched against an earlier report; a recall@k drop beyond --max-recall-drop fails the run. Latency
+changes are printed but never fail it, since they depend on the machine.
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import sqlite3
+import logging
+import argparse
+import platform
+import subprocess
+import faiss
+import numpy as np
+
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+SHARE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "share")
+if SHARE_DIR not in sys.path:
+    sys.path.insert(0, SHARE_DIR)
+
+from utilities.faiss_index_factory import FaissIndexSettings
+from utilities.faiss_loader import memory_usage
+from utilities.vector_compression import recall_at_k, rescore_rows
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+REPORT_VERSION = 1
+# Splitter overlap as a share of the chunk size (CHUNK_OVERLAP / CHUNK_SIZE in settings)
+CHUNK_OVERLAP_RATIO = 0.2
+EMBEDDING_MODEL = "text-embedding-ada-002"
+# Spread of synthetic vectors around their topic center, per dimension (centers are standard normal):
+# topics overlap enough that approximate indexes miss some neighbours, as they do on real embeddings
+TOPIC_NOISE = 2.5
+
+# Index configurations are "<index type>" or "<index type>/<vector encoding>"
+PROFILES: Dict[str, Dict[str, Any]] = {
+    "quick": {
+        "corpus_chars": 1_500_000,
+        "chunk_sizes": [500, 1000],
+        "k_values": [4, 10],
+        "queries": 50,
+        "dimension": 256,
+        "configs": ["Flat", "Flat/int8", "IVFFlat", "HNSW", "HNSW/int8"],
+    },
+    "full": {
+        "corpus_chars": 2_000_000,
+        "chunk_sizes": [500, 1000, 2000],
+        "k_values": [4, 10, 20],
+        "queries": 200,
+        "dimension": 1536,
+        "configs": ["Flat", "Flat/float16", "Flat/int8", "Flat/pca", "IVFFlat", "IVFPQ", "HNSW", "HNSW/int8"],
+    },
+}
+
+def chunk_count(corpus_chars: int, chunk_size: int) -> int:
+    """Chunks the text splitter makes of a corpus: windows of chunk_size advancing by chunk_size - overlap."""
+    overlap = int(chunk_size * CHUNK_OVERLAP_RATIO)
+    return max(1, math.ceil((corpus_chars - overlap) / (chunk_size - overlap)))
+
+def synthetic_embeddings(n_vectors: int, n_queries: int, dimension: int, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Normalized vectors around ~sqrt(n) topic centers, like chunks of documents about a few subjects,
+    and held-out queries drawn from the same topics.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, int(math.sqrt(n_vectors))), dimension)).astype(np.float32)
+
+    def sample(n: int) -> np.ndarray:
+        noise = TOPIC_NOISE * rng.standard_normal((n, dimension)).astype(np.float32)
+        data = centers[rng.integers(0, len(centers), n)] + noise
+        return data / np.linalg.norm(data, axis=1, keepdims=True)
+
+    return sample(n_vectors), sample(n_queries)
+
+def cached_embeddings(path: str, n_queries: int, model: str = EMBEDDING_MODEL, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """The vectors of an EmbeddingCache database; a random `n_queries` of them are held out as queries."""
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = connection.execute("SELECT vector FROM embeddings WHERE model = ?", (model,)).fetchall()
+    finally:
+        connection.close()
+    if len(rows) <= n_queries:
+        raise ValueError(f"{path} has {len(rows)} {model} embeddings; more than {n_queries} are needed.")
+    vectors = np.vstack([np.frombuffer(row[0], dtype=np.float32) for row in rows])
+    held_out = np.zeros(len(vectors), dtype=bool)
+    held_out[np.random.default_rng(seed).choice(len(vectors), n_queries, replace=False)] = True
+    return np.ascontiguousarray(vectors[~held_out]), np.ascontiguousarray(vectors[held_out])
+
+def parse_config(config: str) -> FaissIndexSettings:
+    index_type, _, encoding = config.partition("/")
+    return FaissIndexSettings(index_type=index_type, vector_encoding=encoding or "float32")
+
+def rss_mb() -> float:
+    usage = memory_usage()
+    return usage.get("rss_mb", usage.get("max_rss_mb", 0.0))
+
+def percentiles(latencies: List[float]) -> Dict[str, float]:
+    values = np.array(latencies) * 1000
+    return {
+        "mean": round(float(values.mean()), 4),
+        "p50": round(float(np.percentile(values, 50)), 4),
+        "p95": round(float(np.percentile(values, 95)), 4),
+        "p99": round(float(np.percentile(values, 99)), 4),
+    }
+
+def benchmark_index(corpus: Dict[str, Any], vectors: np.ndarray, queries: np.ndarray, expected: np.ndarray,
+                    config: str, k_values: List[int], rescore_factor: int) -> List[Dict[str, Any]]:
+    """Builds one index configuration over the corpus and measures every k. One row per k."""
+    settings = parse_config(config)
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    index = settings.build_index(vectors)
+    index.add(vectors)
+    build_seconds = time.perf_counter() - start
+    rss_delta = rss_mb() - rss_before
+    index_mb = faiss.serialize_index(index).nbytes / (1024 * 1024)
+    rescore = settings.lossy and rescore_factor > 1
+
+    rows = []
+    for k in k_values:
+        fetch = min(len(vectors), k * rescore_factor if rescore else k)
+
+        def search(query_vectors: np.ndarray) -> np.ndarray:
+            _, found = index.search(query_vectors, fetch)
+            return rescore_rows(vectors, query_vectors, found) if rescore else found
+
+        search(queries[:1])  # Warm-up
+        latencies = []
+        for i in range(len(queries)):
+            start = time.perf_counter()
+            search(queries[i:i + 1])
+            latencies.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        found = search(queries)
+        batch_seconds = time.perf_counter() - start
+
+        rows.append({
+            **corpus,
+            "config": config,
+            "index_type": settings.index_type,
+            "encoding": settings.vector_encoding,
+            "rescored": rescore,
+            "k": k,
+            "recall_at_k": round(recall_at_k(found[:, :k], expected[:, :k]), 4),
+            "latency_ms": percentiles(latencies),
+            "batch_qps": round(len(queries) / batch_seconds, 1),
+            "build_seconds": round(build_seconds, 4),
+            "index_mb": round(index_mb, 3),
+            "rss_delta_mb": round(rss_delta, 1),
+        })
+    return rows
+
+def corpora(args: argparse.Namespace) -> List[Tuple[Dict[str, Any], np.ndarray, np.ndarray]]:
+    """(description, vectors, queries) of every corpus to benchmark."""
+    if args.embedding_cache:
+        vectors, queries = cached_embeddings(args.embedding_cache, args.queries, args.model, args.seed)
+        return [({"corpus": "embedding-cache", "chunk_size": None, "vectors": len(vectors),
+                  "dimension": vectors.shape[1]}, vectors, queries)]
+    result = []
+    for chunk_size in args.chunk_sizes:
+        n_vectors = chunk_count(args.corpus_chars, chunk_size)
+        vectors, queries = synthetic_embeddings(n_vectors, args.queries, args.dimension, args.seed)
+        result.append(({"corpus": f"synthetic-{chunk_size}", "chunk_size": chunk_size, "vectors": n_vectors,
+                        "dimension": args.dimension}, vectors, queries))
+    return result
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    results = []
+    for corpus, vectors, queries in corpora(args):
+        exact = faiss.IndexFlatL2(vectors.shape[1])
+        exact.add(vectors)
+        _, expected = exact.search(queries, max(args.k_values))
+        for config in args.configs:
+            logger.info(f"Benchmarking {config} on {corpus['corpus']} ({corpus['vectors']} vectors)")
+            try:
+                results.extend(benchmark_index(corpus, vectors, queries, expected, config, args.k_values,
+                                               args.rescore_factor))
+            except ValueError as e:
+                logger.warning(f"Skipping {config} on {corpus['corpus']}: {e}")
+    return {
+        "benchmark": "retrieval",
+        "version": REPORT_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "faiss": faiss.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "faiss_threads": faiss.omp_get_max_threads(),
+        },
+        "parameters": {
+            "profile": args.profile,
+            "corpus_chars": args.corpus_chars,
+            "chunk_sizes": args.chunk_sizes,
+            "k_values": args.k_values,
+            "queries": args.queries,
+            "dimension": args.dimension,
+            "configs": args.configs,
+            "rescore_factor": args.rescore_factor,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+def row_key(row: Dict[str, Any]) -> Tuple:
+    return row["corpus"], row["config"], row["k"]
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], max_recall_drop: float) -> List[str]:
+    """Lines describing the changes against the baseline report; regressions start with "REGRESSION"."""
+    previous = {row_key(row): row for row in baseline.get("results", [])}
+    lines = []
+    for row in report["results"]:
+        before = previous.get(row_key(row))
+        if before is None:
+            continue
+        recall_change = row["recall_at_k"] - before["recall_at_k"]
+        p95_ratio = row["latency_ms"]["p95"] / before["latency_ms"]["p95"] if before["latency_ms"]["p95"] else 0
+        label = f"{row['corpus']} {row['config']} k={row['k']}"
+        status = "REGRESSION" if recall_change < -max_recall_drop else "ok"
+        lines.append(f"{status:<11}{label:<40} recall {before['recall_at_k']:.4f} -> {row['recall_at_k']:.4f}"
+                     f"  p95 x{p95_ratio:.2f}")
+    return lines
+
+def format_table(report: Dict[str, Any]) -> str:
+    header = f"{'corpus':<18}{'config':<14}{'k':>4}{'recall':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}" \
+             f"{'qps':>10}{'build s':>9}{'index MB':>10}"
+    lines = [header]
+    for row in report["results"]:
+        latency = row["latency_ms"]
+        lines.append(f"{row['corpus']:<18}{row['config']:<14}{row['k']:>4}{row['recall_at_k']:>8.3f}"
+                     f"{latency['p50']:>9.3f}{latency['p95']:>9.3f}{latency['p99']:>9.3f}{row['batch_qps']:>10.1f}"
+                     f"{row['build_seconds']:>9.2f}{row['index_mb']:>10.2f}")
+    return "\n".join(lines)
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline FAISS retrieval benchmark (no network).")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="full")
+    parser.add_argument("--corpus-chars", type=int, help="Synthetic corpus size in characters")
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", help="Chunk sizes of the synthetic corpus")
+    parser.add_argument("--k-values", type=int, nargs="+")
+    parser.add_argument("--queries", type=int)
+    parser.add_argument("--dimension", type=int, help="Synthetic embedding dimension")
+    parser.add_argument("--configs", nargs="+", help="Index configurations, e.g. Flat IVFPQ HNSW/int8")
+    parser.add_argument("--rescore-factor", type=int, default=4, help="Re-scoring of lossy indexes (1 disables)")
+    parser.add_argument("--embedding-cache", help="EmbeddingCache database to take real vectors from")
+    parser.add_argument("--model", default=EMBEDDING_MODEL, help="Embedding model of the cached vectors")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here (stdout otherwise)")
+    parser.add_argument("--baseline", help="Earlier report to compare against")
+    parser.add_argument("--max-recall-drop", type=float, default=0.02)
+    args = parser.parse_args(argv)
+    for key, value in PROFILES[args.profile].items():
+        if getattr(args, key) is None:
+            setattr(args, key, value)
+    return args
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    report = run(args)
+    print(format_table(report), file=sys.stderr)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+    else:
+        print(json.dumps(report, indent=2))
+    if not args.baseline:
+        return 0
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        lines = compare(report, json.load(f), args.max_recall_drop)
+    print("\n".join(lines) or "No rows in common with the baseline.", file=sys.stderr)
+    return 1 if any(line.startswith("REGRESSION") for line in lines) else 0
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, stream=sys.stderr)
+    sys.exit(main())
@@ -0,0 +1,37 @@
+import json
+
+import numpy as np
+
+import retrieval_benchmark
+from utilities.embedding_cache import EmbeddingCache
+
+TINY = ["--corpus-chars", "40000", "--chunk-sizes", "500", "1000", "--k-values", "4", "--queries", "10",
+        "--dimension", "32", "--configs", "Flat", "Flat/int8", "HNSW"]
+
+def test_report_covers_every_corpus_config_and_k(tmp_path):
+    output = tmp_path / "report.json"
+    assert retrieval_benchmark.main(TINY + ["--output", str(output)]) == 0
+    report = json.loads(output.read_text())
+    assert report["parameters"]["chunk_sizes"] == [500, 1000]
+    assert [(row["corpus"], row["config"]) for row in report["results"]] == [
+        (f"synthetic-{size}", config) for size in (500, 1000) for config in ("Flat", "Flat/int8", "HNSW")
+    ]
+    assert report["results"][0]["vectors"] == retrieval_benchmark.chunk_count(40000, 500) == 100
+    assert all(row["recall_at_k"] == 1.0 for row in report["results"] if row["config"] == "Flat")
+    assert all(row["latency_ms"]["p50"] <= row["latency_ms"]["p99"] for row in report["results"])
+
+    # A recall drop against the baseline fails the run
+    report["results"][0]["recall_at_k"] = 0.5
+    lines = retrieval_benchmark.compare(report, json.loads(output.read_text()), 0.02)
+    assert lines[0].startswith("REGRESSION") and all(line.startswith("ok") for line in lines[1:])
+
+def test_cached_embeddings_hold_out_queries(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+    vectors = np.random.default_rng(0).standard_normal((30, 8)).astype(np.float32)
+    cache.put_many("text-embedding-ada-002", [f"text {i}" for i in range(30)], vectors)
+    cache.put_many("other-model", ["text"], vectors[:1])
+    cache.close()
+
+    corpus, queries = retrieval_benchmark.cached_embeddings(str(tmp_path / "cache.sqlite3"), 5)
+    assert corpus.shape == (25, 8) and queries.shape == (5, 8)
+    assert {row.tobytes() for row in np.vstack([corpus, queries])} == {row.tobytes() for row in vectors}
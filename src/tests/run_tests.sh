@@ -144,7 +144,13 @@ python3 -m pytest src/share/utilities/test_*.py -v --cov=src/share/utilities --c
 print_step "🧪" "Running integration tests..."
 python3 -m pytest src/tests/integration/ -v
 
-# 3. Load Tests
+# 3. Offline retrieval benchmark (recall regressions against the committed baseline fail the run)
+print_step "🧪" "Running retrieval benchmark..."
+python3 -m pytest src/tests/benchmark/ -v
+python3 src/tests/benchmark/retrieval_benchmark.py --profile quick \
+    --output src/tests/benchmark/report.json --baseline src/tests/benchmark/baseline.json
+
+# 4. Load Tests
 print_step "🧪" "Running load tests..."
 if [ "$ENV" = "uat" ]; then
     export BASE_URL_OAUTH="${HOST_UAT}/v1"